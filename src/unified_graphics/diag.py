@@ -1,20 +1,29 @@
 import os
+import threading
+import time
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from enum import Enum
-from typing import Union
+from typing import Callable, Optional, Sequence, TypeVar, Union
 from urllib.parse import urlparse
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa  # type: ignore
+import pyarrow.compute as pc  # type: ignore
+import pyarrow.dataset as ds  # type: ignore
 import sqlalchemy as sa
 import xarray as xr
 import zarr  # type: ignore
+from fsspec.implementations.local import LocalFileSystem  # type: ignore
 from s3fs import S3FileSystem, S3Map  # type: ignore
 from werkzeug.datastructures import MultiDict
 from xarray.core.dataset import Dataset
+from zarr.errors import GroupNotFoundError  # type: ignore
 
-from .models import Analysis, WeatherModel
+from . import histogram, pyramid, sketch, station
+from .models import Analysis, AnalysisStatistics, WeatherModel
 
 
 class MinimLoop(Enum):
@@ -38,6 +47,19 @@ ModelMetadata = namedtuple(
 )
 
 
+# pyarrow Datasets for the Parquet history of each model and variable, which are
+# reused across requests so the files don't have to be discovered, and their
+# footers read, every time. The files are listed again once a Dataset is older
+# than PARQUET_DATASET_TTL seconds, and the Dataset is only rebuilt if they've
+# changed.
+PARQUET_DATASET_TTL = 60
+
+CachedDataset = namedtuple("CachedDataset", "dataset files expires")
+
+_parquet_datasets: dict[str, CachedDataset] = {}
+_parquet_datasets_lock = threading.Lock()
+
+
 def get_model_metadata(session) -> ModelMetadata:
     model_list = session.scalars(
         sa.select(WeatherModel.name)
@@ -88,6 +110,16 @@ def get_model_metadata(session) -> ModelMetadata:
     )
 
 
+def get_s3_filesystem() -> S3FileSystem:
+    region = os.environ.get("AWS_REGION", "us-east-1")
+    return S3FileSystem(
+        key=os.environ.get("AWS_ACCESS_KEY_ID"),
+        secret=os.environ.get("AWS_SECRET_ACCESS_KEY"),
+        token=os.environ.get("AWS_SESSION_TOKEN"),
+        client_kwargs={"region_name": region},
+    )
+
+
 def get_store(url: str) -> Union[str, S3Map]:
     result = urlparse(url)
     if result.scheme in ["", "file"]:
@@ -96,17 +128,211 @@ def get_store(url: str) -> Union[str, S3Map]:
     if result.scheme != "s3":
         raise ValueError(f"Unsupported protocol '{result.scheme}' for URI: '{url}'")
 
-    region = os.environ.get("AWS_REGION", "us-east-1")
-    s3 = S3FileSystem(
-        key=os.environ.get("AWS_ACCESS_KEY_ID"),
-        secret=os.environ.get("AWS_SECRET_ACCESS_KEY"),
-        token=os.environ.get("AWS_SESSION_TOKEN"),
-        client_kwargs={"region_name": region},
-    )
+    s3 = get_s3_filesystem()
 
     return S3Map(root=f"{result.netloc}{result.path}", s3=s3, check=False)
 
 
+def get_filesystem(url: str) -> tuple[Union[LocalFileSystem, S3FileSystem], str]:
+    result = urlparse(url)
+    if result.scheme in ["", "file"]:
+        return LocalFileSystem(), result.path
+
+    if result.scheme != "s3":
+        raise ValueError(f"Unsupported protocol '{result.scheme}' for URI: '{url}'")
+
+    return get_s3_filesystem(), f"{result.netloc}{result.path}"
+
+
+def list_parquet_files(
+    fs: Union[LocalFileSystem, S3FileSystem], path: str
+) -> tuple[str, ...]:
+    # Files that start with "." or "_" are either still being written or are
+    # metadata, like the _metadata summary.
+    return tuple(
+        sorted(
+            file
+            for file in fs.find(path)
+            if file.endswith(".parquet")
+            and not os.path.basename(file).startswith((".", "_"))
+        )
+    )
+
+
+def unify_schemas(schemas: list[pa.Schema]) -> pa.Schema:
+    """Return a schema with every column in `schemas`
+
+    Older files stored string columns as dictionaries, which can't be unified with
+    the plain strings of newer files, so columns with both types are read as plain
+    strings.
+    """
+    types: dict[str, set[pa.DataType]] = {}
+    for schema in schemas:
+        for field in schema:
+            types.setdefault(field.name, set()).add(field.type)
+
+    return pa.unify_schemas(
+        [
+            pa.schema(
+                [
+                    (
+                        field.with_type(field.type.value_type)
+                        if pa.types.is_dictionary(field.type)
+                        and len(types[field.name]) > 1
+                        else field
+                    )
+                    for field in schema
+                ]
+            )
+            for schema in schemas
+        ]
+    )
+
+
+def read_physical_schema(fragment: ds.Fragment) -> Optional[pa.Schema]:
+    """Return the schema of a Parquet file, or None if it can't be read
+
+    Unreadable files are left out of a Dataset's schema, so that they only cause
+    an error if a scan actually reads them.
+    """
+    try:
+        return fragment.physical_schema
+    except (pa.ArrowInvalid, OSError):
+        return None
+
+
+def build_parquet_dataset(
+    fs: Union[LocalFileSystem, S3FileSystem], path: str, files: tuple[str, ...]
+) -> ds.Dataset:
+    partitioning = ds.partitioning(flavor="hive")
+    metadata_path = f"{path}/_metadata"
+
+    # If the dataset has been compacted, and nothing has been added since, the
+    # footers for every file can be read from the _metadata summary at once.
+    if fs.exists(metadata_path):
+        dataset = ds.parquet_dataset(
+            metadata_path, filesystem=fs, partitioning=partitioning
+        )
+        if tuple(sorted(dataset.files)) == files:
+            return dataset
+
+    dataset = ds.dataset(
+        list(files),
+        filesystem=fs,
+        format="parquet",
+        partitioning=partitioning,
+        partition_base_dir=path,
+    )
+
+    # The Dataset's schema is inferred from the first file alone, so columns that
+    # were added later, like station_id, would be missing whenever an older file
+    # sorts first. The footers are read concurrently to find every column.
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        schemas = [
+            schema
+            for schema in executor.map(read_physical_schema, dataset.get_fragments())
+            if schema is not None
+        ]
+    schema = unify_schemas([*schemas, dataset.partitioning.schema])
+
+    # The fragments above keep the footers they read, so the Dataset is created
+    # again. Otherwise it could count the rows of files that were compacted away.
+    return ds.dataset(
+        list(files),
+        schema=schema,
+        filesystem=fs,
+        format="parquet",
+        partitioning=partitioning,
+        partition_base_dir=path,
+    )
+
+
+def get_parquet_dataset(url: str) -> Optional[ds.Dataset]:
+    """Return the pyarrow Dataset for the Parquet files at `url`
+
+    Datasets are cached for the life of the process. Once a Dataset is older than
+    PARQUET_DATASET_TTL the files are listed again, and it's only rebuilt if files
+    were added or removed.
+
+    Parameters
+    ----------
+    url : str
+        The URL of the Parquet dataset for a model and variable
+
+    Returns
+    -------
+    Optional[pyarrow.dataset.Dataset]
+        The Dataset, or None if there are no Parquet files at `url`
+    """
+    cached = _parquet_datasets.get(url)
+    if cached and time.monotonic() < cached.expires:
+        return cached.dataset
+
+    with _parquet_datasets_lock:
+        # Another request may have refreshed the Dataset while we waited
+        cached = _parquet_datasets.get(url)
+        if cached and time.monotonic() < cached.expires:
+            return cached.dataset
+
+        fs, path = get_filesystem(url)
+        files = list_parquet_files(fs, path)
+
+        if cached and cached.files == files:
+            dataset = cached.dataset
+        elif files:
+            dataset = build_parquet_dataset(fs, path, files)
+        else:
+            dataset = None
+
+        _parquet_datasets[url] = CachedDataset(
+            dataset, files, time.monotonic() + PARQUET_DATASET_TTL
+        )
+
+    return dataset
+
+
+T = TypeVar("T")
+
+
+def scan_parquet_dataset(url: str, scan: Callable[[ds.Dataset], T]) -> Optional[T]:
+    """Read the Parquet files at `url` with `scan`, using the cached Dataset
+
+    Compacting a dataset removes the files that a cached Dataset was built from.
+    If one of them is missing, the Dataset is dropped from the cache and rebuilt
+    from the files that are there now, and `scan` is run once more.
+
+    Parameters
+    ----------
+    url : str
+        The URL of the Parquet dataset
+    scan : Callable[[pyarrow.dataset.Dataset], T]
+        A function that reads from the Dataset
+
+    Returns
+    -------
+    Optional[T]
+        The result of `scan`, or None if there are no Parquet files at `url`
+    """
+    for attempt in range(2):
+        dataset = get_parquet_dataset(url)
+        if dataset is None:
+            return None
+
+        try:
+            return scan(dataset)
+        except FileNotFoundError:
+            if attempt:
+                raise
+
+            with _parquet_datasets_lock:
+                # Another request may have already replaced the stale Dataset
+                cached = _parquet_datasets.get(url)
+                if cached and cached.dataset is dataset:
+                    del _parquet_datasets[url]
+
+    return None
+
+
 def open_diagnostic(
     diag_zarr: str,
     model: str,
@@ -119,11 +345,33 @@ def open_diagnostic(
     loop: MinimLoop,
 ) -> xr.Dataset:
     store = get_store(diag_zarr)
-    group = (
+    group = get_group_path(
+        model,
+        system,
+        domain,
+        background,
+        frequency,
+        variable,
+        initialization_time,
+        loop,
+    )
+    return xr.open_zarr(store, group=group, consolidated=False)
+
+
+def get_group_path(
+    model: str,
+    system: str,
+    domain: str,
+    background: str,
+    frequency: str,
+    variable: Variable,
+    initialization_time: str,
+    loop: MinimLoop,
+) -> str:
+    return (
         f"/{model}/{system}/{domain}/{background}/{frequency}"
         f"/{variable.value}/{initialization_time}/{loop.value}"
     )
-    return xr.open_zarr(store, group=group, consolidated=False)
 
 
 def parse_filter_value(value):
@@ -139,11 +387,25 @@ def parse_filter_value(value):
         return value
 
 
+# Coordinates that are filtered by matching any number of values exactly, instead of
+# by a range, e.g. `?observation_type=120&observation_type=220` for radiosondes
+CATEGORY_FILTERS = [
+    "station_id",
+    "provider_name",
+    "subprovider_name",
+    "observation_type",
+]
+
+
 # TODO: Refactor to a class
 # I think this might belong in a different module. It could be a class or set of classes
 # that represent different filters that can be added together into a filtering pipeline
 def get_bounds(filters: MultiDict):
+    # The category filters are matched exactly, so they don't have bounds
     for coord, value in filters.items():
+        if coord in CATEGORY_FILTERS:
+            continue
+
         extent = np.array(
             [
                 [parse_filter_value(digit) for digit in pair.split(",")]
@@ -153,21 +415,122 @@ def get_bounds(filters: MultiDict):
         yield coord, extent.min(axis=0), extent.max(axis=0)
 
 
-def apply_filters(dataset: xr.Dataset, filters: MultiDict) -> Dataset:
+def apply_filters(
+    dataset: xr.Dataset, filters: MultiDict, used: Optional[np.ndarray] = None
+) -> Dataset:
+    # If the is_used filter is not passed, our default behavior is to include only used
+    # observations. When the positions of the used observations are known, they're
+    # selected before anything else, so the other filters only mask the used
+    # observations.
+    if "is_used" not in filters and used is not None:
+        dataset = dataset.isel(nobs=used)
+
+    for key in CATEGORY_FILTERS:
+        if key not in filters:
+            continue
+
+        values = filters.getlist(key)
+        if dataset[key].dtype.kind in "iuf":
+            values = [float(value) for value in values]
+
+        dataset = dataset.isel(nobs=np.flatnonzero(dataset[key].isin(values).values))
+
     for coord, lower, upper in get_bounds(filters):
         data_array = dataset[coord]
-        dataset = dataset.where((data_array >= lower) & (data_array <= upper)).dropna(
-            dim="nobs"
-        )
+        # Vectors are in range when all of their components are, so the condition
+        # only has a nobs dimension and doesn't broadcast the variables that don't
+        # have a component dimension, like the stored magnitudes.
+        condition = (data_array >= lower) & (data_array <= upper)
+        condition = condition.all([dim for dim in condition.dims if dim != "nobs"])
+        dataset = dataset.where(condition).dropna(dim="nobs")
 
-    # If the is_used filter is not passed, our default behavior is to include only used
-    # observations.
-    if "is_used" not in filters:
+    if "is_used" not in filters and used is None:
         dataset = dataset.where(dataset["is_used"]).dropna(dim="nobs")
 
     return dataset
 
 
+def open_filtered(
+    diag_zarr: str,
+    model: str,
+    system: str,
+    domain: str,
+    background: str,
+    frequency: str,
+    variable: Variable,
+    initialization_time: str,
+    loop: MinimLoop,
+    filters: MultiDict,
+    variables: Optional[list[str]] = None,
+) -> xr.Dataset:
+    """Open a diagnostic group and apply filters to it
+
+    See `filter_diagnostic` for the parameters.
+    """
+    store = get_store(diag_zarr)
+    group = get_group_path(
+        model,
+        system,
+        domain,
+        background,
+        frequency,
+        variable,
+        initialization_time,
+        loop,
+    )
+    data = xr.open_zarr(store, group=group, consolidated=False)
+
+    return filter_diagnostic(store, group, data, filters, variables)
+
+
+def filter_diagnostic(
+    store: Union[str, S3Map],
+    group: str,
+    data: xr.Dataset,
+    filters: MultiDict,
+    variables: Optional[list[str]] = None,
+) -> xr.Dataset:
+    """Apply filters to a diagnostic group that's already been opened
+
+    Unless there's an is_used filter, the used observations are sliced from the
+    group with the index of their positions saved at ingest, so the unused
+    observations are never masked or copied. Groups saved before the index was added
+    fall back to masking every observation.
+
+    Parameters
+    ----------
+    store : Union[str, S3Map]
+        The Zarr store containing the group, as returned by `get_store`
+    group : str
+        The path of the group in the store
+    data : xarray.Dataset
+        The group, as opened from the store
+    variables : Optional[list[str]]
+        The data variables to return, or None for all of them. Any other variables
+        that are filtered on are also read.
+    """
+    if variables is not None:
+        filtered = [
+            coord
+            for coord, _, _ in get_bounds(filters)
+            if coord in data.data_vars and coord not in variables
+        ]
+        data = data[[*variables, *filtered]]
+
+    used = None
+    if "is_used" not in filters:
+        try:
+            used = xr.open_zarr(store, group=f"{group}/index", consolidated=False)[
+                "used"
+            ].values
+        except GroupNotFoundError:
+            pass
+
+    data = apply_filters(data, filters, used)
+
+    return data if variables is None else data[variables]
+
+
 def scalar(
     diag_zarr: str,
     model: str,
@@ -180,7 +543,7 @@ def scalar(
     loop: MinimLoop,
     filters: MultiDict,
 ) -> pd.DataFrame:
-    data = open_diagnostic(
+    data = open_filtered(
         diag_zarr,
         model,
         system,
@@ -190,8 +553,8 @@ def scalar(
         variable,
         initialization_time,
         loop,
+        filters,
     )
-    data = apply_filters(data, filters)
 
     return data.to_dataframe()
 
@@ -282,7 +645,7 @@ def wind(
     loop: MinimLoop,
     filters: MultiDict,
 ) -> pd.DataFrame | pd.Series:
-    data = open_diagnostic(
+    data = open_filtered(
         diag_zarr,
         model,
         system,
@@ -292,13 +655,64 @@ def wind(
         Variable.WIND,
         initialization_time,
         loop,
+        filters,
     )
 
-    data = apply_filters(data, filters)
-
     return data.to_dataframe()
 
 
+def wind_magnitude(
+    diag_zarr: str,
+    model: str,
+    system: str,
+    domain: str,
+    background: str,
+    frequency: str,
+    initialization_time: str,
+    loop: MinimLoop,
+    filters: MultiDict,
+) -> pd.DataFrame:
+    """Return the magnitude of the observed and O - F winds for the map
+
+    The magnitudes stored with the group at ingest are read instead of the vector
+    components, which are only read if they're filtered on. Groups saved before the
+    magnitudes were stored fall back to computing them from the components. The
+    group is only opened once, to find out which of them it has and to filter it.
+    """
+    store = get_store(diag_zarr)
+    group = get_group_path(
+        model,
+        system,
+        domain,
+        background,
+        frequency,
+        Variable.WIND,
+        initialization_time,
+        loop,
+    )
+    data = xr.open_zarr(store, group=group, consolidated=False)
+
+    names = {
+        f"{name}_magnitude": name
+        for name in [
+            "obs_minus_forecast_adjusted",
+            "obs_minus_forecast_unadjusted",
+            "observation",
+        ]
+    }
+    stored = all(name in data for name in names)
+    data = filter_diagnostic(
+        store, group, data, filters, list(names) if stored else None
+    )
+
+    if not stored:
+        return magnitude(
+            data.to_dataframe()[[*names.values(), "longitude", "latitude"]]
+        )
+
+    return data.rename(names).to_dataframe()[[*names.values(), "longitude", "latitude"]]
+
+
 def magnitude(dataset: pd.DataFrame) -> pd.DataFrame:
     return dataset.groupby(level=0).aggregate(
         {
@@ -311,7 +725,24 @@ def magnitude(dataset: pd.DataFrame) -> pd.DataFrame:
     )
 
 
-def get_model_run_list(
+def get_viewport(
+    filters: MultiDict,
+) -> tuple[tuple[float, float], tuple[float, float]]:
+    """Return the longitude and latitude bounds of the map viewport given by the
+    filters, or the whole globe if there aren't any
+    """
+    bounds = {
+        coord: (lower[0], upper[0])
+        for coord, lower, upper in get_bounds(filters)
+        if coord in ["latitude", "longitude"]
+    }
+
+    return bounds.get("longitude", (-180.0, 180.0)), bounds.get(
+        "latitude", (-90.0, 90.0)
+    )
+
+
+def grid(
     diag_zarr: str,
     model: str,
     system: str,
@@ -319,52 +750,1357 @@ def get_model_run_list(
     background: str,
     frequency: str,
     variable: Variable,
-):
-    store = get_store(diag_zarr)
-    path = "/".join([model, system, domain, background, frequency, variable.value])
-    with zarr.open_group(store, mode="r", path=path) as group:
-        return group.group_keys()
+    initialization_time: str,
+    loop: MinimLoop,
+    filters: MultiDict,
+    max_cells: int = pyramid.PYRAMID_MAX_CELLS,
+) -> tuple[pd.DataFrame, float]:
+    """Aggregate the O - F values in a viewport into grid cells for the map
 
+    The resolution of the grid is the finest one in `pyramid.PYRAMID_RESOLUTIONS`
+    with at most `max_cells` cells in the viewport, which is given by the latitude
+    and longitude filters. Unless other filters are passed, the cells are read from
+    the pyramid saved with the diag file, so the size of the response doesn't
+    depend on the number of observations. Otherwise, or if the group doesn't have a
+    pyramid, the filtered observations are gridded on the fly.
 
-def history(
-    parquet_path: str,
+    Returns
+    -------
+    tuple[pandas.DataFrame, float]
+        The count and the mean and RMS O - F in each cell, and the resolution of the
+        grid in degrees
+    """
+    longitude, latitude = get_viewport(filters)
+    i = pyramid.choose_level(longitude, latitude, max_cells)
+    resolution = pyramid.PYRAMID_RESOLUTIONS[i]
+
+    group = get_group_path(
+        model,
+        system,
+        domain,
+        background,
+        frequency,
+        variable,
+        initialization_time,
+        loop,
+    )
+    custom = [
+        key
+        for key, value in filters.items()
+        if key not in ["latitude", "longitude"] and (key, value) != ("is_used", "true")
+    ]
+
+    level = None
+    if not custom:
+        try:
+            level = pyramid.from_dataset(
+                xr.open_zarr(
+                    get_store(diag_zarr),
+                    group=f"{group}/pyramid/{i}",
+                    consolidated=False,
+                )
+            )
+        except GroupNotFoundError:
+            # Groups saved before pyramids were added don't have one
+            pass
+
+    if level is None:
+        data = open_filtered(
+            diag_zarr,
+            model,
+            system,
+            domain,
+            background,
+            frequency,
+            variable,
+            initialization_time,
+            loop,
+            filters,
+        )
+        level = pyramid.grid(data, resolution)
+
+    # Keep every cell that overlaps the viewport
+    lat = level.index.get_level_values("latitude")
+    lon = level.index.get_level_values("longitude")
+    in_viewport = (
+        (lat >= latitude[0] - resolution / 2)
+        & (lat <= latitude[1] + resolution / 2)
+        & (lon >= longitude[0] - resolution / 2)
+        & (lon <= longitude[1] + resolution / 2)
+    )
+
+    return pyramid.summarize(level[in_viewport]), resolution
+
+
+def histograms(
+    diag_zarr: str,
     model: str,
     system: str,
     domain: str,
     background: str,
     frequency: str,
     variable: Variable,
+    initialization_time: str,
     loop: MinimLoop,
-    initialization_time: datetime,
     filters: MultiDict,
-) -> pd.DataFrame:
-    parquet_file = os.path.join(
-        parquet_path,
-        "_".join((model, background, system, domain, frequency)),
-        variable.value,
+) -> dict[str, list[dict]]:
+    """Return histograms of the adjusted and unadjusted O - F values
+
+    Without any filters, the histograms saved with the diag file are read, so no
+    observations are fetched. Otherwise, or if the group doesn't have histograms,
+    the filtered observations are binned on the fly.
+
+    Returns
+    -------
+    dict[str, list[dict]]
+        The non-empty bins of the histogram for each variable in
+        `histogram.HISTOGRAM_VARIABLES`, with the bounds of each bin and its count
+    """
+    group = get_group_path(
+        model,
+        system,
+        domain,
+        background,
+        frequency,
+        variable,
+        initialization_time,
+        loop,
     )
 
-    start = initialization_time - timedelta(days=2)
-    df = pd.read_parquet(
-        parquet_file,
-        columns=["initialization_time", "obs_minus_forecast_unadjusted"],
-        filters=(
-            ("loop", "=", loop.value),
-            ("is_used", "=", True),
-            ("initialization_time", ">=", start),
-            ("initialization_time", "<=", initialization_time),
-        ),
+    if not filters:
+        try:
+            store = get_store(diag_zarr)
+            return {
+                name: histogram.to_records(
+                    xr.open_zarr(
+                        store, group=f"{group}/histogram/{name}", consolidated=False
+                    )
+                )
+                for name in histogram.HISTOGRAM_VARIABLES
+            }
+        except GroupNotFoundError:
+            # Groups saved before histograms were added don't have them
+            pass
+
+    data = open_filtered(
+        diag_zarr,
+        model,
+        system,
+        domain,
+        background,
+        frequency,
+        variable,
+        initialization_time,
+        loop,
+        filters,
     )
 
-    if df.empty:
-        return df
+    # The observations that are left have already been filtered by is_used
+    data = data.assign_coords(is_used=np.ones(data.sizes["nobs"], dtype=bool))
 
-    df = (
-        df.sort_values("initialization_time")
-        .groupby("initialization_time")
-        .describe()
-        .droplevel(0, axis=1)  # Drop a level from the columns created by the groupby
-        .reset_index()
-    )[["initialization_time", "min", "25%", "50%", "75%", "max", "mean", "count"]]
+    return {
+        name: histogram.to_records(hist) for name, hist in histogram.build(data).items()
+    }
 
-    return df
+
+def summary(
+    diag_zarr: str,
+    model: str,
+    system: str,
+    domain: str,
+    background: str,
+    frequency: str,
+    variable: Variable,
+    initialization_time: str,
+    loop: MinimLoop,
+) -> Optional[dict]:
+    """Return the summary of each variable saved in the attributes of a group
+
+    Only the group's metadata is read, none of its arrays.
+
+    Returns
+    -------
+    Optional[dict]
+        The count, used count, and the min, max, mean and std of the used values of
+        each variable, or None if the group was saved without a summary
+    """
+    group = get_group_path(
+        model,
+        system,
+        domain,
+        background,
+        frequency,
+        variable,
+        initialization_time,
+        loop,
+    )
+
+    return zarr.open_group(get_store(diag_zarr), mode="r", path=group).attrs.get(
+        "summary"
+    )
+
+
+# The edges of the pressure layers in a vertical profile, in hPa, centered on the
+# mandatory levels
+PROFILE_EDGES = [
+    0.0,
+    75.0,
+    125.0,
+    175.0,
+    225.0,
+    275.0,
+    350.0,
+    450.0,
+    600.0,
+    775.0,
+    887.5,
+    962.5,
+    1100.0,
+]
+
+PROFILE_VARIABLES = ["obs_minus_forecast_adjusted", "obs_minus_forecast_unadjusted"]
+
+
+def profile_layers(data: xr.Dataset, edges: list[float]) -> pd.DataFrame:
+    """Bin the O - F values in a Dataset by pressure layer
+
+    Observations outside of the layers, or without a pressure, are left out, as are
+    layers without any observations. The magnitude of a vector is never negative,
+    so vectors have the bias of each component and the RMS of their magnitude.
+
+    Returns
+    -------
+    pandas.DataFrame
+        A row for each layer with the minimum and maximum pressure of the layer, the
+        count of observations, and the bias (mean) and RMS of each variable in
+        PROFILE_VARIABLES. The biases of vectors are in a
+        "<variable>_<component>_bias" column for each component.
+    """
+    edges_array = np.sort(np.asarray(edges, dtype=np.float64))
+    size = edges_array.size - 1
+
+    # NaN pressures are sorted after every edge, which puts them outside the layers
+    layer = np.searchsorted(edges_array, data["pressure"].values, side="right") - 1
+    in_layer = (layer >= 0) & (layer < size)
+    layer = layer[in_layer]
+
+    count = np.bincount(layer, minlength=size)
+    columns = {
+        "min_pressure": edges_array[:-1],
+        "max_pressure": edges_array[1:],
+        "count": count,
+    }
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for name in PROFILE_VARIABLES:
+            values = data[name].transpose("nobs", ...).values[in_layer]
+            if values.ndim > 1:
+                for i, component in enumerate(data["component"].values):
+                    columns[f"{name}_{component}_bias"] = (
+                        np.bincount(layer, values[:, i], size) / count
+                    )
+                sum_squares = np.square(values).sum(axis=1)
+            else:
+                columns[f"{name}_bias"] = np.bincount(layer, values, size) / count
+                sum_squares = np.square(values)
+
+            columns[f"{name}_rms"] = np.sqrt(
+                np.bincount(layer, sum_squares, size) / count
+            )
+
+    result = pd.DataFrame(columns)
+
+    return result[result["count"] > 0].reset_index(drop=True)
+
+
+def profile(
+    diag_zarr: str,
+    model: str,
+    system: str,
+    domain: str,
+    background: str,
+    frequency: str,
+    variable: Variable,
+    initialization_time: str,
+    filters: MultiDict,
+    edges: list[float] = PROFILE_EDGES,
+) -> dict[str, pd.DataFrame]:
+    """Return the count, bias and RMS of the O - F values in each pressure layer
+    for both loops of a model run
+
+    Only the pressure and the O - F values of the filtered observations are read.
+
+    Returns
+    -------
+    dict[str, pandas.DataFrame]
+        The layers of each loop, as returned by `profile_layers`, keyed by the
+        loop. Loops that haven't been saved, or were saved without pressures, are
+        left out.
+    """
+    result = {}
+    for loop in MinimLoop:
+        try:
+            data = open_filtered(
+                diag_zarr,
+                model,
+                system,
+                domain,
+                background,
+                frequency,
+                variable,
+                initialization_time,
+                loop,
+                filters,
+            )
+        except GroupNotFoundError:
+            continue
+
+        if "pressure" in data:
+            result[loop.value] = profile_layers(data, edges)
+
+    return result
+
+
+STATS_VARIABLES = ["obs_minus_forecast_adjusted", "obs_minus_forecast_unadjusted"]
+
+
+def get_stats(values: np.ndarray) -> dict[str, Optional[float]]:
+    """Return the bias (mean), RMS and standard deviation of an array of values
+
+    The values are reduced to their count, sum and sum of squares in one pass. The
+    standard deviation is the sample standard deviation. Statistics that can't be
+    computed for so few values are None.
+    """
+    count = values.size
+    total = float(values.sum())
+    sum_squares = float(np.square(values).sum())
+
+    if count == 0:
+        return {"bias": None, "rms": None, "std": None}
+
+    bias = total / count
+    std = (
+        float(np.sqrt(max(sum_squares - total * bias, 0.0) / (count - 1)))
+        if count > 1
+        else None
+    )
+
+    return {"bias": bias, "rms": float(np.sqrt(sum_squares / count)), "std": std}
+
+
+def get_vector_stats(values: np.ndarray, components: list[str]) -> dict[str, dict]:
+    """Return the bias (mean) and standard deviation of each component of an array
+    of vectors, and the RMS of their magnitudes
+
+    The magnitude of a vector is never negative, so its mean isn't a bias, and the
+    bias and spread are reported for each component instead.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        The vectors, with a row for each observation and a column for each component
+    components : list[str]
+        The names of the components, in the order of the columns
+    """
+    result: dict = {
+        "bias": {},
+        "rms": get_stats(np.linalg.norm(values, axis=1))["rms"],
+        "std": {},
+    }
+    for i, component in enumerate(components):
+        component_stats = get_stats(values[:, i])
+        result["bias"][component] = component_stats["bias"]
+        result["std"][component] = component_stats["std"]
+
+    return result
+
+
+def stats(
+    diag_zarr: str,
+    model: str,
+    system: str,
+    domain: str,
+    background: str,
+    frequency: str,
+    variable: Variable,
+    initialization_time: str,
+    filters: MultiDict,
+) -> dict[str, dict]:
+    """Return summary statistics of the filtered observations for both loops of a
+    model run
+
+    Unless there's an is_used filter, every observation is counted, and the
+    statistics are of the used observations. Vectors have the bias and standard
+    deviation of each component and the RMS of their magnitude, as returned by
+    `get_vector_stats`. Only the O - F values and the coordinates being filtered on
+    are read.
+
+    Returns
+    -------
+    dict[str, dict]
+        The count of observations, the count of used observations, and the bias,
+        RMS and standard deviation of each of STATS_VARIABLES, keyed by loop. Loops
+        that haven't been saved are left out.
+    """
+    filters = MultiDict(filters)
+    if "is_used" not in filters:
+        filters["is_used"] = "false::true"
+
+    result = {}
+    for loop in MinimLoop:
+        try:
+            data = open_filtered(
+                diag_zarr,
+                model,
+                system,
+                domain,
+                background,
+                frequency,
+                variable,
+                initialization_time,
+                loop,
+                filters,
+                STATS_VARIABLES,
+            )
+        except GroupNotFoundError:
+            continue
+
+        used = data["is_used"].values.astype(bool)
+
+        loop_stats: dict = {"count": data.sizes["nobs"], "used_count": int(used.sum())}
+        for name in STATS_VARIABLES:
+            values = data[name].transpose("nobs", ...).values[used]
+            loop_stats[name] = (
+                get_vector_stats(values, list(data["component"].values))
+                if values.ndim > 1
+                else get_stats(values)
+            )
+
+        result[loop.value] = loop_stats
+
+    return result
+
+
+class ComparisonError(ValueError):
+    """Raised when the observations in two diagnostic groups can't be compared"""
+
+
+def open_omf(
+    diag_zarr: str,
+    model: str,
+    system: str,
+    domain: str,
+    background: str,
+    frequency: str,
+    variable: Variable,
+    initialization_time: str,
+    loop: MinimLoop,
+    name: str = "obs_minus_forecast_adjusted",
+    components: bool = False,
+    variables: Sequence[str] = (),
+) -> xr.Dataset:
+    """Read an O - F variable and the coordinates of every observation in a group
+
+    Vectors are read as their magnitude, and also as their components if
+    `components` is True. The arrays are loaded, so that groups read on different
+    threads are fetched and decoded concurrently.
+
+    Parameters
+    ----------
+    variables : Sequence[str]
+        Other data variables to read, under their own names, such as the ones being
+        filtered on. Names that aren't in the group are ignored.
+
+    Returns
+    -------
+    xarray.Dataset
+        The values of the variable as `omf`, the components of vectors as
+        `omf_<component>`, and any of `variables`, with the group's coordinates
+    """
+    data = open_diagnostic(
+        diag_zarr,
+        model,
+        system,
+        domain,
+        background,
+        frequency,
+        variable,
+        initialization_time,
+        loop,
+    )
+    omf = {"omf": ("nobs", pyramid.get_values(data, name))}
+    if components and "component" in data.dims:
+        omf.update(
+            (f"omf_{component}", ("nobs", data[name].sel(component=component).values))
+            for component in data["component"].values
+        )
+    data = data.drop_vars([name for name in data.data_vars if name not in variables])
+    if "component" not in {dim for da in data.data_vars.values() for dim in da.dims}:
+        data = data.drop_dims("component", errors="ignore")
+
+    return data.assign(omf).load()
+
+
+def improvement(
+    diag_zarr: str,
+    model: str,
+    system: str,
+    domain: str,
+    background: str,
+    frequency: str,
+    variable: Variable,
+    initialization_time: str,
+    filters: MultiDict,
+) -> tuple[pd.DataFrame, dict]:
+    """Compare the fit of the analysis and the guess to the observations of a
+    model run
+
+    The ges and anl groups are read concurrently and aligned by observation, so
+    they must have the same observations in the same order. Only observations that
+    are used in both loops are compared, unless there's an is_used filter. Filters
+    on the O - F or observation variables are applied to the values of the guess.
+    Vectors are compared by the magnitude of their O - F.
+
+    Returns
+    -------
+    tuple[pandas.DataFrame, dict]
+        The location, adjusted O - B and O - A, and the improvement |O - A| - |O - B|
+        of each observation, and the number of observations, the RMS O - B and O - A,
+        the reduction in RMS, the mean improvement, and the number of observations
+        that the analysis fits better than the guess
+
+    Raises
+    ------
+    ComparisonError
+        If the ges and anl groups have different observations
+    """
+    filtered = [coord for coord, _, _ in get_bounds(filters)]
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        guess, analysis = executor.map(
+            lambda loop: open_omf(
+                diag_zarr,
+                model,
+                system,
+                domain,
+                background,
+                frequency,
+                variable,
+                initialization_time,
+                loop,
+                variables=filtered if loop == MinimLoop.GUESS else (),
+            ),
+            [MinimLoop.GUESS, MinimLoop.ANALYSIS],
+        )
+
+    if not (
+        guess.sizes["nobs"] == analysis.sizes["nobs"]
+        and np.array_equal(guess["latitude"].values, analysis["latitude"].values)
+        and np.array_equal(guess["longitude"].values, analysis["longitude"].values)
+    ):
+        raise ComparisonError("The ges and anl groups have different observations")
+
+    data = (
+        guess.rename(omf="obs_minus_guess")
+        .assign(obs_minus_analysis=analysis["omf"])
+        .assign_coords(is_used=guess["is_used"] & analysis["is_used"].values)
+    )
+    data = apply_filters(data, filters)
+
+    omb = data["obs_minus_guess"].values
+    oma = data["obs_minus_analysis"].values
+    df = pd.DataFrame(
+        {
+            "longitude": data["longitude"].values,
+            "latitude": data["latitude"].values,
+            "obs_minus_guess": omb,
+            "obs_minus_analysis": oma,
+            "improvement": np.abs(oma) - np.abs(omb),
+        }
+    )
+
+    count = len(df)
+    guess_rms = float(np.sqrt(np.square(omb).mean())) if count else None
+    analysis_rms = float(np.sqrt(np.square(oma).mean())) if count else None
+    summary = {
+        "count": count,
+        "obs_minus_guess_rms": guess_rms,
+        "obs_minus_analysis_rms": analysis_rms,
+        "rms_reduction": (
+            guess_rms - analysis_rms
+            if guess_rms is not None and analysis_rms is not None
+            else None
+        ),
+        "mean_improvement": float(df["improvement"].mean()) if count else None,
+        "improved_count": int((df["improvement"] < 0).sum()),
+    }
+
+    return df, summary
+
+
+# The model, system, domain, background and frequency that identify a model
+ModelKey = namedtuple("ModelKey", "model system domain background frequency")
+
+# The coordinates that observations from two models are matched on, when both groups
+# have them, and the tolerance within which their values are considered the same, or
+# None if they have to match exactly
+COMPARE_KEYS = {
+    "station_id": None,
+    "observation_type": None,
+    "time_offset": 1e-3,
+    "pressure": 1e-2,
+    "latitude": 1e-4,
+    "longitude": 1e-4,
+}
+
+Comparison = namedtuple("Comparison", "summary grid resolution")
+
+
+def get_match_keys(data: xr.Dataset, names: list[str]) -> pd.DataFrame:
+    """Return the keys that the observations in a Dataset are matched on
+
+    Values with a tolerance in COMPARE_KEYS are rounded to multiples of it, and
+    observations with identical keys are told apart by the order they appear in.
+    """
+    keys = {}
+    for name in names:
+        values = data[name].values
+        tolerance = COMPARE_KEYS[name]
+        if tolerance is not None:
+            # Missing values are all given the same key
+            values = np.nan_to_num(
+                np.round(values.astype(np.float64) / tolerance),
+                nan=np.iinfo(np.int64).min,
+            ).astype(np.int64)
+
+        keys[f"{name}_key"] = values
+
+    df = pd.DataFrame(keys)
+    df["occurrence"] = df.groupby(list(keys)).cumcount() if keys else 0
+
+    return df
+
+
+def compare(
+    diag_zarr: str,
+    a: ModelKey,
+    b: ModelKey,
+    variable: Variable,
+    initialization_time: str,
+    loop: MinimLoop,
+    filters: MultiDict,
+    max_cells: Optional[int] = None,
+) -> Comparison:
+    """Compare the fit of two models to the observations they have in common
+
+    The two groups are read concurrently, and each is filtered by its own values
+    before its observations are paired with a hash join on the COMPARE_KEYS that
+    both groups have. Vectors are compared by the magnitude of their adjusted
+    O - F, so the difference is how much further from the observations model a is
+    than model b, but their own statistics are those of `get_vector_stats`, since
+    a magnitude has no bias.
+
+    Parameters
+    ----------
+    max_cells : Optional[int]
+        If given, the differences are also gridded at the finest resolution in
+        `pyramid.PYRAMID_RESOLUTIONS` with at most this many cells in the viewport
+
+    Returns
+    -------
+    Comparison
+        The number of observations of each model and of pairs, and the bias, RMS
+        and standard deviation of the O - F of each model and of their difference
+        (a - b) for the pairs, with the count, mean and RMS difference in each grid
+        cell and the resolution of the grid if `max_cells` was given
+    """
+    filtered = [coord for coord, _, _ in get_bounds(filters)]
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        data_a, data_b = executor.map(
+            lambda key: apply_filters(
+                open_omf(
+                    diag_zarr,
+                    key.model,
+                    key.system,
+                    key.domain,
+                    key.background,
+                    key.frequency,
+                    variable,
+                    initialization_time,
+                    loop,
+                    components=True,
+                    variables=filtered,
+                ),
+                filters,
+            ),
+            [a, b],
+        )
+
+    names = [name for name in COMPARE_KEYS if name in data_a and name in data_b]
+    components = [
+        str(name).removeprefix("omf_")
+        for name in data_a.data_vars
+        if str(name).startswith("omf_")
+    ]
+    left = get_match_keys(data_a, names).assign(
+        longitude=data_a["longitude"].values,
+        latitude=data_a["latitude"].values,
+        a=data_a["omf"].values,
+        **{f"a_{c}": data_a[f"omf_{c}"].values for c in components},
+    )
+    right = get_match_keys(data_b, names).assign(
+        b=data_b["omf"].values,
+        **{f"b_{c}": data_b[f"omf_{c}"].values for c in components},
+    )
+    pairs = left.merge(right, on=[*(f"{name}_key" for name in names), "occurrence"])
+    difference = (pairs["a"] - pairs["b"]).to_numpy()
+
+    summary = {
+        "a_count": data_a.sizes["nobs"],
+        "b_count": data_b.sizes["nobs"],
+        "count": len(pairs),
+        **{
+            key: (
+                get_vector_stats(
+                    pairs[[f"{key}_{c}" for c in components]].to_numpy(), components
+                )
+                if components
+                else get_stats(pairs[key].to_numpy())
+            )
+            for key in ["a", "b"]
+        },
+        "difference": get_stats(difference),
+    }
+
+    if max_cells is None:
+        return Comparison(summary, None, None)
+
+    longitude, latitude = get_viewport(filters)
+    resolution = pyramid.PYRAMID_RESOLUTIONS[
+        pyramid.choose_level(longitude, latitude, max_cells)
+    ]
+    level = pyramid.grid(
+        xr.Dataset(
+            {"difference": ("nobs", difference)},
+            coords={
+                "longitude": ("nobs", pairs["longitude"].to_numpy()),
+                "latitude": ("nobs", pairs["latitude"].to_numpy()),
+            },
+        ),
+        resolution,
+        ["difference"],
+    )
+
+    return Comparison(summary, pyramid.summarize(level, ["difference"]), resolution)
+
+
+def get_model_run_list(
+    diag_zarr: str,
+    model: str,
+    system: str,
+    domain: str,
+    background: str,
+    frequency: str,
+    variable: Variable,
+):
+    store = get_store(diag_zarr)
+    path = "/".join([model, system, domain, background, frequency, variable.value])
+    with zarr.open_group(store, mode="r", path=path) as group:
+        return group.group_keys()
+
+
+def get_parquet_file(
+    parquet_path: str,
+    model: str,
+    system: str,
+    domain: str,
+    background: str,
+    frequency: str,
+    variable: Variable,
+) -> str:
+    return os.path.join(
+        parquet_path,
+        "_".join((model, background, system, domain, frequency)),
+        variable.value,
+    )
+
+
+def get_window_filter(loop: MinimLoop, start: datetime, end: datetime) -> ds.Expression:
+    # The partition filters mean only the files for the loop and the days in the
+    # window are read.
+    return (
+        (ds.field("loop") == loop.value)
+        & (ds.field("initialization_date") >= start.date().isoformat())
+        & (ds.field("initialization_date") <= end.date().isoformat())
+        & (ds.field("initialization_time") >= start)
+        & (ds.field("initialization_time") <= end)
+    )
+
+
+def history(
+    parquet_path: str,
+    model: str,
+    system: str,
+    domain: str,
+    background: str,
+    frequency: str,
+    variable: Variable,
+    loop: MinimLoop,
+    initialization_time: datetime,
+    filters: MultiDict,
+) -> pd.DataFrame:
+    parquet_file = get_parquet_file(
+        parquet_path, model, system, domain, background, frequency, variable
+    )
+
+    start = initialization_time - timedelta(days=2)
+    columns = ["initialization_time", "obs_minus_forecast_unadjusted"]
+
+    table = scan_parquet_dataset(
+        parquet_file,
+        lambda dataset: dataset.to_table(
+            columns=columns,
+            filter=get_window_filter(loop, start, initialization_time)
+            & ds.field("is_used"),
+        ),
+    )
+    if table is None:
+        return pd.DataFrame(columns=columns)
+
+    df = table.to_pandas()
+    if df.empty:
+        return df
+
+    df = (
+        df.sort_values("initialization_time")
+        .groupby("initialization_time")
+        .describe()
+        .droplevel(0, axis=1)  # Drop a level from the columns created by the groupby
+        .reset_index()
+    )[["initialization_time", "min", "25%", "50%", "75%", "max", "mean", "count"]]
+
+    return df
+
+
+# The columns returned for each observation in the history of a station, when the
+# diag files have them
+STATION_COLUMNS = [
+    "initialization_time",
+    "loop",
+    "component",
+    "is_used",
+    "latitude",
+    "longitude",
+    "pressure",
+    "height",
+    "observation",
+    "obs_minus_forecast_adjusted",
+    "obs_minus_forecast_unadjusted",
+]
+
+
+def get_station_file(
+    parquet_path: str,
+    model: str,
+    system: str,
+    domain: str,
+    background: str,
+    frequency: str,
+    variable: Variable,
+    station_id: str,
+) -> str:
+    """Return the URL of the bucket of the station-ordered dataset for a station"""
+    (bucket,) = station.buckets([station_id])
+
+    return os.path.join(
+        parquet_path,
+        "_".join((model, background, system, domain, frequency)),
+        "stations",
+        variable.value,
+        f"station_bucket={bucket}",
+    )
+
+
+def station_history(
+    parquet_path: str,
+    model: str,
+    system: str,
+    domain: str,
+    background: str,
+    frequency: str,
+    variable: Variable,
+    station_id: str,
+    loop: Optional[MinimLoop] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> pd.DataFrame:
+    """Return every observation of a station across model runs
+
+    Only the bucket of the station-ordered dataset that has the station is read,
+    and only the row groups whose statistics include the station, so the time this
+    takes doesn't depend on the number of other stations in the archive. Every
+    ingest adds a file to the bucket, so it's only independent of the number of
+    model runs in the archive once the bucket has been compacted with
+    `utils.parquet.compact`, which merges its files and writes their footers to a
+    `_metadata` file. Unused observations are included, so that stations can be
+    checked for blacklisting.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The STATION_COLUMNS of each observation, ordered by initialization time and
+        loop
+    """
+    expression = ds.field("station_id") == station_id
+    if loop:
+        expression &= ds.field("loop") == loop.value
+    if start:
+        expression &= ds.field("initialization_time") >= start
+    if end:
+        expression &= ds.field("initialization_time") <= end
+
+    table = scan_parquet_dataset(
+        get_station_file(
+            parquet_path,
+            model,
+            system,
+            domain,
+            background,
+            frequency,
+            variable,
+            station_id,
+        ),
+        lambda dataset: dataset.to_table(
+            columns=[name for name in STATION_COLUMNS if name in dataset.schema.names],
+            filter=expression,
+        ),
+    )
+    if table is None:
+        return pd.DataFrame(columns=STATION_COLUMNS[:2])
+
+    return (
+        table.to_pandas()
+        .astype({"loop": str})
+        .sort_values(["initialization_time", "loop"], kind="stable")
+        .reset_index(drop=True)
+    )
+
+
+# The columns returned by the daily history. Windows up to HISTORY_EXACT_DAYS long
+# are summarized from the observations, so that their quantiles are exact, and
+# longer windows are summarized from the statistics recorded for each model run.
+HISTORY_COLUMNS = [
+    "initialization_date",
+    "min",
+    "25%",
+    "50%",
+    "75%",
+    "max",
+    "mean",
+    "std",
+    "count",
+]
+HISTORY_EXACT_DAYS = 2
+
+
+def daily_history(
+    parquet_path: str,
+    model: str,
+    system: str,
+    domain: str,
+    background: str,
+    frequency: str,
+    variable: Variable,
+    loop: MinimLoop,
+    start: datetime,
+    end: datetime,
+) -> pd.DataFrame:
+    """Summarize the used O - F values for each day in a window from the Parquet
+    history
+
+    Every observation in the window is read, so this is only suitable for short
+    windows, but the quantiles are exact.
+    """
+    parquet_file = get_parquet_file(
+        parquet_path, model, system, domain, background, frequency, variable
+    )
+    columns = ["initialization_time", "obs_minus_forecast_unadjusted"]
+
+    table = scan_parquet_dataset(
+        parquet_file,
+        lambda dataset: dataset.to_table(
+            columns=columns,
+            filter=get_window_filter(loop, start, end) & ds.field("is_used"),
+        ),
+    )
+    if table is None:
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+
+    df = table.to_pandas()
+    if df.empty:
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+
+    df = (
+        df.groupby(
+            df["initialization_time"].dt.floor("D").rename("initialization_date")
+        )["obs_minus_forecast_unadjusted"]
+        .describe()
+        .reset_index()
+        .astype({"count": int})
+    )
+
+    return df[HISTORY_COLUMNS]
+
+
+def daily_statistics(
+    session,
+    model: str,
+    system: str,
+    domain: str,
+    background: str,
+    frequency: str,
+    variable: Variable,
+    loop: MinimLoop,
+    start: datetime,
+    end: datetime,
+) -> pd.DataFrame:
+    """Summarize the used O - F values for each day in a window
+
+    The summaries are merged from the statistics recorded for each model run when
+    its diag files were saved, so no observations are read and the memory used
+    doesn't depend on the length of the window. The quantiles are estimated from
+    the merged quantile sketches, and are accurate to within
+    `sketch.SKETCH_RELATIVE_ACCURACY`.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+        SQLAlchemy database session
+    model, system, domain, background, frequency : str
+        The model run to summarize
+    variable : Variable
+        The variable to summarize
+    loop : MinimLoop
+        The minimization loop to summarize
+    start, end : datetime
+        The range of initialization times to include
+
+    Returns
+    -------
+    pandas.DataFrame
+        A row for each day with the quartiles, mean, standard deviation and count of
+        the O - F values
+    """
+    bg = sa.orm.aliased(WeatherModel)
+
+    rows = session.execute(
+        sa.select(
+            Analysis.time,
+            AnalysisStatistics.count,
+            AnalysisStatistics.sum,
+            AnalysisStatistics.sum_squares,
+            AnalysisStatistics.minimum,
+            AnalysisStatistics.maximum,
+            AnalysisStatistics.sketch,
+        )
+        .join(AnalysisStatistics.analysis)
+        .join(Analysis.model)
+        .join(bg, WeatherModel.background_id == bg.id)
+        .where(
+            WeatherModel.name == model,
+            bg.name == background,
+            Analysis.system == system,
+            Analysis.domain == domain,
+            Analysis.frequency == frequency,
+            Analysis.time >= start,
+            Analysis.time <= end,
+            AnalysisStatistics.variable == variable.value,
+            AnalysisStatistics.loop == loop.value,
+            AnalysisStatistics.count > 0,
+        )
+        .order_by(Analysis.time)
+    ).all()
+
+    if not rows:
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+
+    df = pd.DataFrame(rows, columns=[*rows[0]._fields])
+    days = df.groupby(df["time"].dt.floor("D").rename("initialization_date"))
+    result = days.aggregate(
+        count=("count", "sum"),
+        sum=("sum", "sum"),
+        sum_squares=("sum_squares", "sum"),
+        min=("minimum", "min"),
+        max=("maximum", "max"),
+    ).reset_index()
+    result["mean"] = result["sum"] / result["count"]
+
+    # The sample standard deviation, like pandas' describe. Rounding can make the
+    # variance slightly negative when every value is the same.
+    variance = (result["sum_squares"] - result["sum"] * result["mean"]) / (
+        result["count"] - 1
+    )
+    result["std"] = np.sqrt(variance.clip(lower=0))
+
+    # Estimates are clipped to the exact minimum and maximum, since the value of
+    # the outermost buckets may be slightly beyond them.
+    quartiles = np.array(
+        [
+            sketch.quantiles(
+                sketch.merge(sketch.from_dict(s) for s in day["sketch"] if s),
+                [0.25, 0.5, 0.75],
+            )
+            for _, day in days
+        ]
+    ).clip(result[["min"]].values, result[["max"]].values)
+    result[["25%", "50%", "75%"]] = quartiles
+
+    return result[HISTORY_COLUMNS]
+
+
+class AggregationError(ValueError):
+    """Raised when an aggregation is invalid or exceeds the aggregation limits"""
+
+
+# The columns and functions that can be used in an aggregation, so that queries are
+# limited to ones that the Parquet layout can answer efficiently.
+AGGREGATE_KEYS = [
+    "initialization_time",
+    "is_used",
+    "station_id",
+    "provider_name",
+    "subprovider_name",
+    "observation_type",
+    "component",
+]
+AGGREGATE_PERIODS = ["day", "week", "month"]
+AGGREGATE_COLUMNS = [
+    "observation",
+    "forecast_unadjusted",
+    "forecast_adjusted",
+    "obs_minus_forecast_unadjusted",
+    "obs_minus_forecast_adjusted",
+]
+AGGREGATE_FILTERS = [
+    "latitude",
+    "longitude",
+    "pressure",
+    "height",
+    "time_offset",
+    *AGGREGATE_COLUMNS,
+]
+AGGREGATE_FUNCTIONS = [
+    "count",
+    "sum",
+    "mean",
+    "min",
+    "max",
+    "stddev",
+    "variance",
+    "approximate_median",
+]
+
+# Default limits on the number of observations an aggregation can read, the memory
+# it can use to hold them, and the number of groups it can return
+AGGREGATE_MAX_ROWS = 50_000_000
+AGGREGATE_MAX_BYTES = 2 * 2**30
+AGGREGATE_MAX_GROUPS = 10_000
+
+
+def parse_metric(metric: str) -> tuple[str, str]:
+    column, _, function = metric.partition(":")
+    if column not in AGGREGATE_COLUMNS:
+        raise AggregationError(f"Invalid metric column: '{column}'")
+
+    if function not in AGGREGATE_FUNCTIONS:
+        raise AggregationError(f"Invalid metric function: '{function}'")
+
+    return column, function
+
+
+def get_aggregate_filter(filters: MultiDict) -> ds.Expression:
+    expression = ds.scalar(True)
+
+    # Station and provider names are matched exactly, any number of them may be
+    # passed
+    for key in ["station_id", "provider_name", "subprovider_name", "component"]:
+        if key in filters:
+            expression &= ds.field(key).isin(filters.getlist(key))
+
+    if "observation_type" in filters:
+        try:
+            types = [int(value) for value in filters.getlist("observation_type")]
+        except ValueError:
+            raise AggregationError("Observation types must be integers")
+
+        expression &= ds.field("observation_type").isin(types)
+
+    numeric = MultiDict(
+        [(key, value) for key, value in filters.items() if key in AGGREGATE_FILTERS]
+    )
+    for coord, lower, upper in get_bounds(numeric):
+        expression &= (ds.field(coord) >= lower[0]) & (ds.field(coord) <= upper[0])
+
+    # Like the other endpoints, only used observations are included by default
+    if "is_used" not in filters or filters["is_used"] == "true":
+        expression &= ds.field("is_used")
+    elif filters["is_used"] == "false":
+        expression &= ~ds.field("is_used")
+
+    return expression
+
+
+def aggregate(
+    parquet_path: str,
+    model: str,
+    system: str,
+    domain: str,
+    background: str,
+    frequency: str,
+    variable: Variable,
+    loop: MinimLoop,
+    start: datetime,
+    end: datetime,
+    group_by: list[str],
+    metrics: list[str],
+    filters: MultiDict,
+    sort: Optional[str] = None,
+    limit: Optional[int] = None,
+    max_rows: int = AGGREGATE_MAX_ROWS,
+    max_bytes: int = AGGREGATE_MAX_BYTES,
+    max_groups: int = AGGREGATE_MAX_GROUPS,
+) -> pd.DataFrame:
+    """Aggregate the observations in the Parquet history for a model and variable
+
+    The aggregation is run with pyarrow. Only the columns used by the aggregation
+    are read, and the files outside of the time window, or the row groups that
+    can't match the filters, are skipped. The observations are read in batches,
+    and the aggregation fails as soon as they pass `max_rows` or `max_bytes`.
+
+    Parameters
+    ----------
+    parquet_path : str
+        The URL of the directory containing the Parquet history
+    model, system, domain, background, frequency : str
+        The model run to aggregate
+    variable : Variable
+        The variable to aggregate
+    loop : MinimLoop
+        The minimization loop to aggregate
+    start, end : datetime
+        The range of initialization times to include
+    group_by : list[str]
+        The columns to group by, from AGGREGATE_KEYS, or a period from
+        AGGREGATE_PERIODS to group by the initialization time's day, week, or month
+    metrics : list[str]
+        The metrics to compute for each group, as "<column>:<function>", with a
+        column from AGGREGATE_COLUMNS and a function from AGGREGATE_FUNCTIONS
+    filters : MultiDict
+        Exact matches for the station and provider names, ranges for the columns in
+        AGGREGATE_FILTERS, and whether to include used or unused observations
+    sort : Optional[str]
+        The column to sort the results by, prefixed with "-" to sort descending
+    limit : Optional[int]
+        The maximum number of groups to return
+    max_rows, max_bytes, max_groups : int
+        The limits on the number of observations read, the memory used to hold
+        them, and the number of groups returned
+
+    Returns
+    -------
+    pandas.DataFrame
+        A row for each group with its keys and a "<column>_<function>" column for
+        each metric
+
+    Raises
+    ------
+    AggregationError
+        If the aggregation is invalid or exceeds one of its limits
+    """
+    if not metrics:
+        raise AggregationError("At least one metric is required")
+
+    for key in group_by:
+        if key not in AGGREGATE_KEYS and key not in AGGREGATE_PERIODS:
+            raise AggregationError(f"Invalid group by column: '{key}'")
+
+    if limit is not None and not 0 < limit <= max_groups:
+        raise AggregationError(f"Limit must be between 1 and {max_groups}")
+
+    aggregations = [parse_metric(metric) for metric in metrics]
+    output = [*group_by, *(f"{column}_{fn}" for column, fn in aggregations)]
+    if sort and sort.removeprefix("-") not in output:
+        raise AggregationError(f"Invalid sort column: '{sort}'")
+
+    parquet_file = get_parquet_file(
+        parquet_path, model, system, domain, background, frequency, variable
+    )
+    columns = {
+        "initialization_time" if key in AGGREGATE_PERIODS else key for key in group_by
+    }
+    columns.update(column for column, _ in aggregations)
+
+    def scan(dataset: ds.Dataset) -> pa.Table:
+        missing = columns - set(dataset.schema.names)
+        if missing:
+            raise AggregationError(
+                f"Columns not available: {', '.join(sorted(missing))}"
+            )
+
+        scanner = dataset.scanner(
+            columns=sorted(columns),
+            filter=get_window_filter(loop, start, end) & get_aggregate_filter(filters),
+        )
+
+        batches = []
+        rows = nbytes = 0
+        for batch in scanner.to_batches():
+            rows += batch.num_rows
+            nbytes += batch.nbytes
+            if rows > max_rows:
+                raise AggregationError(
+                    f"Aggregation exceeds the limit of {max_rows} rows"
+                )
+            if nbytes > max_bytes:
+                raise AggregationError(
+                    f"Aggregation exceeds the limit of {max_bytes} bytes"
+                )
+            batches.append(batch)
+
+        # Files written before the station and provider names were stored as plain
+        # strings each have their own dictionary for them, which have to be
+        # unified before the table can be grouped by them
+        return pa.Table.from_batches(
+            batches, schema=scanner.projected_schema
+        ).unify_dictionaries()
+
+    table = scan_parquet_dataset(parquet_file, scan)
+    if table is None:
+        return pd.DataFrame(columns=output)
+
+    for period in AGGREGATE_PERIODS:
+        if period in group_by:
+            table = table.append_column(
+                period, pc.floor_temporal(table["initialization_time"], unit=period)
+            )
+
+    result = table.group_by(group_by).aggregate(aggregations)
+
+    # Older files dictionary encode the station and provider names, which can't be
+    # sorted, but there are few enough groups to decode them.
+    for i, field in enumerate(result.schema):
+        if pa.types.is_dictionary(field.type):
+            result = result.set_column(
+                i, field.name, result[field.name].cast(field.type.value_type)
+            )
+
+    if sort:
+        order = "descending" if sort.startswith("-") else "ascending"
+        result = result.sort_by([(sort.removeprefix("-"), order)])
+
+    if limit:
+        result = result.slice(0, limit)
+    elif result.num_rows > max_groups:
+        raise AggregationError(
+            f"Aggregation exceeds the limit of {max_groups} groups, use a limit"
+        )
+
+    return result.select(output).to_pandas()
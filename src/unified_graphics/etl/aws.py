@@ -80,6 +80,16 @@ def lambda_handler(event, context):
 
     zarr_upload = os.environ["UG_DIAG_ZARR"]
     parquet_upload = os.environ["UG_DIAG_PARQUET"]
+    concurrent = os.environ.get("UG_DIAG_CONCURRENT_SAVE", "False") == "True"
+    encoding = diag.ENCODING_POLICIES[os.environ.get("UG_DIAG_ZARR_ENCODING", "zstd")]
+    if "UG_DIAG_ZARR_CHUNK_SIZE" in os.environ:
+        encoding = encoding._replace(
+            chunk_size=int(os.environ["UG_DIAG_ZARR_CHUNK_SIZE"])
+        )
+    if "UG_DIAG_ZARR_COORDINATE_TOLERANCE" in os.environ:
+        encoding = encoding._replace(
+            coordinate_tolerance=float(os.environ["UG_DIAG_ZARR_COORDINATE_TOLERANCE"])
+        )
 
     bucket = event["detail"]["bucket"]["name"]
     key = unquote_plus(event["detail"]["object"]["key"])
@@ -95,6 +105,28 @@ def lambda_handler(event, context):
     logger.info(f"Fetching record {bucket}:{key} to disk")
     tmp_file = fetch_record(bucket, key)
 
+    # Large diag files can be streamed from disk in slices of observations to keep
+    # them within the Lambda's memory limit.
+    slice_size = int(os.environ.get("UG_DIAG_SLICE_SIZE", 0))
+    if slice_size:
+        logger.info(
+            f"Saving {bucket}:{key} in slices of {slice_size} observations to the "
+            f"database and to the Zarr store at: {zarr_upload}"
+        )
+        engine = create_engine(os.environ["FLASK_SQLALCHEMY_DATABASE_URI"])
+        with Session(engine) as session:
+            diag.save_slices(
+                session,
+                zarr_upload,
+                parquet_upload,
+                diag.load_slices(tmp_file, slice_size),
+                encoding=encoding,
+            )
+        engine.dispose()
+
+        logger.info(f"Done processing {bucket}:{key}")
+        return
+
     logger.info(f"Loading {bucket}:{key} from disk into memory")
     data = diag.load(tmp_file)
 
@@ -104,7 +136,14 @@ def lambda_handler(event, context):
     )
     engine = create_engine(os.environ["FLASK_SQLALCHEMY_DATABASE_URI"])
     with Session(engine) as session:
-        diag.save(session, zarr_upload, parquet_upload, data)
+        diag.save(
+            session,
+            zarr_upload,
+            parquet_upload,
+            data,
+            concurrent=concurrent,
+            encoding=encoding,
+        )
     engine.dispose()
 
     logger.info(f"Done processing {bucket}:{key}")
@@ -1,17 +1,27 @@
 import logging
 import os.path
 import re
+import uuid
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 from pathlib import Path
-from typing import Union
+from typing import Any, Iterable, Iterator, Optional, Union
 
+import fsspec  # type: ignore
+import netCDF4  # type: ignore
+import numpy as np
 import pandas as pd
+import pyarrow as pa  # type: ignore
+import pyarrow.parquet as pq  # type: ignore
 import xarray as xr
+import zarr  # type: ignore
+from numcodecs import Blosc  # type: ignore
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from unified_graphics.models import Analysis, WeatherModel
+from unified_graphics import histogram, pyramid, sketch, station
+from unified_graphics.models import Analysis, AnalysisStatistics, WeatherModel
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +30,106 @@ DiagMeta = namedtuple(
     "variables loop initialization_time model system domain frequency background",
 )
 
+# Variables read from the diag files. Vector diag files prefix the observation
+# variables with the name of the component (e.g. `u_Observation`), but not the
+# coordinates. Everything else in the file is dropped without being read.
+DIAG_VARIABLES = [
+    "Observation",
+    "Forecast_unadjusted",
+    "Forecast_adjusted",
+    "Obs_Minus_Forecast_unadjusted",
+    "Obs_Minus_Forecast_adjusted",
+]
+DIAG_COORDINATES = ["Latitude", "Longitude", "Analysis_Use_Flag"]
+
+# Fixed-width character variables that are kept as string coordinates when they're
+# present in the diag file, mapped to the names of the coordinates.
+DIAG_STRING_COORDINATES = {
+    "Station_ID": "station_id",
+    "Provider_Name": "provider_name",
+    "Subprovider_Name": "subprovider_name",
+}
+
+# Numeric variables that are kept as coordinates when they're present in the diag
+# file, mapped to the names of the coordinates and the types they're stored as. The
+# observation type is GSI's three digit code (e.g. 120 for radiosondes), and the time
+# is the number of hours between the observation and the analysis.
+DIAG_NUMERIC_COORDINATES = {
+    "Observation_Type": ("observation_type", "int16"),
+    "Pressure": ("pressure", "float32"),
+    "Height": ("height", "float32"),
+    "Time": ("time_offset", "float32"),
+}
+
+# Variables whose magnitude is stored alongside the components for vector diag files,
+# as `<name>_magnitude`, so that maps of the wind don't have to read and combine the
+# components of every observation.
+MAGNITUDE_VARIABLES = [
+    "observation",
+    "obs_minus_forecast_unadjusted",
+    "obs_minus_forecast_adjusted",
+]
+
+# How the observation variables are chunked and compressed in the Zarr. The chunk size
+# is the number of observations per chunk along `nobs` and `chunk_sizes` can override
+# it for individual variables. `compressor` names a Blosc compressor, `clevel` is its
+# compression level, and `shuffle` is one of the Blosc shuffle filters. Setting
+# `chunk_size` or `compressor` to None leaves that choice up to xarray and Zarr.
+#
+# Setting `dtype` (e.g. "float32") stores the observation, forecast, and O - F values
+# with reduced precision, and setting `coordinate_tolerance` stores latitude and
+# longitude as scaled integers that are accurate to within that many degrees. Both are
+# recorded as CF encoding attributes, so xarray decodes them when a group is opened.
+EncodingPolicy = namedtuple(
+    "EncodingPolicy",
+    "chunk_size compressor clevel shuffle chunk_sizes dtype coordinate_tolerance",
+    defaults=(None, None, None),
+)
+
+# The API always reads entire columns from a group, so we favor large chunks that
+# can be fetched in a handful of requests over small chunks that allow partial reads.
+ENCODING_POLICIES = {
+    "default": EncodingPolicy(None, None, 0, Blosc.NOSHUFFLE),
+    "zstd": EncodingPolicy(262_144, "zstd", 3, Blosc.SHUFFLE),
+    "zstd-bitshuffle": EncodingPolicy(262_144, "zstd", 3, Blosc.BITSHUFFLE),
+    "lz4": EncodingPolicy(262_144, "lz4", 5, Blosc.SHUFFLE),
+    "zstd-compact": EncodingPolicy(
+        262_144,
+        "zstd",
+        3,
+        Blosc.SHUFFLE,
+        dtype="float32",
+        coordinate_tolerance=1e-4,
+    ),
+}
+
+# Coordinates that are quantized by EncodingPolicy.coordinate_tolerance, and the
+# largest absolute value each of them can have
+QUANTIZED_COORDINATES = {"latitude": 90.0, "longitude": 180.0}
+
+# Rows are sorted so that used observations come first, which lets readers skip the
+# row groups of unused observations using their statistics. The row groups are big
+# enough to keep the footers small while still allowing them to be skipped.
+PARQUET_ROW_GROUP_SIZE = 262_144
+PARQUET_COMPRESSION = "zstd"
+
+# The rows of each file in the station-ordered dataset are sorted by station, and
+# the row groups are small, so that readers can skip the row groups of other stations
+# using their statistics.
+STATION_ROW_GROUP_SIZE = 16_384
+
+# Summary statistics of the used O - F values in a diag file, including a quantile
+# sketch of their distribution. They're stored in the database for each model run,
+# and can be merged to summarize any number of them.
+Statistics = namedtuple("Statistics", "count sum sum_squares minimum maximum sketch")
+
+# Running totals for the summary of each variable that's stored in the attributes of
+# its Zarr group, which can be merged across slices of a diag file. The minimum,
+# maximum and sums are of the used observations only.
+SummaryTotals = namedtuple(
+    "SummaryTotals", "count used_count sum sum_squares minimum maximum"
+)
+
 diag_filename_regex = re.compile(
     (
         # Ignore optional UUID and capture model, system, domain, and frequency
@@ -99,71 +209,168 @@ def get_adjusted(ds: xr.Dataset):
     return fn
 
 
+def has_variable(
+    dataset: xr.Dataset, variable: str, components: list[str] = []
+) -> bool:
+    """Return True if the variable is in a diag file for every component"""
+    if not components:
+        return variable in dataset
+
+    return all(f"{c}_{variable}" in dataset for c in components)
+
+
 def get_data_array(
     dataset: xr.Dataset, variable: str, components: list[str] = []
 ) -> xr.DataArray:
+    """Read a variable from a diag file, stacking vector components into one array
+
+    Vector variables are stored in the diag files as one variable per component,
+    prefixed with the name of the component (e.g. `u_Observation`). These are
+    copied into a single pre-allocated array with a `component` dimension.
+
+    Parameters
+    ----------
+    dataset : xarray.Dataset
+        The Dataset read from the diag file
+    variable : str
+        The name of the variable without any component prefix
+    components : list[str]
+        The names of the vector components, empty for scalar variables
+
+    Returns
+    -------
+    xarray.DataArray
+        The variable, with a trailing `component` dimension for vectors
+    """
     if not components:
-        return dataset[variable]
-
-    key = f"{components[0]}_{variable}"
-    da = dataset[key].expand_dims({"component": [components[0]]}, axis=1)
-    for c in components[1:]:
-        key = f"{c}_{variable}"
-        da = xr.concat(
-            [
-                da,
-                dataset[key].expand_dims({"component": [c]}, axis=1),
-            ],
-            dim="component",
-        )
+        return dataset[variable].load()
+
+    arrays = [dataset[f"{c}_{variable}"] for c in components]
+    data = np.empty(
+        (*arrays[0].shape, len(components)),
+        dtype=np.result_type(*(arr.dtype for arr in arrays)),
+    )
+    for i, arr in enumerate(arrays):
+        data[..., i] = arr.values
 
-    return da
+    return xr.DataArray(
+        data, dims=[*arrays[0].dims, "component"], coords={"component": components}
+    )
 
 
 def compute_forecast(
-    suffix: str, ds: xr.Dataset, component_list: list[str] = []
-) -> xr.Dataset:
-    if component_list:
-        key_list = [
-            (
-                f"{component}_Observation",
-                f"{component}_Obs_Minus_Forecast_{suffix}",
-                f"{component}_Forecast_{suffix}",
-            )
-            for component in component_list
-        ]
-    else:
-        key_list = [
-            ("Observation", f"Obs_Minus_Forecast_{suffix}", f"Forecast_{suffix}")
-        ]
+    observation: xr.DataArray, obs_minus_forecast: xr.DataArray
+) -> xr.DataArray:
+    """Compute the forecast values from the observations and O - F"""
+    return observation.copy(data=observation.values - obs_minus_forecast.values)
 
-    for obs_key, delta_key, forecast_key in key_list:
-        obs = ds[obs_key]
-        delta = ds[delta_key]
-        forecast = obs - delta
-        ds[forecast_key] = forecast
 
-    return ds
+def clean_strings(values: np.ndarray) -> np.ndarray:
+    """Decode the values of a character variable and strip their padding
 
+    Character variables in diag files are read as fixed-width byte strings padded
+    with spaces. Only the unique values are cleaned, since there are far fewer
+    stations and providers than there are observations.
 
-def load(path: Path) -> xr.Dataset:
-    """Load a NetCDF diag file into xarray Datasets for observations,
-    forecasts, and differences
+    The cleaned values keep the width of the diag file's strings rather than the
+    width of the longest value, so that every slice of a file has the same dtype
+    and can be appended to the same Zarr arrays.
 
-    This function transforms the data in a diag file into a format that uses
-    many of the variables from the NetCDF file as coordinates.
+    Parameters
+    ----------
+    values : numpy.ndarray
+        The byte (or string) values read from the diag file
+
+    Returns
+    -------
+    numpy.ndarray
+        The cleaned values as unicode strings
+    """
+    # Decoding can only make strings shorter, since a character takes at least one
+    # byte. Values that aren't fixed-width keep the width of the longest value.
+    width = {"S": values.dtype.itemsize, "U": values.dtype.itemsize // 4}
+    dtype = f"<U{width.get(values.dtype.kind, '')}"
+
+    array = pa.array(values.ravel())
+    if isinstance(array, pa.ChunkedArray):
+        # pyarrow converts large arrays of byte strings to multiple chunks
+        array = array.combine_chunks()
+    encoded = array.dictionary_encode()
+    cleaned = np.array(
+        [
+            (v.decode("utf-8", "replace") if isinstance(v, bytes) else v)
+            .replace("\x00", "")
+            .strip()
+            for v in encoded.dictionary.to_pylist()
+        ],
+        dtype=dtype,
+    )
+
+    return cleaned[encoded.indices.to_numpy()].reshape(values.shape)
+
+
+def open_diag(path: Path, components: list[str] = []) -> xr.Dataset:
+    """Open a NetCDF diag file, keeping only the variables used by `load`
+
+    Only the file's metadata is read to find the variables to drop. The remaining
+    variables are read lazily and aren't cached, so they are only decoded when
+    their values are used.
 
     Parameters
     ----------
-    path : Path, str
+    path : Path
         The path to the NetCDF diag file
+    components : list[str]
+        The names of the vector components in the file, empty for scalar variables
 
     Returns
     -------
     xarray.Dataset
-        A transformed xarray Dataset containing the observation, forecast
-        adjusted/unadjusted, and difference adjusted/unadjusted variables from
-        the diag file.
+        The lazily loaded variables from the diag file
+    """
+    keep = (
+        set(DIAG_COORDINATES)
+        | set(DIAG_STRING_COORDINATES)
+        | set(DIAG_NUMERIC_COORDINATES)
+    )
+    if components:
+        keep.update(f"{c}_{name}" for c in components for name in DIAG_VARIABLES)
+    else:
+        keep.update(DIAG_VARIABLES)
+
+    with netCDF4.Dataset(path) as nc:
+        drop_variables = [name for name in nc.variables if name not in keep]
+
+    return xr.open_dataset(path, cache=False, drop_variables=drop_variables)
+
+
+def get_magnitude(data: xr.DataArray) -> xr.DataArray:
+    """Return the magnitude of each vector in an array with a `component` dimension
+
+    Observations missing any of their components have a NaN magnitude.
+    """
+    return (data**2).sum("component", skipna=False) ** 0.5
+
+
+def transform(ds: xr.Dataset, meta: DiagMeta) -> xr.Dataset:
+    """Transform the variables read from a diag file into a diagnostic Dataset
+
+    Parameters
+    ----------
+    ds : xarray.Dataset
+        The (possibly lazily loaded) variables from a diag file, as returned by
+        `open_diag`
+    meta : DiagMeta
+        The metadata parsed from the diag file's name
+
+    Returns
+    -------
+    xarray.Dataset
+        The observation, forecast adjusted/unadjusted, and difference
+        adjusted/unadjusted variables, with the location, use flag, and any of
+        the metadata in DIAG_STRING_COORDINATES and DIAG_NUMERIC_COORDINATES as
+        coordinates. Vector Datasets also have the magnitude of each of
+        MAGNITUDE_VARIABLES.
     """
     (
         diag_variables,
@@ -174,43 +381,53 @@ def load(path: Path) -> xr.Dataset:
         domain,
         frequency,
         background,
-    ) = parse_diag_filename(path.name)
+    ) = meta
+
+    components = diag_variables if len(diag_variables) > 1 else []
 
-    ds = xr.open_dataset(path)
+    longitude = ds["Longitude"].values
+    longitude[longitude > 180] -= 360
 
     coords = {
-        "latitude": (["nobs"], ds["Latitude"].data),
-        "longitude": (
-            ["nobs"],
-            xr.where(
-                ds["Longitude"] > 180, ds["Longitude"] - 360, ds["Longitude"]
-            ).data,
-        ),
-        "is_used": (["nobs"], (ds["Analysis_Use_Flag"] == 1).data),
+        "latitude": (["nobs"], ds["Latitude"].values),
+        "longitude": (["nobs"], longitude),
+        "is_used": (["nobs"], ds["Analysis_Use_Flag"].values == 1),
     }
 
-    components = []
-    if len(diag_variables) > 1:
-        coords["component"] = diag_variables
-        components = diag_variables
-
-    # Some diag files do not include the forecast variables, so before we
-    # transform the input, we compute the forecast if it's missing.
-    if "Forecast_adjusted" not in ds:
-        compute_forecast("adjusted", ds, components)
-    if "Forecast_unadjusted" not in ds:
-        compute_forecast("unadjusted", ds, components)
-
-    variables = [
-        "Observation",
-        "Forecast_unadjusted",
-        "Forecast_adjusted",
-        "Obs_Minus_Forecast_unadjusted",
-        "Obs_Minus_Forecast_adjusted",
-    ]
-
-    transformed = xr.Dataset(
-        {name.lower(): get_data_array(ds, name, components) for name in variables},
+    for name, coord in DIAG_STRING_COORDINATES.items():
+        if name in ds:
+            coords[coord] = (["nobs"], clean_strings(ds[name].values))
+
+    for name, (coord, dtype) in DIAG_NUMERIC_COORDINATES.items():
+        if name in ds:
+            coords[coord] = (["nobs"], ds[name].values.astype(dtype))
+
+    if components:
+        coords["component"] = components
+
+    observation = get_data_array(ds, "Observation", components)
+    data_vars = {"observation": observation}
+    for suffix in ["unadjusted", "adjusted"]:
+        obs_minus_forecast = get_data_array(
+            ds, f"Obs_Minus_Forecast_{suffix}", components
+        )
+
+        # Some diag files do not include the forecast variables, so we compute the
+        # forecast from the observations and O - F if it's missing.
+        if has_variable(ds, f"Forecast_{suffix}", components):
+            forecast = get_data_array(ds, f"Forecast_{suffix}", components)
+        else:
+            forecast = compute_forecast(observation, obs_minus_forecast)
+
+        data_vars[f"forecast_{suffix}"] = forecast
+        data_vars[f"obs_minus_forecast_{suffix}"] = obs_minus_forecast
+
+    if components:
+        for name in MAGNITUDE_VARIABLES:
+            data_vars[f"{name}_magnitude"] = get_magnitude(data_vars[name])
+
+    return xr.Dataset(
+        data_vars,
         coords=coords,
         attrs={
             "name": "".join(diag_variables),
@@ -224,27 +441,970 @@ def load(path: Path) -> xr.Dataset:
         },
     )
 
-    return transformed
+
+def load(path: Path) -> xr.Dataset:
+    """Load a NetCDF diag file into xarray Datasets for observations,
+    forecasts, and differences
+
+    This function transforms the data in a diag file into a format that uses
+    many of the variables from the NetCDF file as coordinates.
+
+    Parameters
+    ----------
+    path : Path, str
+        The path to the NetCDF diag file
+
+    Returns
+    -------
+    xarray.Dataset
+        A transformed xarray Dataset containing the observation, forecast
+        adjusted/unadjusted, and difference adjusted/unadjusted variables from
+        the diag file.
+    """
+    meta = parse_diag_filename(path.name)
+    components = meta.variables if len(meta.variables) > 1 else []
+
+    with open_diag(path, components) as ds:
+        return transform(ds, meta)
+
+
+def load_slices(path: Path, slice_size: int) -> Iterator[xr.Dataset]:
+    """Load a NetCDF diag file in slices of observations
+
+    Each slice is read from the file and transformed as it is needed, so only one
+    slice of the file is held in memory at a time. Files without any observations
+    produce a single, empty slice.
+
+    Parameters
+    ----------
+    path : Path
+        The path to the NetCDF diag file
+    slice_size : int
+        The maximum number of observations in each slice
+
+    Yields
+    ------
+    xarray.Dataset
+        A transformed Dataset, as returned by `load`, for each slice of
+        observations in the file
+    """
+    meta = parse_diag_filename(path.name)
+    components = meta.variables if len(meta.variables) > 1 else []
+
+    with open_diag(path, components) as ds:
+        for start in range(0, max(ds.sizes["nobs"], 1), slice_size):
+            yield transform(ds.isel(nobs=slice(start, start + slice_size)), meta)
 
 
-def prep_dataframe(ds: xr.Dataset) -> pd.DataFrame:
+def prep_table(ds: xr.Dataset, offset: int = 0) -> pa.Table:
     """Prepare a diagnostic dataset for storing in a Parquet file
 
-    Creates a pandas DataFrame from `ds` and cleans the string columns.
+    Builds a pyarrow Table directly from the arrays in `ds`, without going through
+    a pandas DataFrame. Variables that span every dimension of the Dataset are
+    passed to pyarrow without copying, only the coordinates that have to be
+    broadcast across a vector's components are copied. The loop is not included,
+    since it's stored in the path of the Parquet partition.
+
+    The Table has the same columns and pandas metadata as the DataFrame returned by
+    `Dataset.to_dataframe` with observations as the first dimension, so reading the
+    Parquet back with pandas returns the observations indexed by their dimensions.
+
+    Parameters
+    ----------
+    ds : xarray.Dataset
+        The Dataset to convert to a Table
+    offset : int
+        The position of the Dataset's first observation in the diag file, used
+        to number the observations when a file is saved in slices (default is 0)
+    """
+    # Magnitudes can be computed from the components in the table, so they aren't
+    # repeated for every component.
+    ds = ds.drop_vars(
+        [f"{name}_magnitude" for name in MAGNITUDE_VARIABLES], errors="ignore"
+    )
+
+    # Observations are ordered like the observation variable, (nobs, component) for
+    # vectors, which is how they're laid out in memory.
+    dims = [str(dim) for dim in ds["observation"].dims]
+    sizes = {dim: ds.sizes[dim] for dim in dims}
+
+    def flatten(variable: xr.Variable) -> np.ndarray:
+        # Transposing a variable that already has every dimension in order is a
+        # no-op, so ravel returns a view of its data.
+        return variable.set_dims(sizes).transpose(*dims).values.ravel()
+
+    def to_arrow(variable: xr.Variable) -> Any:
+        if variable.dtype.kind not in "OSU":
+            return flatten(variable)
+
+        # String variables, like the station IDs, are stored as plain string
+        # columns. Parquet dictionary encodes their pages, so they're as small on
+        # disk as dictionary columns, but every file has the same column type
+        # without sharing a dictionary, and readers can skip row groups by their
+        # statistics, which pyarrow doesn't do for dictionary columns.
+        return pa.array(flatten(variable), pa.string())
+
+    columns = {
+        str(name): to_arrow(variable)
+        for name, variable in ds.variables.items()
+        if name not in sizes
+    }
+    columns["initialization_time"] = np.full(
+        columns["observation"].size,
+        np.datetime64(ds.initialization_time, "us"),
+    )
+    for dim in dims:
+        positions = flatten(xr.Variable(dim, np.arange(sizes[dim])))
+        if dim in ds.coords:
+            # Dimension coordinates, like the vector components, are strings, so
+            # they're converted to Arrow once and repeated with `take` rather than
+            # converting every row.
+            columns[dim] = pa.array(ds[dim].values).take(positions)
+        elif dim == "nobs":
+            columns[dim] = positions + offset
+        else:
+            columns[dim] = positions
+
+    # The pandas metadata, which records which columns make up the index, is taken
+    # from the DataFrame for a single observation.
+    sample = ds.isel(nobs=slice(0, 1)).to_dataframe(dim_order=dims)
+    sample["initialization_time"] = columns["initialization_time"][: len(sample)]
+    metadata = pa.Schema.from_pandas(sample, preserve_index=True).metadata
+
+    return pa.table(columns).replace_schema_metadata(metadata)
+
+
+def get_quantized_encoding(max_value: float, tolerance: float) -> dict[str, Any]:
+    """Build the encoding that stores a float variable as scaled integers
+
+    Values are rounded to the nearest multiple of twice the tolerance, so that the
+    decoded values are never off by more than `tolerance`. The smallest integer type
+    that can hold the scaled values is used. The type is chosen from the range of
+    the variable rather than its data, so that data appended to the variable later
+    can't overflow it.
+
+    Parameters
+    ----------
+    max_value : float
+        The largest absolute value the variable can have
+    tolerance : float
+        The maximum absolute error allowed in the decoded values
+
+    Returns
+    -------
+    dict[str, Any]
+        The dtype, scale factor, offset, and fill value for the variable
+    """
+    scale_factor = 2 * tolerance
+
+    # The minimum value of the integer type is reserved for the fill value, so we only
+    # have to check the scaled values against the maximum.
+    dtype = "int16" if max_value / scale_factor < np.iinfo("int16").max else "int32"
+
+    return {
+        "dtype": np.dtype(dtype),
+        "scale_factor": scale_factor,
+        "add_offset": 0.0,
+        "_FillValue": np.iinfo(dtype).min,
+    }
+
+
+def get_zarr_encoding(
+    ds: xr.Dataset, policy: EncodingPolicy
+) -> dict[str, dict[str, Any]]:
+    """Build the Zarr encoding for the observation variables in a Dataset
+
+    Parameters
+    ----------
+    ds : xarray.Dataset
+        The Dataset to be written to the Zarr
+    policy : EncodingPolicy
+        The chunking and compression to use for each variable
+
+    Returns
+    -------
+    dict[str, dict[str, Any]]
+        A mapping of variable names to encodings that can be passed to
+        `Dataset.to_zarr`
+    """
+    chunk_sizes = policy.chunk_sizes or {}
+    compressor = (
+        Blosc(cname=policy.compressor, clevel=policy.clevel, shuffle=policy.shuffle)
+        if policy.compressor
+        else None
+    )
+
+    encoding: dict[str, dict[str, Any]] = {}
+    for key, variable in ds.variables.items():
+        name = str(key)
+        if "nobs" not in variable.dims:
+            continue
+
+        var_encoding: dict[str, Any] = {}
+
+        chunk_size = chunk_sizes.get(name, policy.chunk_size)
+        if chunk_size:
+            var_encoding["chunks"] = tuple(
+                max(1, min(chunk_size, size)) if dim == "nobs" else size
+                for dim, size in variable.sizes.items()
+            )
+
+        if compressor:
+            var_encoding["compressor"] = compressor
+
+        if policy.dtype and name in ds.data_vars and variable.dtype.kind == "f":
+            var_encoding["dtype"] = policy.dtype
+
+        if policy.coordinate_tolerance and name in QUANTIZED_COORDINATES:
+            var_encoding.update(
+                get_quantized_encoding(
+                    QUANTIZED_COORDINATES[name], policy.coordinate_tolerance
+                )
+            )
+
+        if var_encoding:
+            encoding[name] = var_encoding
+
+    return encoding
+
+
+def get_group(ds: xr.Dataset) -> str:
+    """Return the path to the group in the Zarr for a diagnostic Dataset"""
+    model = ds.model or "Unknown"
+    system = ds.system or "Unknown"
+    domain = ds.domain or "Unknown"
+    background = ds.background or "Unknown"
+    frequency = ds.frequency or "Unknown"
+
+    return (
+        f"{model}/{system}/{domain}/{background}/{frequency}/"
+        f"{ds.name}/{ds.initialization_time}/{ds.loop}"
+    )
+
+
+def get_parquet_path(parquet_dir: Union[Path, str], ds: xr.Dataset) -> str:
+    """Return the path to the Parquet dataset for a diagnostic Dataset's variable"""
+    model = ds.model or "Unknown"
+    system = ds.system or "Unknown"
+    domain = ds.domain or "Unknown"
+    background = ds.background or "Unknown"
+    frequency = ds.frequency or "Unknown"
+
+    return os.path.join(
+        parquet_dir,
+        "_".join((model, background, system, domain, frequency)),
+        ds.name,
+    )
+
+
+def get_parquet_partition(parquet_dir: Union[Path, str], ds: xr.Dataset) -> str:
+    """Return the path to the Parquet partition for a diagnostic Dataset
+
+    The Parquet dataset for each variable is hive partitioned by the minimization
+    loop and the date of the initialization time, so that queries for a window of
+    time only read the files in that window.
+    """
+    return os.path.join(
+        get_parquet_path(parquet_dir, ds),
+        f"loop={ds.loop}",
+        f"initialization_date={ds.initialization_time[:10]}",
+    )
+
+
+def get_station_path(parquet_dir: Union[Path, str], ds: xr.Dataset) -> str:
+    """Return the path to the station-ordered Parquet dataset for a diagnostic
+    Dataset's variable
+    """
+    model_dir, variable = os.path.split(get_parquet_path(parquet_dir, ds))
+
+    return os.path.join(model_dir, "stations", variable)
+
+
+def prep_station_tables(table: pa.Table, loop: str) -> dict[int, pa.Table]:
+    """Split a table for the Parquet history into tables for the buckets of the
+    station-ordered dataset
+
+    Each table is sorted by station, and otherwise keeps the rows in their order in
+    `table`. Since the station-ordered dataset isn't partitioned by loop, the loop
+    is added as a column.
+
+    Parameters
+    ----------
+    table : pyarrow.Table
+        The table for a diagnostic Dataset, as returned by `prep_table`
+    loop : str
+        The minimization loop of the Dataset
+
+    Returns
+    -------
+    dict[int, pyarrow.Table]
+        The table for each bucket with observations, or an empty dict if the table
+        doesn't have station IDs
+    """
+    if "station_id" not in table.column_names or not len(table):
+        return {}
+
+    table = table.append_column(
+        "loop",
+        pa.DictionaryArray.from_arrays(
+            np.zeros(len(table), dtype="int32"), pa.array([loop], pa.string())
+        ),
+    )
+
+    # The buckets are found for each station rather than each row, and the codes
+    # of the sorted stations order the rows by station.
+    codes, station_ids = pd.factorize(
+        table["station_id"].to_numpy(zero_copy_only=False), sort=True
+    )
+    bucket = station.buckets(list(station_ids))[codes]
+    order = np.lexsort((codes, bucket))
+    buckets, starts = np.unique(bucket[order], return_index=True)
+    ends = [*starts[1:], len(order)]
+
+    return {
+        int(b): table.take(order[start:end])
+        for b, start, end in zip(buckets, starts, ends)
+    }
+
+
+def write_station_tables(
+    fs: fsspec.AbstractFileSystem,
+    station_path: str,
+    name: str,
+    tables: dict[int, pa.Table],
+) -> list[str]:
+    """Write the tables for the station buckets to the station-ordered dataset
+
+    Parameters
+    ----------
+    fs : fsspec.AbstractFileSystem
+        The filesystem the dataset is stored on
+    station_path : str
+        The path to the station-ordered dataset on `fs`
+    name : str
+        The name of the file written to each bucket
+    tables : dict[int, pyarrow.Table]
+        The table for each bucket, as returned by `prep_station_tables`
+
+    Returns
+    -------
+    list[str]
+        The paths to the files that were written
+    """
+    paths = []
+    for bucket, table in tables.items():
+        partition = f"{station_path}/station_bucket={bucket}"
+        fs.makedirs(partition, exist_ok=True)
+        pq.write_table(
+            table,
+            f"{partition}/{name}",
+            filesystem=fs,
+            row_group_size=STATION_ROW_GROUP_SIZE,
+            compression=PARQUET_COMPRESSION,
+        )
+        paths.append(f"{partition}/{name}")
+
+    return paths
+
+
+def append_station_tables(
+    fs: fsspec.AbstractFileSystem,
+    station_path: str,
+    name: str,
+    tables: dict[int, pa.Table],
+    writers: dict[int, pq.ParquetWriter],
+) -> list[str]:
+    """Append the tables for the station buckets to a file in each bucket
+
+    The file for a bucket is opened the first time it has a table, and stays open
+    in `writers` so that the tables of every slice of a diag file are written to
+    it. Each table is written as its own row groups. The writers must be closed
+    once every slice has been appended.
+
+    Parameters
+    ----------
+    fs : fsspec.AbstractFileSystem
+        The filesystem the dataset is stored on
+    station_path : str
+        The path to the station-ordered dataset on `fs`
+    name : str
+        The name of the file written to each bucket
+    tables : dict[int, pyarrow.Table]
+        The table for each bucket, as returned by `prep_station_tables`
+    writers : dict[int, pyarrow.parquet.ParquetWriter]
+        The open file for each bucket, which is updated with any new files
+
+    Returns
+    -------
+    list[str]
+        The paths to the files that were opened
+    """
+    paths = []
+    for bucket, table in tables.items():
+        if bucket not in writers:
+            partition = f"{station_path}/station_bucket={bucket}"
+            fs.makedirs(partition, exist_ok=True)
+            writers[bucket] = pq.ParquetWriter(
+                f"{partition}/{name}",
+                table.schema,
+                filesystem=fs,
+                compression=PARQUET_COMPRESSION,
+            )
+            paths.append(f"{partition}/{name}")
+
+        writers[bucket].write_table(table, row_group_size=STATION_ROW_GROUP_SIZE)
+
+    return paths
+
+
+def sort_table(table: pa.Table) -> pa.Table:
+    """Sort a table so that the used observations come first
+
+    The sort is stable, so observations are otherwise left in the order they appear
+    in the diag file.
+    """
+    return table.sort_by([("is_used", "descending")])
+
+
+def upsert_analysis(session: Session, ds: xr.Dataset) -> Analysis:
+    """Find or create the Analysis (and WeatherModel) records for a Dataset
+
+    New records are added to `session` but not committed, so that the caller can
+    decide when the analysis becomes visible.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+        SQLAlchemy database session
+    ds : xarray.Dataset
+        The diagnostic dataset being saved
+
+    Returns
+    -------
+    Analysis
+        The (possibly new) analysis record for the Dataset
+    """
+    model = ds.model or "Unknown"
+    system = ds.system or "Unknown"
+    domain = ds.domain or "Unknown"
+    background = ds.background or "Unknown"
+    frequency = ds.frequency or "Unknown"
+
+    analysis = None
+    wx_model = None
+    bg = session.scalar(
+        select(WeatherModel).where(
+            WeatherModel.name == background,
+            WeatherModel.background_id.is_(None),
+        )
+    )
+
+    if bg:
+        wx_model = session.scalar(
+            select(WeatherModel).where(
+                WeatherModel.name == model, WeatherModel.background_id == bg.id
+            )
+        )
+    else:
+        bg = WeatherModel(name=background)
+
+    if not wx_model:
+        wx_model = WeatherModel(name=model)
+        wx_model.background = bg
+        session.add(wx_model)
+
+    if wx_model.id:
+        analysis = session.scalar(
+            select(Analysis).where(
+                Analysis.time == datetime.fromisoformat(ds.initialization_time),
+                Analysis.system == system,
+                Analysis.frequency == frequency,
+                Analysis.domain == domain,
+                Analysis.model_id == wx_model.id,
+            )
+        )
+
+    if not analysis:
+        analysis = Analysis(
+            time=datetime.fromisoformat(ds.initialization_time),
+            system=system,
+            frequency=frequency,
+            domain=domain,
+        )
+        analysis.model = wx_model
+        session.add(analysis)
+
+    return analysis
+
+
+def get_statistics(ds: xr.Dataset) -> Statistics:
+    """Compute the summary statistics of the used O - F values in a Dataset
+
+    Vector components are summarized together, and missing values are skipped.
+    """
+    omf = ds["obs_minus_forecast_unadjusted"].transpose("nobs", ...).values
+    values = omf[ds["is_used"].values.astype(bool)]
+    values = values[~np.isnan(values)]
+
+    if not values.size:
+        return Statistics(0, 0.0, 0.0, None, None, sketch.build(values))
+
+    return Statistics(
+        int(values.size),
+        float(values.sum(dtype=np.float64)),
+        float(np.square(values, dtype=np.float64).sum()),
+        float(values.min()),
+        float(values.max()),
+        sketch.build(values),
+    )
+
+
+def merge_extreme(fn, x: Optional[float], y: Optional[float]) -> Optional[float]:
+    """Combine two minimums or maximums, either of which may be missing"""
+    return x if y is None else y if x is None else fn(x, y)
+
+
+def merge_statistics(a: Statistics, b: Statistics) -> Statistics:
+    """Combine the summary statistics of two sets of observations"""
+    return Statistics(
+        a.count + b.count,
+        a.sum + b.sum,
+        a.sum_squares + b.sum_squares,
+        merge_extreme(min, a.minimum, b.minimum),
+        merge_extreme(max, a.maximum, b.maximum),
+        sketch.merge([a.sketch, b.sketch]),
+    )
+
+
+def get_summary_totals(ds: xr.Dataset) -> dict[str, SummaryTotals]:
+    """Compute the running totals for the summary of each variable in a Dataset
+
+    Each component of a vector variable is summarized separately, with its name
+    appended to the variable's name (e.g. `observation_u`), like the columns
+    returned by the API.
+    """
+    used = ds["is_used"].values.astype(bool)
+
+    totals = {}
+    for name, data_array in ds.data_vars.items():
+        data_array = data_array.transpose("nobs", ...)
+        columns = (
+            {
+                f"{name}_{component}": data_array.sel(component=component).values
+                for component in data_array["component"].values
+            }
+            if "component" in data_array.dims
+            else {str(name): data_array.values}
+        )
+
+        for key, values in columns.items():
+            valid = ~np.isnan(values)
+            used_values = values[valid & used]
+
+            totals[key] = SummaryTotals(
+                int(valid.sum()),
+                int(used_values.size),
+                float(used_values.sum(dtype=np.float64)),
+                float(np.square(used_values, dtype=np.float64).sum()),
+                float(used_values.min()) if used_values.size else None,
+                float(used_values.max()) if used_values.size else None,
+            )
+
+    return totals
+
+
+def merge_summary_totals(
+    a: dict[str, SummaryTotals], b: dict[str, SummaryTotals]
+) -> dict[str, SummaryTotals]:
+    """Combine the running totals for the summaries of two slices of a diag file"""
+    return {
+        key: SummaryTotals(
+            a[key].count + b[key].count,
+            a[key].used_count + b[key].used_count,
+            a[key].sum + b[key].sum,
+            a[key].sum_squares + b[key].sum_squares,
+            merge_extreme(min, a[key].minimum, b[key].minimum),
+            merge_extreme(max, a[key].maximum, b[key].maximum),
+        )
+        for key in a
+    }
+
+
+def get_summary(totals: dict[str, SummaryTotals]) -> dict[str, dict]:
+    """Return the summary of each variable from its running totals
+
+    The summary has the number of observations with a value (`count`) and the
+    number of those that are used (`used_count`), and the `min`, `max`, `mean` and
+    (sample) `std` of the used values. Statistics that can't be computed, like the
+    mean of no values, are None.
+    """
+    summary = {}
+    for key, t in totals.items():
+        mean = t.sum / t.used_count if t.used_count else None
+        std = (
+            float(np.sqrt(max(t.sum_squares - t.sum * mean, 0.0) / (t.used_count - 1)))
+            if mean is not None and t.used_count > 1
+            else None
+        )
+
+        summary[key] = {
+            "count": t.count,
+            "used_count": t.used_count,
+            "min": t.minimum,
+            "max": t.maximum,
+            "mean": mean,
+            "std": std,
+        }
+
+    return summary
+
+
+def upsert_statistics(
+    session: Session, analysis: Analysis, ds: xr.Dataset, statistics: Statistics
+) -> AnalysisStatistics:
+    """Record the summary statistics for a Dataset's variable and loop
+
+    Any statistics already recorded for the variable and loop of the analysis are
+    replaced, so that saving a diag file again doesn't count it twice. The record
+    is added to `session` but not committed.
+    """
+    record = None
+    if analysis.id:
+        record = session.scalar(
+            select(AnalysisStatistics).where(
+                AnalysisStatistics.analysis_id == analysis.id,
+                AnalysisStatistics.variable == ds.name,
+                AnalysisStatistics.loop == ds.loop,
+            )
+        )
+
+    if not record:
+        record = AnalysisStatistics(variable=ds.name, loop=ds.loop)
+        record.analysis = analysis
+        session.add(record)
+
+    record.count = statistics.count
+    record.sum = statistics.sum
+    record.sum_squares = statistics.sum_squares
+    record.minimum = statistics.minimum
+    record.maximum = statistics.maximum
+    record.sketch = sketch.to_dict(statistics.sketch)
+
+    return record
+
+
+def save_zarr(
+    zarr_path: Union[Path, str],
+    ds: xr.Dataset,
+    encoding: EncodingPolicy = ENCODING_POLICIES["zstd"],
+):
+    """Write a diagnostic Dataset to its group in the Zarr
+
+    Any existing data in the group is replaced, and the index of used
+    observations, map aggregation pyramid, histograms and summary for the Dataset
+    are written along with it.
+
+    Parameters
+    ----------
+    zarr_path : Union[Path, str]
+        The path to the location of the Zarr
+    ds : xarray.Dataset
+        The dataset to save
+    encoding : EncodingPolicy
+        The chunking and compression used for the observation variables
+    """
+    logger.info(f"Saving dataset to Zarr at: {zarr_path}")
+    ds.to_zarr(
+        zarr_path,
+        group=get_group(ds),
+        mode="w",
+        consolidated=False,
+        encoding=get_zarr_encoding(ds, encoding),
+    )
+    save_index(zarr_path, ds, get_used_index(ds))
+    save_pyramid(zarr_path, ds, pyramid.build(ds))
+    save_histograms(zarr_path, ds, histogram.build(ds))
+    save_summary(zarr_path, ds, get_summary_totals(ds))
+
+
+def get_used_index(ds: xr.Dataset, offset: int = 0) -> np.ndarray:
+    """Return the positions of the used observations in a Dataset
+
+    Parameters
+    ----------
+    ds : xarray.Dataset
+        The diagnostic Dataset
+    offset : int
+        The position of the Dataset's first observation in its group, for slices
+        appended to a group (default is 0)
+    """
+    return np.flatnonzero(ds["is_used"].values) + offset
+
+
+def save_index(zarr_path: Union[Path, str], ds: xr.Dataset, used: np.ndarray):
+    """Write the positions of the used observations in a Dataset to the Zarr
+
+    The positions are written to the `used` variable of a child of the Dataset's
+    group, at `<group>/index`, replacing any existing index. Readers can select the
+    used observations from the group with them, rather than reading and masking
+    every observation.
+
+    Parameters
+    ----------
+    zarr_path : Union[Path, str]
+        The path to the location of the Zarr
+    ds : xarray.Dataset
+        The dataset the index was built from
+    used : numpy.ndarray
+        The positions of the used observations, as returned by `get_used_index`
+    """
+    xr.Dataset({"used": (["nused"], used)}).to_zarr(
+        zarr_path,
+        group=f"{get_group(ds)}/index",
+        mode="w",
+        consolidated=False,
+    )
+
+
+def save_summary(
+    zarr_path: Union[Path, str], ds: xr.Dataset, totals: dict[str, SummaryTotals]
+):
+    """Write the summary of each variable to the `summary` attribute of the
+    Dataset's group in the Zarr
+
+    Parameters
+    ----------
+    zarr_path : Union[Path, str]
+        The path to the location of the Zarr
+    ds : xarray.Dataset
+        The dataset that was summarized
+    totals : dict[str, SummaryTotals]
+        The running totals for each variable, as returned by `get_summary_totals`
+    """
+    group = zarr.open_group(str(zarr_path), mode="r+", path=get_group(ds))
+    group.attrs["summary"] = get_summary(totals)
+
+
+def save_pyramid(
+    zarr_path: Union[Path, str], ds: xr.Dataset, levels: list[pd.DataFrame]
+):
+    """Write the map aggregation pyramid for a diagnostic Dataset to the Zarr
+
+    Each level is written to a child of the Dataset's group, at
+    `<group>/pyramid/<level>`, replacing any existing level.
 
     Parameters
     ----------
+    zarr_path : Union[Path, str]
+        The path to the location of the Zarr
     ds : xarray.Dataset
-        The Dataset to convert to a DataFrame
+        The dataset the pyramid was built from
+    levels : list[pandas.DataFrame]
+        The levels of the pyramid, as returned by `pyramid.build`
     """
-    df = ds.to_dataframe()
+    for i, (level, resolution) in enumerate(zip(levels, pyramid.PYRAMID_RESOLUTIONS)):
+        pyramid.to_dataset(level, resolution).to_zarr(
+            zarr_path,
+            group=f"{get_group(ds)}/pyramid/{i}",
+            mode="w",
+            consolidated=False,
+        )
 
-    df["loop"] = ds.loop
-    df["initialization_time"] = datetime.fromisoformat(ds.initialization_time)
 
-    # FIXME: Clean the string columns Station_ID, Provider_Name, Subprovider_Name
+def save_histograms(
+    zarr_path: Union[Path, str], ds: xr.Dataset, histograms: dict[str, xr.Dataset]
+):
+    """Write the histograms for a diagnostic Dataset to the Zarr
 
-    return df
+    Each histogram is written to a child of the Dataset's group, at
+    `<group>/histogram/<variable>`, replacing any existing histogram.
+
+    Parameters
+    ----------
+    zarr_path : Union[Path, str]
+        The path to the location of the Zarr
+    ds : xarray.Dataset
+        The dataset the histograms were built from
+    histograms : dict[str, xarray.Dataset]
+        The histograms, as returned by `histogram.build`
+    """
+    for name, hist in histograms.items():
+        hist.to_zarr(
+            zarr_path,
+            group=f"{get_group(ds)}/histogram/{name}",
+            mode="w",
+            consolidated=False,
+        )
+
+
+def save_parquet(parquet_dir: Union[Path, str], ds: xr.Dataset):
+    """Append a diagnostic Dataset to the Parquet history for its model and variable,
+    and its observations with station IDs to the station-ordered dataset
+
+    Parameters
+    ----------
+    parquet_dir : Union[Path, str]
+        The path to the location where Parquet files are stored
+    ds : xarray.Dataset
+        The dataset to save
+    """
+    fs, partition = fsspec.core.url_to_fs(get_parquet_partition(parquet_dir, ds))
+    _, station_path = fsspec.core.url_to_fs(get_station_path(parquet_dir, ds))
+    name = f"{uuid.uuid4().hex}-0.parquet"
+    table = prep_table(ds)
+
+    logger.info(f"Saving table to Parquet at: {partition}/{name}")
+    fs.makedirs(partition, exist_ok=True)
+    pq.write_table(
+        sort_table(table),
+        f"{partition}/{name}",
+        filesystem=fs,
+        row_group_size=PARQUET_ROW_GROUP_SIZE,
+        compression=PARQUET_COMPRESSION,
+    )
+    write_station_tables(fs, station_path, name, prep_station_tables(table, ds.loop))
+
+
+def save_slices(
+    session: Session,
+    zarr_path: Union[Path, str],
+    parquet_dir: Union[Path, str],
+    slices: Iterable[xr.Dataset],
+    encoding: EncodingPolicy = ENCODING_POLICIES["zstd"],
+):
+    """Write a diag file to a Zarr, Parquet, and PostgreSQL one slice at a time
+
+    The first slice creates the group in the Zarr and every following slice is
+    appended to it along `nobs`. All of the slices are written to a single Parquet
+    file, with each slice sorted and written as its own row groups, which is only
+    moved into the Parquet dataset once every slice has been written. The same goes
+    for the file in each bucket of the station-ordered dataset. Only one
+    slice needs to be held in memory at a time, so memory use is bounded by the
+    size of the slices rather than the size of the file.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+        SQLAlchemy database session
+    zarr_path : Union[Path, str]
+        The path to the location of the Zarr
+    parquet_dir : Union[Path, str]
+        The path to the location where Parquet files are stored
+    slices : Iterable[xarray.Dataset]
+        The slices of a single diag file, as returned by `load_slices`
+    encoding : EncodingPolicy
+        The chunking and compression used for the Zarr (default is the "zstd"
+        policy in `ENCODING_POLICIES`)
+    """
+    logger.info("Started saving dataset slices to Zarr and the DB")
+
+    slice_iter = iter(slices)
+    first = next(slice_iter, None)
+    if first is None:
+        raise ValueError("No slices to save")
+
+    fs, partition = fsspec.core.url_to_fs(get_parquet_partition(parquet_dir, first))
+    _, station_path = fsspec.core.url_to_fs(get_station_path(parquet_dir, first))
+    name = f"{uuid.uuid4().hex}-0.parquet"
+
+    # Readers skip files that start with a ".", so the file stays hidden until every
+    # slice has been written to it. The station-ordered dataset gets a file in each
+    # bucket that has observations, which are also hidden until every slice has been
+    # written to them.
+    tmp_file = f"{partition}/.{name}"
+    station_files: list[str] = []
+    station_writers: dict[int, pq.ParquetWriter] = {}
+
+    try:
+        analysis = upsert_analysis(session, first)
+        statistics = get_statistics(first)
+        used = [get_used_index(first)]
+        levels = pyramid.build(first)
+        totals = get_summary_totals(first)
+        save_zarr(zarr_path, first, encoding)
+
+        logger.info(f"Saving table to Parquet at: {partition}/{name}")
+        fs.makedirs(partition, exist_ok=True)
+        with fs.open(tmp_file, "wb") as f:
+            table = prep_table(first)
+            station_files += append_station_tables(
+                fs,
+                station_path,
+                f".{name}",
+                prep_station_tables(table, first.loop),
+                station_writers,
+            )
+            table = sort_table(table)
+            with pq.ParquetWriter(
+                f, table.schema, compression=PARQUET_COMPRESSION
+            ) as writer:
+                writer.write_table(table, row_group_size=PARQUET_ROW_GROUP_SIZE)
+                offset = first.sizes["nobs"]
+
+                for ds in slice_iter:
+                    logger.info(f"Appending {ds.sizes['nobs']} observations")
+                    ds.to_zarr(
+                        zarr_path,
+                        group=get_group(ds),
+                        append_dim="nobs",
+                        consolidated=False,
+                    )
+                    table = prep_table(ds, offset)
+                    station_files += append_station_tables(
+                        fs,
+                        station_path,
+                        f".{name}",
+                        prep_station_tables(table, ds.loop),
+                        station_writers,
+                    )
+                    writer.write_table(
+                        sort_table(table),
+                        row_group_size=PARQUET_ROW_GROUP_SIZE,
+                    )
+                    statistics = merge_statistics(statistics, get_statistics(ds))
+                    used.append(get_used_index(ds, offset))
+                    levels = pyramid.merge(levels, pyramid.build(ds))
+                    totals = merge_summary_totals(totals, get_summary_totals(ds))
+                    offset += ds.sizes["nobs"]
+
+        for writer in station_writers.values():
+            writer.close()
+
+        # Replace the index, pyramid, summary and histograms written with the first
+        # slice with ones for every slice. The bins of the histograms depend on the
+        # range of every value, which is only known from the summary totals once
+        # every slice has been written, so the values are binned from the group in
+        # the Zarr one block at a time.
+        save_index(zarr_path, first, np.concatenate(used))
+        save_pyramid(zarr_path, first, levels)
+        save_summary(zarr_path, first, totals)
+        save_histograms(
+            zarr_path,
+            first,
+            histogram.build_blocks(
+                xr.open_zarr(zarr_path, group=get_group(first), consolidated=False),
+                {key: (t.minimum, t.maximum) for key, t in totals.items()},
+            ),
+        )
+        upsert_statistics(session, analysis, first, statistics)
+        fs.mv(tmp_file, f"{partition}/{name}")
+        for path in station_files:
+            directory, hidden = os.path.split(path)
+            fs.mv(path, f"{directory}/{hidden[1:]}")
+    except Exception:
+        logger.exception("Failed to save dataset slices, rolling back the database")
+        session.rollback()
+        for writer in station_writers.values():
+            writer.close()
+        for path in [tmp_file, *station_files]:
+            if fs.exists(path):
+                fs.rm(path)
+        raise
+
+    logger.info("Saving dataset to Database")
+    session.commit()
+
+    logger.info("Done saving dataset slices")
 
 
 def save(
@@ -252,6 +1412,9 @@ def save(
     zarr_path: Union[Path, str],
     parquet_dir: Union[Path, str],
     *args: xr.Dataset,
+    concurrent: bool = False,
+    max_workers: int = 2,
+    encoding: EncodingPolicy = ENCODING_POLICIES["zstd"],
 ):
     """Write one or more xarray Datasets to a Zarr, Parquet, and PostgreSQL
 
@@ -259,6 +1422,14 @@ def save(
     `initialization_time` (non-dimension) coordinates to define the group to
     which the Dataset is written in the Zarr.
 
+    The summary statistics of each Dataset are recorded in the database along with
+    its analysis.
+
+    In concurrent mode the Zarr and Parquet writes for each Dataset run on a
+    thread pool while the database records are prepared on the calling thread.
+    The database transaction is only committed once both writes have succeeded,
+    and is rolled back if either of them fails.
+
     Parameters
     ----------
     session : sqlalchemy.orm.Session
@@ -269,80 +1440,49 @@ def save(
         The path to the location where Parquet files are stored
     *args : xarray.Dataset
         One or more datasets to save
+    concurrent : bool
+        Write to the Zarr and Parquet concurrently (default is False)
+    max_workers : int
+        The maximum number of threads used for concurrent writes (default is 2)
+    encoding : EncodingPolicy
+        The chunking and compression used for the Zarr (default is the "zstd"
+        policy in `ENCODING_POLICIES`)
     """
     logger.info("Started saving dataset to Zarr and the DB")
-    for ds in args:
-        model = ds.model or "Unknown"
-        system = ds.system or "Unknown"
-        domain = ds.domain or "Unknown"
-        background = ds.background or "Unknown"
-        frequency = ds.frequency or "Unknown"
-        group = (
-            f"{model}/{system}/{domain}/{background}/{frequency}/"
-            f"{ds.name}/{ds.initialization_time}/{ds.loop}"
-        )
 
-        analysis = None
-        wx_model = None
-        bg = session.scalar(
-            select(WeatherModel).where(
-                WeatherModel.name == background,
-                WeatherModel.background_id.is_(None),
-            )
-        )
+    if not concurrent:
+        for ds in args:
+            analysis = upsert_analysis(session, ds)
+            upsert_statistics(session, analysis, ds, get_statistics(ds))
+            save_zarr(zarr_path, ds, encoding)
+            save_parquet(parquet_dir, ds)
 
-        if bg:
-            wx_model = session.scalar(
-                select(WeatherModel).where(
-                    WeatherModel.name == model, WeatherModel.background_id == bg.id
-                )
-            )
-        else:
-            bg = WeatherModel(name=background)
-
-        if not wx_model:
-            wx_model = WeatherModel(name=model)
-            wx_model.background = bg
-            session.add(wx_model)
-
-        if wx_model.id:
-            analysis = session.scalar(
-                select(Analysis).where(
-                    Analysis.time == datetime.fromisoformat(ds.initialization_time),
-                    Analysis.system == system,
-                    Analysis.frequency == frequency,
-                    Analysis.domain == domain,
-                    Analysis.model_id == wx_model.id,
-                )
-            )
+            logger.info("Saving dataset to Database")
+            session.commit()
 
-        if not analysis:
-            analysis = Analysis(
-                time=datetime.fromisoformat(ds.initialization_time),
-                system=system,
-                frequency=frequency,
-                domain=domain,
-            )
-            analysis.model = wx_model
-            session.add(analysis)
+            logger.info("Done saving dataset")
 
-        logger.info(f"Saving dataset to Zarr at: {zarr_path}")
-        ds.to_zarr(zarr_path, group=group, mode="a", consolidated=False)
+        return
 
-        parquet_path = os.path.join(
-            parquet_dir,
-            "_".join((model, background, system, domain, frequency)),
-            ds.name,
-        )
-        logger.info(f"Saving dataframe to Parquet at: {parquet_path}")
-        prep_dataframe(ds).to_parquet(
-            parquet_path,
-            engine="pyarrow",
-            index=True,
-            partition_cols=["loop"],
-        )
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for ds in args:
+            futures = [
+                executor.submit(save_zarr, zarr_path, ds, encoding),
+                executor.submit(save_parquet, parquet_dir, ds),
+            ]
+
+            try:
+                analysis = upsert_analysis(session, ds)
+                upsert_statistics(session, analysis, ds, get_statistics(ds))
+                for future in futures:
+                    future.result()
+            except Exception:
+                logger.exception("Failed to save dataset, rolling back the database")
+                wait(futures)
+                session.rollback()
+                raise
 
-        logger.info("Saving dataset to Database")
-        session.commit()
+            logger.info("Saving dataset to Database")
+            session.commit()
 
-        logger.info("Done saving dataset")
+            logger.info("Done saving dataset")
@@ -0,0 +1,211 @@
+import math
+from typing import Optional
+
+import numpy as np
+import xarray as xr
+
+# Histograms of the used O - F values in a diag file, binned the same way as the
+# distribution charts bin them by default, so that the charts for the unfiltered
+# data can be drawn without fetching every observation. Vector variables get a 2D
+# histogram of their components.
+HISTOGRAM_BINS = 160
+HISTOGRAM_2D_BINS = 50
+
+HISTOGRAM_VARIABLES = ["obs_minus_forecast_adjusted", "obs_minus_forecast_unadjusted"]
+
+# The number of observations binned at a time when the bins are known in advance,
+# which matches the Zarr chunks of the default encoding policies
+HISTOGRAM_BLOCK_SIZE = 262_144
+
+# The lowest and highest used values of each variable, or of each component of a
+# vector variable (e.g. `obs_minus_forecast_adjusted_u`), as tracked by the
+# summary totals of a diag file. None if there are no used values.
+Extents = dict[str, tuple[Optional[float], Optional[float]]]
+
+
+def tick_increment(start: float, stop: float, count: int) -> float:
+    """Return the step between nicely rounded ticks for a domain, like d3's
+    tickIncrement. The step is 1, 2 or 5 times a power of 10.
+    """
+    step = (stop - start) / count
+    power = math.floor(math.log10(step))
+    error = step / 10**power
+    factor = (
+        10
+        if error >= math.sqrt(50)
+        else 5 if error >= math.sqrt(10) else 2 if error >= math.sqrt(2) else 1
+    )
+
+    return factor * 10.0**power
+
+
+def nice_edges(lower: float, upper: float, count: int) -> np.ndarray:
+    """Return about `count` + 1 evenly spaced bin edges that cover a domain
+
+    The domain is extended to nicely rounded values, and the bin edges are the
+    ticks that d3's `scaleLinear().domain([lower, upper]).nice(count)` would make.
+    """
+    if not (np.isfinite(lower) and np.isfinite(upper)):
+        return np.array([0.0, 1.0])
+
+    if lower == upper:
+        return np.array([lower - 0.5, upper + 0.5])
+
+    step = None
+    for _ in range(10):
+        new_step = tick_increment(lower, upper, count)
+        if new_step == step:
+            break
+
+        step = new_step
+        lower = math.floor(lower / step) * step
+        upper = math.ceil(upper / step) * step
+
+    assert step is not None
+    ticks = np.arange(round(lower / step), round(upper / step) + 1)
+
+    # Dividing by the inverse of small steps avoids rounding errors in the edges
+    return ticks / (1 / step) if step < 1 else ticks * step
+
+
+def get_edges(
+    extent: tuple[Optional[float], Optional[float]], count: int
+) -> np.ndarray:
+    """Return the bin edges for values between the lowest and highest of an extent"""
+    lower, upper = extent
+
+    return nice_edges(
+        np.inf if lower is None else lower, -np.inf if upper is None else upper, count
+    )
+
+
+def histogram(values: np.ndarray, edges: Optional[np.ndarray] = None) -> xr.Dataset:
+    """Bin an array of values, with a `count` for each `bin` between the `edge`s
+
+    The edges are chosen from the range of the values, unless they're given.
+    """
+    values = values[~np.isnan(values)]
+    if edges is None:
+        edges = nice_edges(
+            values.min(initial=np.inf), values.max(initial=-np.inf), HISTOGRAM_BINS
+        )
+    count, _ = np.histogram(values, edges)
+
+    return xr.Dataset({"count": (["bin"], count)}, coords={"edge": edges})
+
+
+def histogram2d(
+    u: np.ndarray,
+    v: np.ndarray,
+    u_edges: Optional[np.ndarray] = None,
+    v_edges: Optional[np.ndarray] = None,
+) -> xr.Dataset:
+    """Bin the components of vectors, with a `count` for each `v_bin` and `u_bin`
+    between the `v_edge`s and `u_edge`s
+
+    The edges are chosen from the range of each component, unless they're given.
+    """
+    valid = ~(np.isnan(u) | np.isnan(v))
+    u = u[valid]
+    v = v[valid]
+
+    if u_edges is None:
+        u_edges = nice_edges(
+            u.min(initial=np.inf), u.max(initial=-np.inf), HISTOGRAM_2D_BINS
+        )
+    if v_edges is None:
+        v_edges = nice_edges(
+            v.min(initial=np.inf), v.max(initial=-np.inf), HISTOGRAM_2D_BINS
+        )
+    count, _, _ = np.histogram2d(v, u, [v_edges, u_edges])
+
+    return xr.Dataset(
+        {"count": (["v_bin", "u_bin"], count.astype(np.int64))},
+        coords={"u_edge": u_edges, "v_edge": v_edges},
+    )
+
+
+def build(ds: xr.Dataset, extents: Optional[Extents] = None) -> dict[str, xr.Dataset]:
+    """Bin the used O - F values in a Dataset for each of HISTOGRAM_VARIABLES
+
+    If the `extents` of the variables are given, the bins are chosen from them
+    rather than from the values, so that the histograms of the slices of a diag
+    file can be merged.
+    """
+    used = ds["is_used"].values.astype(bool)
+
+    result = {}
+    for name in HISTOGRAM_VARIABLES:
+        values = ds[name].transpose("nobs", ...).values[used]
+        if values.ndim > 1:
+            components = list(ds["component"].values)
+            result[name] = histogram2d(
+                values[:, components.index("u")],
+                values[:, components.index("v")],
+                *(
+                    (
+                        get_edges(extents[f"{name}_u"], HISTOGRAM_2D_BINS),
+                        get_edges(extents[f"{name}_v"], HISTOGRAM_2D_BINS),
+                    )
+                    if extents
+                    else ()
+                ),
+            )
+        else:
+            result[name] = histogram(
+                values, get_edges(extents[name], HISTOGRAM_BINS) if extents else None
+            )
+
+    return result
+
+
+def merge(a: dict[str, xr.Dataset], b: dict[str, xr.Dataset]) -> dict[str, xr.Dataset]:
+    """Add up the counts of histograms with the same bins"""
+    return {
+        name: a[name].assign(count=a[name]["count"] + b[name]["count"]) for name in a
+    }
+
+
+def build_blocks(
+    ds: xr.Dataset, extents: Extents, size: int = HISTOGRAM_BLOCK_SIZE
+) -> dict[str, xr.Dataset]:
+    """Bin the used O - F values in a Dataset `size` observations at a time
+
+    The bins are chosen from the `extents` of the variables, so a Dataset opened
+    lazily, like a group in the Zarr, only has one block of its arrays loaded at a
+    time.
+    """
+    ds = ds[["is_used", *HISTOGRAM_VARIABLES]]
+    result = build(ds.isel(nobs=slice(0, size)), extents)
+    for start in range(size, ds.sizes["nobs"], size):
+        result = merge(result, build(ds.isel(nobs=slice(start, start + size)), extents))
+
+    return result
+
+
+def to_records(hist: xr.Dataset) -> list[dict]:
+    """Return the non-empty bins of a histogram, with their bounds, like d3's bins"""
+    if "edge" in hist.coords:
+        edges = hist["edge"].values
+        count = hist["count"].values
+        (i,) = count.nonzero()
+
+        return [
+            {"x0": float(edges[j]), "x1": float(edges[j + 1]), "count": int(count[j])}
+            for j in i
+        ]
+
+    u_edges = hist["u_edge"].values
+    v_edges = hist["v_edge"].values
+    count = hist["count"].transpose("v_bin", "u_bin").values
+
+    return [
+        {
+            "x0": float(u_edges[col]),
+            "x1": float(u_edges[col + 1]),
+            "y0": float(v_edges[row]),
+            "y1": float(v_edges[row + 1]),
+            "count": int(count[row, col]),
+        }
+        for row, col in zip(*count.nonzero())
+    ]
@@ -1,7 +1,8 @@
 from datetime import datetime
+from typing import Optional
 
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import ForeignKey, MetaData, String, UniqueConstraint
+from sqlalchemy import JSON, ForeignKey, MetaData, String, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 # Naming conventions for constrant names. Defining these conventions makes the database
@@ -33,6 +34,10 @@ class Analysis(db.Model):  # type: ignore
     model_id: Mapped[int] = mapped_column(ForeignKey("weather_model.id"))
     model: Mapped["WeatherModel"] = relationship(back_populates="analysis_list")
 
+    statistics: Mapped[list["AnalysisStatistics"]] = relationship(
+        back_populates="analysis"
+    )
+
     def __str__(self) -> str:
         return (
             f"{self.time} {self.model} {self.frequency} "
@@ -66,3 +71,34 @@ class WeatherModel(db.Model):  # type: ignore
             f"WeatherModel(id={self.id}, name='{self.name}', "
             f"background_id={self.background_id})"
         )
+
+
+class AnalysisStatistics(db.Model):  # type: ignore
+    """Summary statistics of the used O - F values for a variable and loop of a model
+    run
+
+    The statistics can be merged, so that the statistics for a day or a week can be
+    computed from the statistics of each model run without reading the observations.
+    `sketch` is a quantile sketch of the values, as returned by `sketch.to_dict`.
+    """
+
+    __table_args__ = (UniqueConstraint("analysis_id", "variable", "loop"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    variable: Mapped[str] = mapped_column(String(8))
+    loop: Mapped[str] = mapped_column(String(8))
+    count: Mapped[int]
+    sum: Mapped[float]
+    sum_squares: Mapped[float]
+    minimum: Mapped[Optional[float]]
+    maximum: Mapped[Optional[float]]
+    sketch: Mapped[Optional[dict]] = mapped_column(JSON)
+
+    analysis_id: Mapped[int] = mapped_column(ForeignKey("analysis.id"))
+    analysis: Mapped[Analysis] = relationship(back_populates="statistics")
+
+    def __repr__(self) -> str:
+        return (
+            f"AnalysisStatistics(id={self.id}, analysis_id={self.analysis_id}, "
+            f"variable='{self.variable}', loop='{self.loop}', count={self.count})"
+        )
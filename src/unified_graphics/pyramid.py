@@ -0,0 +1,139 @@
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+# Map aggregation pyramids grid the O - F values of the used observations in a diag
+# file at several resolutions, so that a map of any extent can be drawn from a
+# bounded number of cells instead of every observation. Each level stores the
+# count, sum and sum of squares of the values in its cells, which can be merged
+# across slices of a diag file and turned into a mean or RMS when they're served.
+#
+# The resolutions are in degrees, from coarsest to finest.
+PYRAMID_RESOLUTIONS = [4.0, 1.0, 0.25]
+
+# The most cells a map should need, used to pick the finest level that fits a
+# viewport
+PYRAMID_MAX_CELLS = 4096
+
+PYRAMID_VARIABLES = ["obs_minus_forecast_adjusted", "obs_minus_forecast_unadjusted"]
+
+
+def get_values(ds: xr.Dataset, name: str) -> np.ndarray:
+    """Return the values of a variable for each observation in a Dataset
+
+    The values of vectors are their magnitudes, which are read from the
+    `<name>_magnitude` variable when the Dataset has one.
+    """
+    if f"{name}_magnitude" in ds:
+        return ds[f"{name}_magnitude"].values
+
+    values = ds[name].transpose("nobs", ...).values
+    if values.ndim > 1:
+        values = np.linalg.norm(values, axis=1)
+
+    return values
+
+
+def grid(
+    ds: xr.Dataset, resolution: float, variables: Sequence[str] = PYRAMID_VARIABLES
+) -> pd.DataFrame:
+    """Aggregate the values of `variables` for every observation in a Dataset into
+    cells
+
+    Vector values are aggregated by their magnitude.
+
+    Returns
+    -------
+    pandas.DataFrame
+        A row for each cell that has observations, indexed by the latitude and
+        longitude of the cell's center, with the count of observations and the sum
+        and sum of squares of each variable
+    """
+    row = np.floor(ds["latitude"].values / resolution).astype(np.int64)
+    col = np.floor(ds["longitude"].values / resolution).astype(np.int64)
+
+    # Cells are found by sorting a single integer key, which is much faster than
+    # grouping by the pair of coordinates.
+    cells, cell = np.unique((row << 32) + (col + 2**31), return_inverse=True)
+    cell_row = cells >> 32
+    cell_col = (cells & 0xFFFFFFFF) - 2**31
+
+    columns = {"count": np.bincount(cell, minlength=cells.size)}
+    for name in variables:
+        values = get_values(ds, name)
+        columns[f"{name}_sum"] = np.bincount(cell, values, minlength=cells.size)
+        columns[f"{name}_sum_squares"] = np.bincount(
+            cell, np.square(values), minlength=cells.size
+        )
+
+    index = pd.MultiIndex.from_arrays(
+        [(cell_row + 0.5) * resolution, (cell_col + 0.5) * resolution],
+        names=["latitude", "longitude"],
+    )
+
+    return pd.DataFrame(columns, index=index)
+
+
+def build(ds: xr.Dataset) -> list[pd.DataFrame]:
+    """Grid the used observations in a Dataset at each of PYRAMID_RESOLUTIONS"""
+    used = ds.isel(nobs=ds["is_used"].values.astype(bool))
+
+    return [grid(used, resolution) for resolution in PYRAMID_RESOLUTIONS]
+
+
+def merge(a: Sequence[pd.DataFrame], b: Sequence[pd.DataFrame]) -> list[pd.DataFrame]:
+    """Merge the levels of two pyramids, such as those for two slices of a file"""
+    return [
+        pd.concat([level_a, level_b]).groupby(level=["latitude", "longitude"]).sum()
+        for level_a, level_b in zip(a, b)
+    ]
+
+
+def to_dataset(level: pd.DataFrame, resolution: float) -> xr.Dataset:
+    """Return a pyramid level as a Dataset with a `cell` dimension for the Zarr"""
+    ds = xr.Dataset.from_dataframe(level.reset_index().rename_axis("cell"))
+    ds = ds.set_coords(["latitude", "longitude"])
+    ds.attrs["resolution"] = resolution
+
+    return ds
+
+
+def from_dataset(ds: xr.Dataset) -> pd.DataFrame:
+    """Return a pyramid level read from the Zarr as a DataFrame"""
+    return ds.to_dataframe().set_index(["latitude", "longitude"])
+
+
+def choose_level(
+    longitude: tuple[float, float],
+    latitude: tuple[float, float],
+    max_cells: int = PYRAMID_MAX_CELLS,
+) -> int:
+    """Return the index of the finest level with at most `max_cells` cells in the
+    viewport, or of the coarsest level if none of them fit
+    """
+    width = longitude[1] - longitude[0]
+    height = latitude[1] - latitude[0]
+
+    for i in reversed(range(len(PYRAMID_RESOLUTIONS))):
+        resolution = PYRAMID_RESOLUTIONS[i]
+        cells = np.ceil(width / resolution + 1) * np.ceil(height / resolution + 1)
+        if cells <= max_cells:
+            return i
+
+    return 0
+
+
+def summarize(
+    level: pd.DataFrame, variables: Sequence[str] = PYRAMID_VARIABLES
+) -> pd.DataFrame:
+    """Return the number of observations and the mean and RMS of each variable in
+    each cell
+    """
+    result = pd.DataFrame({"count": level["count"]}, index=level.index)
+    for name in variables:
+        result[name] = level[f"{name}_sum"] / level["count"]
+        result[f"{name}_rms"] = np.sqrt(level[f"{name}_sum_squares"] / level["count"])
+
+    return result.reset_index()
@@ -1,4 +1,6 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Optional
 
 from flask import (
     Blueprint,
@@ -10,9 +12,10 @@ from flask import (
     stream_template,
     url_for,
 )
+from werkzeug.datastructures import MultiDict
 from zarr.errors import FSPathExistNotDir, GroupNotFoundError  # type: ignore
 
-from unified_graphics import diag
+from unified_graphics import diag, pyramid
 from unified_graphics.models import db
 
 bp = Blueprint("api", __name__)
@@ -46,6 +49,30 @@ def handle_diag_file_read_error(e):
     return jsonify(msg="Unable to read diagnostic file"), 500
 
 
+@bp.errorhandler(diag.AggregationError)
+def handle_aggregation_error(e):
+    return jsonify(msg=str(e)), 400
+
+
+@bp.errorhandler(diag.ComparisonError)
+def handle_comparison_error(e):
+    return jsonify(msg=str(e)), 409
+
+
+def pop_max_cells(args: MultiDict) -> Optional[int]:
+    """Remove the max_cells parameter from a request's arguments
+
+    Returns the parameter, or PYRAMID_MAX_CELLS if it wasn't given, or None if it
+    isn't a positive integer.
+    """
+    try:
+        max_cells = int(args.pop("max_cells", pyramid.PYRAMID_MAX_CELLS))
+    except ValueError:
+        return None
+
+    return max_cells if max_cells > 0 else None
+
+
 @bp.route("/")
 def index():
     show_dialog = False
@@ -212,6 +239,20 @@ def magnitude(
     except ValueError:
         return jsonify(msg=f"Variable not found: '{variable}'"), 404
 
+    if v is diag.Variable.WIND:
+        data = diag.wind_magnitude(
+            current_app.config["DIAG_ZARR"],
+            model,
+            system,
+            domain,
+            background,
+            frequency,
+            initialization_time,
+            diag.MinimLoop(loop),
+            request.args,
+        )
+        return data.to_json(orient="records"), {"Content-Type": "application/json"}
+
     variable_diagnostics = getattr(diag, v.name.lower())
     data = variable_diagnostics(
         current_app.config["DIAG_ZARR"],
@@ -235,3 +276,368 @@ def magnitude(
     data = diag.magnitude(data)
 
     return data.to_json(orient="records"), {"Content-Type": "application/json"}
+
+
+@bp.route(
+    "/diag/<model>/<system>/<domain>/<background>/<frequency>"
+    "/<variable>/<initialization_time>/<loop>/grid/"
+)
+def grid(
+    model, system, domain, background, frequency, variable, initialization_time, loop
+):
+    try:
+        v = diag.Variable(variable)
+    except ValueError:
+        return jsonify(msg=f"Variable not found: '{variable}'"), 404
+
+    args = request.args.copy()
+    max_cells = pop_max_cells(args)
+    if max_cells is None:
+        return jsonify(msg="max_cells must be a positive integer"), 400
+
+    data, resolution = diag.grid(
+        current_app.config["DIAG_ZARR"],
+        model,
+        system,
+        domain,
+        background,
+        frequency,
+        v,
+        initialization_time,
+        diag.MinimLoop(loop),
+        args,
+        max_cells=max_cells,
+    )
+
+    return data.to_json(orient="records"), {
+        "Content-Type": "application/json",
+        "X-Grid-Resolution": str(resolution),
+    }
+
+
+@bp.route(
+    "/diag/<model>/<system>/<domain>/<background>/<frequency>"
+    "/<variable>/<initialization_time>/<loop>/histogram/"
+)
+def histogram(
+    model, system, domain, background, frequency, variable, initialization_time, loop
+):
+    try:
+        v = diag.Variable(variable)
+    except ValueError:
+        return jsonify(msg=f"Variable not found: '{variable}'"), 404
+
+    data = diag.histograms(
+        current_app.config["DIAG_ZARR"],
+        model,
+        system,
+        domain,
+        background,
+        frequency,
+        v,
+        initialization_time,
+        diag.MinimLoop(loop),
+        request.args,
+    )
+
+    return jsonify(data)
+
+
+@bp.route(
+    "/diag/<model>/<system>/<domain>/<background>/<frequency>"
+    "/<variable>/<initialization_time>/profile/"
+)
+def profile(
+    model, system, domain, background, frequency, variable, initialization_time
+):
+    try:
+        v = diag.Variable(variable)
+    except ValueError:
+        return jsonify(msg=f"Variable not found: '{variable}'"), 404
+
+    args = request.args.copy()
+    edges = diag.PROFILE_EDGES
+    if "edges" in args:
+        try:
+            edges = [float(edge) for edge in args.pop("edges").split(",")]
+        except ValueError:
+            return jsonify(msg="Pressure layer edges must be numbers"), 400
+
+        if len(edges) < 2:
+            return jsonify(msg="At least two pressure layer edges are required"), 400
+
+    data = diag.profile(
+        current_app.config["DIAG_ZARR"],
+        model,
+        system,
+        domain,
+        background,
+        frequency,
+        v,
+        initialization_time,
+        args,
+        edges,
+    )
+
+    if not data:
+        return jsonify(msg="Pressure profile not found"), 404
+
+    return jsonify(
+        {loop: layers.to_dict(orient="records") for loop, layers in data.items()}
+    )
+
+
+@bp.route(
+    "/diag/<model>/<system>/<domain>/<background>/<frequency>"
+    "/<variable>/<initialization_time>/stats/"
+)
+def stats(model, system, domain, background, frequency, variable, initialization_time):
+    try:
+        v = diag.Variable(variable)
+    except ValueError:
+        return jsonify(msg=f"Variable not found: '{variable}'"), 404
+
+    data = diag.stats(
+        current_app.config["DIAG_ZARR"],
+        model,
+        system,
+        domain,
+        background,
+        frequency,
+        v,
+        initialization_time,
+        request.args,
+    )
+
+    if not data:
+        return jsonify(msg="Diagnostic file group not found"), 404
+
+    return jsonify(data)
+
+
+@bp.route(
+    "/diag/<model>/<system>/<domain>/<background>/<frequency>"
+    "/<variable>/<initialization_time>/improvement/"
+)
+def improvement(
+    model, system, domain, background, frequency, variable, initialization_time
+):
+    try:
+        v = diag.Variable(variable)
+    except ValueError:
+        return jsonify(msg=f"Variable not found: '{variable}'"), 404
+
+    data, summary = diag.improvement(
+        current_app.config["DIAG_ZARR"],
+        model,
+        system,
+        domain,
+        background,
+        frequency,
+        v,
+        initialization_time,
+        request.args,
+    )
+
+    return jsonify(summary=summary, observations=data.to_dict(orient="records"))
+
+
+@bp.route(
+    "/diag/<model>/<system>/<domain>/<background>/<frequency>"
+    "/<variable>/<initialization_time>/<loop>/summary/"
+)
+def summary(
+    model, system, domain, background, frequency, variable, initialization_time, loop
+):
+    try:
+        v = diag.Variable(variable)
+    except ValueError:
+        return jsonify(msg=f"Variable not found: '{variable}'"), 404
+
+    data = diag.summary(
+        current_app.config["DIAG_ZARR"],
+        model,
+        system,
+        domain,
+        background,
+        frequency,
+        v,
+        initialization_time,
+        diag.MinimLoop(loop),
+    )
+
+    if data is None:
+        return jsonify(msg="Diagnostic summary not found"), 404
+
+    return jsonify(data)
+
+
+@bp.route(
+    "/history/<model>/<system>/<domain>/<background>/<frequency>/<variable>/<loop>/"
+)
+def daily_history(model, system, domain, background, frequency, variable, loop):
+    try:
+        v = diag.Variable(variable)
+    except ValueError:
+        return jsonify(msg=f"Variable not found: '{variable}'"), 404
+
+    start = request.args.get("start", type=datetime.fromisoformat)
+    end = request.args.get("end", type=datetime.fromisoformat)
+    if start is None or end is None:
+        return jsonify(msg="A start and end time are required"), 400
+
+    if end - start <= timedelta(days=diag.HISTORY_EXACT_DAYS):
+        summarize = partial(diag.daily_history, current_app.config["DIAG_PARQUET"])
+    else:
+        summarize = partial(diag.daily_statistics, db.session)
+
+    data = summarize(
+        model,
+        system,
+        domain,
+        background,
+        frequency,
+        v,
+        diag.MinimLoop(loop),
+        start,
+        end,
+    )
+
+    return data.to_json(orient="records", date_format="iso"), {
+        "Content-Type": "application/json"
+    }
+
+
+@bp.route(
+    "/station/<model>/<system>/<domain>/<background>/<frequency>/<variable>"
+    "/<station_id>/"
+)
+def station_history(model, system, domain, background, frequency, variable, station_id):
+    try:
+        v = diag.Variable(variable)
+    except ValueError:
+        return jsonify(msg=f"Variable not found: '{variable}'"), 404
+
+    params = {
+        "loop": request.args.get("loop", type=diag.MinimLoop),
+        "start": request.args.get("start", type=datetime.fromisoformat),
+        "end": request.args.get("end", type=datetime.fromisoformat),
+    }
+    invalid = [
+        key for key, value in params.items() if key in request.args and not value
+    ]
+    if invalid:
+        return jsonify(msg=f"Invalid parameters: {', '.join(invalid)}"), 400
+
+    data = diag.station_history(
+        current_app.config["DIAG_PARQUET"],
+        model,
+        system,
+        domain,
+        background,
+        frequency,
+        v,
+        station_id,
+        **params,
+    )
+
+    return data.to_json(orient="records", date_format="iso"), {
+        "Content-Type": "application/json"
+    }
+
+
+@bp.route("/compare/<variable>/<initialization_time>/<loop>/")
+def compare(variable, initialization_time, loop):
+    try:
+        v = diag.Variable(variable)
+    except ValueError:
+        return jsonify(msg=f"Variable not found: '{variable}'"), 404
+
+    args = request.args.copy()
+    models = []
+    for param in ["a", "b"]:
+        key = args.pop(param, "").split("/")
+        if len(key) != len(diag.ModelKey._fields):
+            return (
+                jsonify(
+                    msg=f"'{param}' must be model/system/domain/background/frequency"
+                ),
+                400,
+            )
+
+        models.append(diag.ModelKey(*key))
+
+    max_cells = None
+    if args.pop("grid", "false") == "true":
+        max_cells = pop_max_cells(args)
+        if max_cells is None:
+            return jsonify(msg="max_cells must be a positive integer"), 400
+
+    result = diag.compare(
+        current_app.config["DIAG_ZARR"],
+        *models,
+        v,
+        initialization_time,
+        diag.MinimLoop(loop),
+        args,
+        max_cells,
+    )
+
+    data = {"summary": result.summary}
+    if result.grid is not None:
+        data["grid"] = result.grid.to_dict(orient="records")
+        data["resolution"] = result.resolution
+
+    return jsonify(data)
+
+
+@bp.route(
+    "/aggregate/<model>/<system>/<domain>/<background>/<frequency>/<variable>/<loop>/"
+)
+def aggregate(model, system, domain, background, frequency, variable, loop):
+    try:
+        v = diag.Variable(variable)
+    except ValueError:
+        return jsonify(msg=f"Variable not found: '{variable}'"), 404
+
+    args = request.args.copy()
+    try:
+        start = datetime.fromisoformat(args.pop("start"))
+        end = datetime.fromisoformat(args.pop("end"))
+        limit = int(args["limit"]) if "limit" in args else None
+    except ValueError as e:
+        raise diag.AggregationError(f"Invalid aggregation parameter: {e}")
+
+    group_by = args.poplist("group_by")
+    metrics = args.poplist("metric")
+    sort = args.pop("sort", None)
+    args.pop("limit", None)
+
+    data = diag.aggregate(
+        current_app.config["DIAG_PARQUET"],
+        model,
+        system,
+        domain,
+        background,
+        frequency,
+        v,
+        diag.MinimLoop(loop),
+        start,
+        end,
+        group_by,
+        metrics,
+        args,
+        sort=sort,
+        limit=limit,
+        max_rows=current_app.config.get("AGGREGATE_MAX_ROWS", diag.AGGREGATE_MAX_ROWS),
+        max_bytes=current_app.config.get(
+            "AGGREGATE_MAX_BYTES", diag.AGGREGATE_MAX_BYTES
+        ),
+        max_groups=current_app.config.get(
+            "AGGREGATE_MAX_GROUPS", diag.AGGREGATE_MAX_GROUPS
+        ),
+    )
+
+    return data.to_json(orient="records", date_format="iso"), {
+        "Content-Type": "application/json"
+    }
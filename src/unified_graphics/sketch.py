@@ -0,0 +1,117 @@
+from collections import Counter, namedtuple
+from typing import Iterable
+
+import numpy as np
+
+# Quantile sketches summarize the distribution of any number of values in a small,
+# bounded amount of memory, and can be merged to summarize the values of several
+# sketches at once. Values are counted in buckets whose width grows logarithmically
+# with their magnitude, so every quantile is estimated to within
+# SKETCH_RELATIVE_ACCURACY of its true value. See Masson et al. (2019) "DDSketch: A
+# fast and fully-mergeable quantile sketch with relative-error guarantees".
+SKETCH_RELATIVE_ACCURACY = 0.01
+
+# Values smaller in magnitude than this are counted as zero
+SKETCH_MIN_VALUE = 1e-9
+
+_gamma = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+
+# The number of zeros and the counts in the buckets for the positive and negative
+# values, keyed by bucket index
+Sketch = namedtuple("Sketch", "zero positive negative")
+
+
+def _count_buckets(values: np.ndarray) -> dict[int, int]:
+    index = np.ceil(np.log(values) / np.log(_gamma)).astype(np.int64)
+    buckets, counts = np.unique(index, return_counts=True)
+
+    return dict(zip(buckets.tolist(), counts.tolist()))
+
+
+def build(values: np.ndarray) -> Sketch:
+    """Build a sketch of the distribution of `values`, which must not contain NaN"""
+    values = np.asarray(values, dtype=np.float64).ravel()
+
+    return Sketch(
+        int(np.count_nonzero(np.abs(values) < SKETCH_MIN_VALUE)),
+        _count_buckets(values[values >= SKETCH_MIN_VALUE]),
+        _count_buckets(-values[values <= -SKETCH_MIN_VALUE]),
+    )
+
+
+def merge(sketches: Iterable[Sketch]) -> Sketch:
+    """Merge sketches into a sketch of all of their values"""
+    zero = 0
+    positive: Counter[int] = Counter()
+    negative: Counter[int] = Counter()
+
+    for sketch in sketches:
+        zero += sketch.zero
+        positive.update(sketch.positive)
+        negative.update(sketch.negative)
+
+    return Sketch(zero, dict(positive), dict(negative))
+
+
+def quantiles(sketch: Sketch, q: Iterable[float]) -> list[float]:
+    """Estimate the quantiles `q` of the values in a sketch
+
+    Returns NaN for every quantile if the sketch is empty.
+    """
+    negative = sorted(sketch.negative.items(), reverse=True)
+    positive = sorted(sketch.positive.items())
+
+    # The value of each bucket is the one that minimizes the relative error for
+    # every value in it.
+    values = np.concatenate(
+        [
+            [-2 * _gamma**i / (_gamma + 1) for i, _ in negative],
+            [0.0] if sketch.zero else [],
+            [2 * _gamma**i / (_gamma + 1) for i, _ in positive],
+        ]
+    )
+    counts = np.cumsum(
+        [
+            *(c for _, c in negative),
+            *([sketch.zero] if sketch.zero else []),
+            *(c for _, c in positive),
+        ]
+    )
+
+    if not counts.size:
+        return [np.nan for _ in q]
+
+    ranks = np.asarray(list(q)) * (counts[-1] - 1)
+    return values[np.searchsorted(counts, ranks, side="right")].tolist()
+
+
+def to_dict(sketch: Sketch) -> dict:
+    """Return a sketch as a dictionary that can be stored as JSON"""
+    return {
+        "relative_accuracy": SKETCH_RELATIVE_ACCURACY,
+        "zero": sketch.zero,
+        "positive": sorted(sketch.positive.items()),
+        "negative": sorted(sketch.negative.items()),
+    }
+
+
+def from_dict(data: dict) -> Sketch:
+    """Return a sketch stored with `to_dict`
+
+    Raises
+    ------
+    ValueError
+        If the sketch was built with a different relative accuracy, since its
+        buckets can't be merged with the buckets of new sketches
+    """
+    if data["relative_accuracy"] != SKETCH_RELATIVE_ACCURACY:
+        raise ValueError(
+            f"Sketch has a relative accuracy of {data['relative_accuracy']}, "
+            f"expected {SKETCH_RELATIVE_ACCURACY}"
+        )
+
+    return Sketch(
+        data["zero"],
+        {i: c for i, c in data["positive"]},
+        {i: c for i, c in data["negative"]},
+    )
@@ -0,0 +1,25 @@
+import zlib
+from typing import Iterable
+
+import numpy as np
+
+# The observations of each station are stored in a station-ordered Parquet dataset
+# alongside the Parquet history, hive partitioned into STATION_BUCKETS buckets by a
+# hash of the station ID, so that the history of a station can be read from its
+# bucket alone, however many stations and model runs there are.
+STATION_BUCKETS = 32
+
+
+def buckets(station_ids: Iterable[str]) -> np.ndarray:
+    """Return the bucket of the station-ordered dataset for each station ID
+
+    Buckets are found with a CRC-32 of the station ID, which, unlike Python's
+    `hash`, is the same in every process.
+    """
+    return (
+        np.array(
+            [zlib.crc32(station_id.encode("utf-8")) for station_id in station_ids],
+            dtype=np.int64,
+        )
+        % STATION_BUCKETS
+    )
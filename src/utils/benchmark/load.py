@@ -0,0 +1,58 @@
+import argparse
+import gc
+import resource
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+from unified_graphics.etl import diag
+
+
+def measure(path: Path) -> tuple[float, int]:
+    """
+    Returns the time, in seconds, and the peak memory allocated, in bytes, to load
+    and transform a diag file.
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    diag.load(path).load()
+
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the time and memory used by etl.diag.load"
+    )
+    parser.add_argument(
+        "files",
+        type=Path,
+        nargs="+",
+        help="NetCDF diag files to load, like: ncdiag_conv_uv_ges.2023010204.nc4",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="The number of times each file is loaded",
+    )
+    args = parser.parse_args()
+
+    print(f"{'file':<60} {'time (s)':>10} {'peak (MiB)':>12}")
+    for path in args.files:
+        results = [measure(path) for _ in range(args.repeat)]
+        elapsed = statistics.median(r[0] for r in results)
+        peak = max(r[1] for r in results)
+
+        print(f"{path.name:<60} {elapsed:>10.3f} {peak / 2**20:>12.1f}")
+
+    # ru_maxrss is reported in KiB on Linux
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"\nPeak RSS of the process: {max_rss / 2**10:.1f} MiB")
@@ -0,0 +1,116 @@
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import xarray as xr
+
+from unified_graphics.etl import diag
+
+
+def stored_bytes(path: Path) -> int:
+    """Returns the total size of all the files under `path`"""
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def read_latency(zarr_path: Path, group: str, repeat: int) -> float:
+    """
+    Returns the median time, in seconds, to open a group and read every variable in
+    it, which is the access pattern used by the API.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        xr.open_zarr(zarr_path, group=group, consolidated=False).load()
+        timings.append(time.perf_counter() - start)
+
+    return statistics.median(timings)
+
+
+def max_error(expected: xr.Dataset, zarr_path: Path, group: str) -> dict[str, float]:
+    """
+    Returns the maximum absolute difference between each float variable in
+    `expected` and the values decoded from the Zarr.
+    """
+    result = xr.open_zarr(zarr_path, group=group, consolidated=False)
+
+    return {
+        str(name): float(abs(result[name] - expected[name]).max())
+        for name, variable in expected.variables.items()
+        if variable.dtype.kind == "f"
+    }
+
+
+def benchmark(path: Path, policies: list[str], repeat: int) -> None:
+    """
+    Writes a diag file to a temporary Zarr with each encoding policy and prints the
+    write time, stored size, and read latency for each of them, along with the
+    maximum error introduced by any lossy policies.
+    """
+    ds = diag.load(path).load()
+    group = diag.get_group(ds)
+
+    print(f"{path.name} ({ds.sizes['nobs']} observations)")
+    print(
+        f"{'policy':<20} {'write (s)':>10} {'bytes':>12} {'ratio':>7} {'read (s)':>10}"
+    )
+
+    errors = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in policies:
+            zarr_path = Path(tmp_dir) / f"{name}.zarr"
+
+            start = time.perf_counter()
+            diag.save_zarr(zarr_path, ds, diag.ENCODING_POLICIES[name])
+            write_time = time.perf_counter() - start
+
+            size = stored_bytes(zarr_path)
+            latency = read_latency(zarr_path, group, repeat)
+            errors[name] = max_error(ds, zarr_path, group)
+
+            print(
+                f"{name:<20} {write_time:>10.3f} {size:>12} "
+                f"{ds.nbytes / size:>7.2f} {latency:>10.4f}"
+            )
+
+    # Only lossy policies introduce any error, so leave the others out of the report
+    lossy = [name for name in policies if any(errors[name].values())]
+    if lossy:
+        print()
+        print(f"{'max abs error':<30}" + "".join(f" {name:>14}" for name in lossy))
+        for variable in errors[lossy[0]]:
+            print(
+                f"{variable:<30}"
+                + "".join(f" {errors[name][variable]:>14.3g}" for name in lossy)
+            )
+
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare Zarr encoding policies for diag files"
+    )
+    parser.add_argument(
+        "files",
+        type=Path,
+        nargs="+",
+        help="NetCDF diag files to benchmark, like: ncdiag_conv_uv_ges.2023010204.nc4",
+    )
+    parser.add_argument(
+        "--policy",
+        action="append",
+        choices=list(diag.ENCODING_POLICIES),
+        help="An encoding policy to benchmark, may be repeated (default is all)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="The number of times each group is read to measure latency",
+    )
+    args = parser.parse_args()
+
+    for path in args.files:
+        benchmark(path, args.policy or list(diag.ENCODING_POLICIES), args.repeat)
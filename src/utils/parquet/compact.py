@@ -0,0 +1,367 @@
+import argparse
+import posixpath
+import uuid
+from collections import defaultdict
+from typing import Any
+
+import fsspec  # type: ignore
+import pyarrow as pa  # type: ignore
+import pyarrow.compute as pc  # type: ignore
+import pyarrow.parquet as pq  # type: ignore
+
+from unified_graphics.etl import diag
+
+# Files are closed once they pass this size, so compacted files end up a little
+# larger than the target
+COMPACTION_TARGET_SIZE = 256 * 2**20
+
+
+def list_partitions(
+    fs: fsspec.AbstractFileSystem, parquet_dir: str
+) -> dict[str, list[str]]:
+    """
+    Returns the loop and initialization date partitions under `parquet_dir`, grouped
+    by the Parquet dataset for each model and variable.
+    """
+    datasets = defaultdict(list)
+    for partition in sorted(fs.glob(f"{parquet_dir}/*/*/loop=*/initialization_date=*")):
+        datasets[posixpath.dirname(posixpath.dirname(partition))].append(partition)
+
+    return dict(datasets)
+
+
+def list_station_buckets(fs: fsspec.AbstractFileSystem, parquet_dir: str) -> list[str]:
+    """
+    Returns the buckets of the station-ordered datasets under `parquet_dir`. Each
+    bucket is read as its own dataset, so each one is compacted and gets its own
+    `_metadata` file.
+    """
+    return sorted(fs.glob(f"{parquet_dir}/*/stations/*/station_bucket=*"))
+
+
+def list_files(fs: fsspec.AbstractFileSystem, partition: str) -> list[str]:
+    """
+    Returns the data files in a partition, skipping hidden files like those that are
+    still being written.
+    """
+    return sorted(
+        path
+        for path in fs.ls(partition, detail=False)
+        if path.endswith(".parquet")
+        and not posixpath.basename(path).startswith((".", "_"))
+    )
+
+
+def unify_schema(schemas: list[pa.Schema]) -> pa.Schema:
+    """
+    Returns a schema with every column in `schemas`, so that files written before a
+    column was added can be merged with newer files. The pandas metadata is taken
+    from the schema with the most columns.
+
+    Older files stored string columns, like the station IDs, as dictionary columns,
+    which can't be merged with the plain string columns of newer files, so columns
+    with both types are merged as plain strings. Parquet dictionary encodes their
+    pages either way.
+    """
+    widest = max(schemas, key=len)
+    types = defaultdict(set)
+    for schema in schemas:
+        for field in schema:
+            types[field.name].add(field.type)
+
+    decoded = [
+        pa.schema(
+            [
+                (
+                    field.with_type(field.type.value_type)
+                    if pa.types.is_dictionary(field.type) and len(types[field.name]) > 1
+                    else field
+                )
+                for field in schema
+            ]
+        )
+        for schema in schemas
+    ]
+    return pa.unify_schemas(decoded).with_metadata(widest.metadata)
+
+
+def conform(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """
+    Returns `table` with the columns in `schema`, filling any missing columns with
+    nulls.
+    """
+    columns = [
+        (
+            table[field.name].cast(field.type)
+            if field.name in table.column_names
+            else pa.nulls(len(table), field.type)
+        )
+        for field in schema
+    ]
+
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def compact_partition(
+    fs: fsspec.AbstractFileSystem,
+    partition: str,
+    files: list[str],
+    schema: pa.Schema,
+    target_size: int = COMPACTION_TARGET_SIZE,
+) -> list[str]:
+    """
+    Merges `files` into as few files of about `target_size` bytes as possible and
+    removes them. Returns the paths of the new files.
+
+    Files are merged one at a time, so only one of them is held in memory, and each
+    keeps its own row groups. The new files are written hidden and only renamed
+    into the partition once they are all complete, which is immediately followed by
+    removing the old files. Files added to the partition while it's being
+    compacted are left alone.
+    """
+    names: list[str] = []
+    f: Any = None
+    writer: Any = None
+
+    try:
+        for path in files:
+            if writer is None:
+                names.append(f"{uuid.uuid4().hex}-0.parquet")
+                f = fs.open(f"{partition}/.{names[-1]}", "wb")
+                writer = pq.ParquetWriter(
+                    f, schema, compression=diag.PARQUET_COMPRESSION
+                )
+
+            table = conform(pq.read_table(path, filesystem=fs), schema)
+            writer.write_table(table, row_group_size=diag.PARQUET_ROW_GROUP_SIZE)
+
+            if f.tell() >= target_size:
+                writer.close()
+                f.close()
+                f = writer = None
+    except Exception:
+        for name in names:
+            if fs.exists(f"{partition}/.{name}"):
+                fs.rm(f"{partition}/.{name}")
+        raise
+    finally:
+        if writer is not None:
+            writer.close()
+            f.close()
+
+    for name in names:
+        fs.mv(f"{partition}/.{name}", f"{partition}/{name}")
+    fs.rm(files)
+
+    return [f"{partition}/{name}" for name in names]
+
+
+def sort_stations(table: pa.Table) -> pa.Table:
+    """
+    Returns `table` sorted by station and initialization time. Dictionary columns
+    can't be sorted, so the order is found from the decoded station IDs.
+    """
+    keys = pa.table(
+        {
+            "station_id": table["station_id"].cast(pa.string()),
+            "initialization_time": table["initialization_time"],
+        }
+    )
+    order = pc.sort_indices(
+        keys,
+        sort_keys=[("station_id", "ascending"), ("initialization_time", "ascending")],
+    )
+
+    return table.unify_dictionaries().take(order).combine_chunks()
+
+
+def compact_bucket(
+    fs: fsspec.AbstractFileSystem,
+    bucket: str,
+    files: list[str],
+    schema: pa.Schema,
+    target_size: int = COMPACTION_TARGET_SIZE,
+) -> list[str]:
+    """
+    Merges the `files` in a bucket of a station-ordered dataset into as few files of
+    about `target_size` bytes as possible and removes them. Returns the paths of the
+    new files.
+
+    Unlike `compact_partition`, the rows of each new file are sorted by station
+    again, so that each station is in a few small row groups of each file rather
+    than a row group of every file that was merged. Files are read until they pass
+    `target_size` bytes on disk, so that many bytes are held in memory at a time.
+    The new files are hidden until they are all complete, as in
+    `compact_partition`.
+    """
+    groups: list[list[str]] = [[]]
+    size = 0
+    for path in files:
+        if size >= target_size:
+            groups.append([])
+            size = 0
+
+        groups[-1].append(path)
+        size += fs.size(path)
+
+    names = [f"{uuid.uuid4().hex}-0.parquet" for _ in groups]
+
+    try:
+        for name, group in zip(names, groups):
+            table = pa.concat_tables(
+                conform(pq.read_table(path, filesystem=fs), schema) for path in group
+            )
+            with fs.open(f"{bucket}/.{name}", "wb") as f:
+                pq.write_table(
+                    sort_stations(table),
+                    f,
+                    compression=diag.PARQUET_COMPRESSION,
+                    row_group_size=diag.STATION_ROW_GROUP_SIZE,
+                )
+    except Exception:
+        for name in names:
+            if fs.exists(f"{bucket}/.{name}"):
+                fs.rm(f"{bucket}/.{name}")
+        raise
+
+    for name in names:
+        fs.mv(f"{bucket}/.{name}", f"{bucket}/{name}")
+    fs.rm(files)
+
+    return [f"{bucket}/{name}" for name in names]
+
+
+def write_metadata(
+    fs: fsspec.AbstractFileSystem,
+    dataset_path: str,
+    partitions: list[str],
+    schema: pa.Schema,
+) -> str:
+    """
+    Writes a `_metadata` file to the root of a Parquet dataset with the footers of
+    every file in it, so that a scan can be planned by reading a single file.
+    Returns the path to the `_metadata` file.
+    """
+    collector = []
+    for partition in partitions:
+        for path in list_files(fs, partition):
+            metadata = pq.read_metadata(path, filesystem=fs)
+            metadata.set_file_path(posixpath.relpath(path, dataset_path))
+            collector.append(metadata)
+
+    # Readers skip hidden files, so the old summary is replaced in a single rename
+    # once the new one is complete.
+    metadata_path = f"{dataset_path}/_metadata"
+    pq.write_metadata(
+        schema,
+        f"{dataset_path}/._metadata",
+        metadata_collector=collector,
+        filesystem=fs,
+    )
+    fs.mv(f"{dataset_path}/._metadata", metadata_path)
+
+    return metadata_path
+
+
+def process_datasets(
+    parquet_dir: str, target_size: int = COMPACTION_TARGET_SIZE, dry_run: bool = True
+) -> None:
+    """
+    Compacts every partition under `parquet_dir` with more than one file, or with a
+    file that doesn't match the schema of the rest of its dataset, and writes a
+    `_metadata` file for each dataset. The buckets of the station-ordered datasets
+    are compacted the same way, each with its own `_metadata` file.
+    """
+    fs, path = fsspec.core.url_to_fs(parquet_dir)
+
+    for dataset_path, partitions in list_partitions(fs, path).items():
+        files = {partition: list_files(fs, partition) for partition in partitions}
+        schemas = {
+            file: pq.read_schema(file, filesystem=fs)
+            for partition_files in files.values()
+            for file in partition_files
+        }
+        if not schemas:
+            continue
+
+        schema = unify_schema(list(schemas.values()))
+        print(f"Compacting: {dataset_path} ({len(schemas)} files)")
+
+        for partition, partition_files in files.items():
+            if len(partition_files) == 1 and schemas[partition_files[0]].equals(schema):
+                continue
+
+            if dry_run:
+                print(f"Would compact {len(partition_files)} files in: {partition}")
+                continue
+
+            new_files = compact_partition(
+                fs, partition, partition_files, schema, target_size
+            )
+            print(
+                f"Compacted {len(partition_files)} files in: {partition} "
+                f"into {len(new_files)}"
+            )
+
+        if not dry_run:
+            print(f"Wrote: {write_metadata(fs, dataset_path, partitions, schema)}")
+
+    # Every ingest writes a file to most of the buckets of the station-ordered
+    # datasets, so without compaction the files read for a station would grow with
+    # the number of model runs in the archive.
+    for bucket in list_station_buckets(fs, path):
+        bucket_files = list_files(fs, bucket)
+        bucket_schemas = [pq.read_schema(file, filesystem=fs) for file in bucket_files]
+        if not bucket_schemas:
+            continue
+
+        schema = unify_schema(bucket_schemas)
+        if len(bucket_files) > 1 or not bucket_schemas[0].equals(schema):
+            if dry_run:
+                print(f"Would compact {len(bucket_files)} files in: {bucket}")
+                continue
+
+            new_files = compact_bucket(fs, bucket, bucket_files, schema, target_size)
+            print(
+                f"Compacted {len(bucket_files)} files in: {bucket} "
+                f"into {len(new_files)}"
+            )
+
+        if not dry_run:
+            print(f"Wrote: {write_metadata(fs, bucket, [bucket], schema)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Merge the small Parquet files written for each diag file into larger "
+            "files, and write a _metadata file for each dataset"
+        )
+    )
+    parser.add_argument(
+        "parquet_dir",
+        type=str,
+        help="The location of the Parquet files like: s3://my-s3-bucket/parquet",
+    )
+    parser.add_argument(
+        "--target-size",
+        type=int,
+        default=COMPACTION_TARGET_SIZE // 2**20,
+        help="The size, in MiB, of the compacted files",
+    )
+    parser.add_argument(
+        "--dry-run",
+        default=True,
+        required=False,
+        help="Do a dry run - list the partitions that would be compacted",
+        action=argparse.BooleanOptionalAction,
+    )
+    args = parser.parse_args()
+
+    if args.dry_run:
+        print(
+            "Dry run - Files won't be compacted. \n\n"
+            "Use --no-dry-run once you've confirmed the results are as desired.\n"
+        )
+
+    process_datasets(args.parquet_dir, args.target_size * 2**20, args.dry_run)
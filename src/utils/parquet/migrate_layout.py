@@ -0,0 +1,103 @@
+import argparse
+import posixpath
+import uuid
+
+import fsspec  # type: ignore
+import numpy as np
+import pyarrow as pa  # type: ignore
+import pyarrow.parquet as pq  # type: ignore
+
+from unified_graphics.etl import diag
+
+
+def list_files(fs: fsspec.AbstractFileSystem, parquet_dir: str) -> list[str]:
+    """
+    Returns the Parquet files that were written with the old layout, which were
+    partitioned by loop, but not by initialization date.
+    """
+    return [
+        path
+        for path in fs.glob(f"{parquet_dir}/*/*/loop=*/*.parquet")
+        if not posixpath.basename(path).startswith((".", "_"))
+    ]
+
+
+def migrate_file(fs: fsspec.AbstractFileSystem, path: str) -> list[str]:
+    """
+    Rewrites a Parquet file into the initialization date partitions of its loop and
+    removes it. Returns the paths of the new files.
+    """
+    loop_dir = posixpath.dirname(path)
+    table = pq.read_table(path, filesystem=fs)
+    dates = table["initialization_time"].to_numpy().astype("datetime64[D]")
+
+    # Every file is written hidden and only revealed once all of them are written, so
+    # a failed migration never leaves data in both layouts.
+    written = []
+    for date in np.unique(dates):
+        partition = f"{loop_dir}/initialization_date={date}"
+        name = f"{uuid.uuid4().hex}-0.parquet"
+
+        fs.makedirs(partition, exist_ok=True)
+        pq.write_table(
+            diag.sort_table(table.filter(pa.array(dates == date))),
+            f"{partition}/.{name}",
+            filesystem=fs,
+            row_group_size=diag.PARQUET_ROW_GROUP_SIZE,
+            compression=diag.PARQUET_COMPRESSION,
+        )
+        written.append((partition, name))
+
+    for partition, name in written:
+        fs.mv(f"{partition}/.{name}", f"{partition}/{name}")
+    fs.rm(path)
+
+    return [f"{partition}/{name}" for partition, name in written]
+
+
+def process_files(parquet_dir: str, dry_run: bool) -> None:
+    """
+    Migrates every Parquet file under `parquet_dir` that uses the old layout.
+    """
+    fs, path = fsspec.core.url_to_fs(parquet_dir)
+
+    files = list_files(fs, path)
+    print(f"Number of files to migrate: {len(files)}")
+
+    for file in files:
+        if dry_run:
+            print(f"Would migrate: {file}")
+            continue
+
+        for new_file in migrate_file(fs, file):
+            print(f"Migrated: {file} to {new_file}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Move Parquet files partitioned only by loop into partitions by loop and "
+            "initialization date"
+        )
+    )
+    parser.add_argument(
+        "parquet_dir",
+        type=str,
+        help="The location of the Parquet files like: s3://my-s3-bucket/parquet",
+    )
+    parser.add_argument(
+        "--dry-run",
+        default=True,
+        required=False,
+        help="Do a dry run - list the files that would be migrated",
+        action=argparse.BooleanOptionalAction,
+    )
+    args = parser.parse_args()
+
+    if args.dry_run:
+        print(
+            "Dry run - Files won't be migrated. \n\n"
+            "Use --no-dry-run once you've confirmed the results are as desired.\n"
+        )
+
+    process_files(args.parquet_dir, args.dry_run)
@@ -9,6 +9,7 @@ import alembic.config
 # https://github.com/pydata/xarray/issues/7259
 import netCDF4  # type: ignore # noqa: F401 # This needs to be imported before numpy
 import numpy as np
+import pandas as pd
 import pytest
 import sqlalchemy
 import xarray as xr
@@ -159,9 +160,13 @@ def diag_parquet(tmp_path):
         df = ds.to_dataframe()
         df["loop"] = ds.loop
         df["initialization_time"] = ds.initialization_time
+        df["initialization_date"] = pd.Timestamp(ds.initialization_time).date()
 
         df.to_parquet(
-            parquet_file, partition_cols=["loop"], index=True, engine="pyarrow"
+            parquet_file,
+            partition_cols=["loop", "initialization_date"],
+            index=True,
+            engine="pyarrow",
         )
 
         return parquet_file
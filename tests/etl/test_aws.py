@@ -115,7 +115,12 @@ def test_handler(
     mock_load.assert_called_once_with(mock_fetch_record.return_value)
     mock_create_engine.assert_called_once_with(db_uri)
     mock_save.assert_called_once_with(
-        mock_session().__enter__(), ug_zarr, ug_bucket, mock_load.return_value
+        mock_session().__enter__(),
+        ug_zarr,
+        ug_bucket,
+        mock_load.return_value,
+        concurrent=False,
+        encoding=aws.diag.ENCODING_POLICIES["zstd"],
     )
 
 
@@ -157,3 +162,75 @@ def test_handler_skip_second_loop(mock_fetch_record, mock_load, mock_save, monke
     mock_fetch_record.assert_not_called()
     mock_load.assert_not_called()
     mock_save.assert_not_called()
+
+
+@mock.patch("unified_graphics.etl.diag.save")
+@mock.patch("unified_graphics.etl.diag.load")
+@mock.patch("unified_graphics.etl.aws.fetch_record")
+@mock.patch("unified_graphics.etl.aws.Session")
+@mock.patch("unified_graphics.etl.aws.create_engine")
+def test_handler_encoding(
+    mock_create_engine,
+    mock_session,
+    mock_fetch_record,
+    mock_load,
+    mock_save,
+    monkeypatch,
+):
+    monkeypatch.setenv("UG_DIAG_ZARR", "s3://test-bucket/test.zarr")
+    monkeypatch.setenv("UG_DIAG_PARQUET", "s3://test-bucket/")
+    monkeypatch.setenv("FLASK_SQLALCHEMY_DATABASE_URI", "postgresql+psycopg://")
+    monkeypatch.setenv("UG_DIAG_ZARR_ENCODING", "zstd-bitshuffle")
+    monkeypatch.setenv("UG_DIAG_ZARR_CHUNK_SIZE", "1000")
+
+    event = {
+        "detail": {
+            "bucket": {"name": "s3://test-diag-bucket"},
+            "object": {"key": "diag_t_anl.202301300600.nc4.gz"},
+        }
+    }
+
+    aws.lambda_handler(event, {})
+
+    assert mock_save.call_args.kwargs["encoding"] == aws.diag.EncodingPolicy(
+        1000, "zstd", 3, aws.diag.Blosc.BITSHUFFLE
+    )
+
+
+@mock.patch("unified_graphics.etl.diag.save_slices")
+@mock.patch("unified_graphics.etl.diag.load_slices")
+@mock.patch("unified_graphics.etl.aws.fetch_record")
+@mock.patch("unified_graphics.etl.aws.Session")
+@mock.patch("unified_graphics.etl.aws.create_engine")
+def test_handler_slices(
+    mock_create_engine,
+    mock_session,
+    mock_fetch_record,
+    mock_load_slices,
+    mock_save_slices,
+    monkeypatch,
+):
+    ug_bucket = "s3://test-bucket/"
+    ug_zarr = f"{ug_bucket}test.zarr"
+    monkeypatch.setenv("UG_DIAG_ZARR", ug_zarr)
+    monkeypatch.setenv("UG_DIAG_PARQUET", ug_bucket)
+    monkeypatch.setenv("FLASK_SQLALCHEMY_DATABASE_URI", "postgresql+psycopg://")
+    monkeypatch.setenv("UG_DIAG_SLICE_SIZE", "100000")
+
+    event = {
+        "detail": {
+            "bucket": {"name": "s3://test-diag-bucket"},
+            "object": {"key": "diag_t_anl.202301300600.nc4.gz"},
+        }
+    }
+
+    aws.lambda_handler(event, {})
+
+    mock_load_slices.assert_called_once_with(mock_fetch_record.return_value, 100000)
+    mock_save_slices.assert_called_once_with(
+        mock_session().__enter__(),
+        ug_zarr,
+        ug_bucket,
+        mock_load_slices.return_value,
+        encoding=aws.diag.ENCODING_POLICIES["zstd"],
+    )
@@ -227,6 +227,173 @@ def test_get_data_array_vector(variable):
     xr.testing.assert_equal(result, exp)
 
 
+@pytest.mark.parametrize(
+    "variable,components,expected",
+    [
+        ("Observation", [], True),
+        ("Forecast_adjusted", [], False),
+        ("Observation", ["u", "v"], True),
+        ("Forecast_adjusted", ["u", "v"], False),
+    ],
+)
+def test_has_variable(variable, components, expected):
+    ds = xr.Dataset(
+        {
+            "Observation": (["nobs"], np.zeros((1,))),
+            "u_Observation": (["nobs"], np.zeros((1,))),
+            "v_Observation": (["nobs"], np.zeros((1,))),
+            "u_Forecast_adjusted": (["nobs"], np.zeros((1,))),
+        }
+    )
+
+    assert diag.has_variable(ds, variable, components) == expected
+
+
+@pytest.mark.parametrize(
+    "components,expected",
+    [
+        (
+            [],
+            [
+                "Observation",
+                "Latitude",
+                "Longitude",
+                "Analysis_Use_Flag",
+                "Station_ID",
+                "Pressure",
+            ],
+        ),
+        (
+            ["u", "v"],
+            [
+                "u_Observation",
+                "v_Observation",
+                "Latitude",
+                "Longitude",
+                "Analysis_Use_Flag",
+                "Station_ID",
+                "Pressure",
+            ],
+        ),
+    ],
+)
+def test_open_diag(tmp_path, components, expected):
+    path = tmp_path / "ncdiag_conv_uv_ges.2023010204.nc4"
+    xr.Dataset(
+        {
+            "Observation": (["nobs"], np.zeros((1,))),
+            "u_Observation": (["nobs"], np.zeros((1,))),
+            "v_Observation": (["nobs"], np.zeros((1,))),
+            "Latitude": (["nobs"], np.zeros((1,))),
+            "Longitude": (["nobs"], np.zeros((1,))),
+            "Analysis_Use_Flag": (["nobs"], np.zeros((1,))),
+            "Errinv_Input": (["nobs"], np.zeros((1,))),
+            "Station_ID": (["nobs", "Station_ID_maxstrlen"], np.zeros((1, 8), "S1")),
+            "Pressure": (["nobs"], np.zeros((1,))),
+        }
+    ).to_netcdf(path)
+
+    with diag.open_diag(path, components) as result:
+        assert sorted(result.variables) == sorted(expected)
+
+
+def test_compute_forecast():
+    observation = xr.DataArray(
+        np.array([[1.0, 2.0], [3.0, 4.0]]),
+        dims=["nobs", "component"],
+        coords={"component": ["u", "v"]},
+    )
+    obs_minus_forecast = xr.DataArray(
+        np.array([[0.5, 1.0], [-1.0, 0.0]]),
+        dims=["nobs", "component"],
+        coords={"component": ["u", "v"]},
+    )
+
+    result = diag.compute_forecast(observation, obs_minus_forecast)
+
+    xr.testing.assert_equal(
+        result,
+        xr.DataArray(
+            np.array([[0.5, 1.0], [4.0, 4.0]]),
+            dims=["nobs", "component"],
+            coords={"component": ["u", "v"]},
+        ),
+    )
+
+
+@pytest.mark.parametrize(
+    "values,expected,dtype",
+    [
+        (
+            np.array([b"KDEN    ", b"KBOU    ", b"KDEN    "]),
+            ["KDEN", "KBOU", "KDEN"],
+            "<U8",
+        ),
+        (np.array([b"MESONET", b"", b"NWS\x00"]), ["MESONET", "", "NWS"], "<U7"),
+        (np.array(["  WXUNDGRD "]), ["WXUNDGRD"], "<U11"),
+        (np.array([], dtype="S8"), [], "<U8"),
+    ],
+)
+def test_clean_strings(values, expected, dtype):
+    result = diag.clean_strings(values)
+
+    # The values keep the width of the diag file's strings
+    np.testing.assert_array_equal(result, np.array(expected, dtype=str))
+    assert result.dtype == dtype
+
+
+def test_load_string_coordinates(input_data, netcdf_path):
+    path = netcdf_path("t", "ges", "2022050514")
+    ds = input_data(
+        Forecast_adjusted=np.array([0, 1]),
+        Forecast_unadjusted=np.array([0, 1]),
+        Observation=np.array([1, 0]),
+        Analysis_Use_Flag=np.array([1, -1]),
+        Latitude=np.array([22, 23]),
+        Longitude=np.array([90, 91]),
+    )
+    ds["Station_ID"] = ("nobs", np.array([b"KDEN    ", b"KBOU    "]))
+    ds["Provider_Name"] = ("nobs", np.array([b"NWS     ", b"MESONET "]))
+    ds.to_netcdf(
+        path,
+        encoding={
+            "Station_ID": {"char_dim_name": "Station_ID_maxstrlen"},
+            "Provider_Name": {"char_dim_name": "Provider_Name_maxstrlen"},
+        },
+    )
+
+    result = diag.load(path)
+
+    np.testing.assert_array_equal(result["station_id"], ["KDEN", "KBOU"])
+    np.testing.assert_array_equal(result["provider_name"], ["NWS", "MESONET"])
+    assert "subprovider_name" not in result
+
+
+def test_load_numeric_coordinates(input_data, netcdf_path):
+    path = netcdf_path("t", "ges", "2022050514")
+    ds = input_data(
+        Forecast_adjusted=np.array([0, 1]),
+        Forecast_unadjusted=np.array([0, 1]),
+        Observation=np.array([1, 0]),
+        Analysis_Use_Flag=np.array([1, -1]),
+        Latitude=np.array([22, 23]),
+        Longitude=np.array([90, 91]),
+    )
+    ds["Observation_Type"] = ("nobs", np.array([120, 187], dtype="int32"))
+    ds["Pressure"] = ("nobs", np.array([850.0, 1013.25]))
+    ds["Time"] = ("nobs", np.array([-0.5, 0.25]))
+    ds.to_netcdf(path)
+
+    result = diag.load(path)
+
+    assert result["observation_type"].dtype == np.int16
+    np.testing.assert_array_equal(result["observation_type"], [120, 187])
+    assert result["pressure"].dtype == np.float32
+    np.testing.assert_array_equal(result["pressure"], [850.0, 1013.25])
+    np.testing.assert_array_equal(result["time_offset"], [-0.5, 0.25])
+    assert "height" not in result
+
+
 @pytest.mark.parametrize(
     "variable,loop,init_time,model,system,domain,frequency,background",
     [
@@ -307,6 +474,41 @@ class TestLoad:
         assert result.attrs == expected.attrs
 
 
+@pytest.mark.parametrize("slice_size", [1, 2, 3, 5])
+def test_load_slices(slice_size, input_data, netcdf_path):
+    path = netcdf_path("t", "ges", "2022050514")
+    input_data(
+        Forecast_adjusted=np.array([0.0, 1.0, 2.0]),
+        Forecast_unadjusted=np.array([0.0, 1.0, 2.0]),
+        Observation=np.array([1.0, 0.0, 4.0]),
+        Analysis_Use_Flag=np.array([1, -1, 1]),
+        Latitude=np.array([22.0, 23.0, 24.0]),
+        Longitude=np.array([90.0, 91.0, 270.0]),
+    ).to_netcdf(path)
+
+    result = list(diag.load_slices(path, slice_size))
+
+    assert [ds.sizes["nobs"] for ds in result[:-1]] == [slice_size] * (len(result) - 1)
+    xr.testing.assert_identical(xr.concat(result, dim="nobs"), diag.load(path))
+
+
+def test_load_slices_empty(input_data, netcdf_path):
+    path = netcdf_path("t", "ges", "2022050514")
+    input_data(
+        Forecast_adjusted=np.array([]),
+        Forecast_unadjusted=np.array([]),
+        Observation=np.array([]),
+        Analysis_Use_Flag=np.array([]),
+        Latitude=np.array([]),
+        Longitude=np.array([]),
+    ).to_netcdf(path)
+
+    result = list(diag.load_slices(path, 2))
+
+    assert len(result) == 1
+    assert result[0].sizes["nobs"] == 0
+
+
 class TestNoForecastScalar:
     @pytest.fixture(scope="class")
     def obs(self):
@@ -492,3 +694,24 @@ class TestNoForecastVector:
             dims=["nobs", "component"],
         )
         xr.testing.assert_equal(result["forecast_unadjusted"], expected)
+
+    @pytest.mark.parametrize(
+        "name,forecast",
+        [
+            ("observation", None),
+            ("obs_minus_forecast_adjusted", "fcst_adj"),
+            ("obs_minus_forecast_unadjusted", "fcst_un"),
+        ],
+    )
+    def test_magnitude(self, result, obs, lng, lat, used, name, forecast, request):
+        values = obs - request.getfixturevalue(forecast) if forecast else obs
+        expected = xr.DataArray(
+            np.linalg.norm(values, axis=1),
+            coords={
+                "longitude": ("nobs", lng),
+                "latitude": ("nobs", lat),
+                "is_used": ("nobs", used == 1),
+            },
+            dims=["nobs"],
+        )
+        xr.testing.assert_allclose(result[f"{name}_magnitude"], expected)
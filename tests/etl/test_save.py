@@ -2,13 +2,19 @@
 
 from datetime import datetime
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as pyarrow_dataset
+import pyarrow.parquet as pq
 import pytest
 import xarray as xr
+import zarr  # type: ignore
 from sqlalchemy import func, select
 
+from unified_graphics import histogram, pyramid, sketch, station
 from unified_graphics.etl import diag
-from unified_graphics.models import Analysis, WeatherModel
+from unified_graphics.models import Analysis, AnalysisStatistics, WeatherModel
 
 
 @pytest.fixture(scope="module")
@@ -39,11 +45,12 @@ def parquet_file(model, data_path):
 
 
 def dataset_to_table(dataset: xr.Dataset) -> pd.DataFrame:
-    df = dataset.to_dataframe()
+    df = dataset.to_dataframe(dim_order=dataset["observation"].dims)
     df["initialization_time"] = datetime.fromisoformat(dataset.initialization_time)
     df["loop"] = dataset.loop
+    df["initialization_date"] = dataset.initialization_time[:10]
 
-    return df.astype({"loop": "category"})
+    return df.astype({"loop": "category", "initialization_date": "category"})
 
 
 class TestSaveNew:
@@ -107,6 +114,26 @@ class TestSaveNew:
 
         assert analysis_count == 1
 
+    def test_statistics_created(self, session):
+        result = session.scalar(
+            select(AnalysisStatistics)
+            .join(AnalysisStatistics.analysis)
+            .where(
+                Analysis.time == datetime.fromisoformat("2022-05-05T14:00"),
+                AnalysisStatistics.variable == "ps",
+                AnalysisStatistics.loop == "anl",
+            )
+        )
+
+        # Only the first observation is used, with an O - F of 1
+        assert (
+            result.count,
+            result.sum,
+            result.sum_squares,
+            result.minimum,
+            result.maximum,
+        ) == (1, 1.0, 1.0, 1.0, 1.0)
+
 
 class TestAddVariable:
     @pytest.fixture(scope="class", autouse=True)
@@ -282,3 +309,604 @@ class TestAddAnalysis:
     def test_analysis_metadata(self, session):
         analysis_count = session.scalar(select(func.count()).select_from(Analysis))
         assert analysis_count == 2
+
+
+class TestSaveConcurrent:
+    @pytest.fixture(scope="class", autouse=True)
+    def dataset(self, model, test_dataset, session, data_path, zarr_file):
+        (mdl, system, domain, background, frequency) = model
+        ps = test_dataset(
+            variable="ps",
+            initialization_time="2022-05-05T14:00",
+            loop="anl",
+            model=mdl,
+            system=system,
+            domain=domain,
+            frequency=frequency,
+            background=background,
+        )
+
+        diag.save(session, zarr_file, data_path, ps, concurrent=True)
+
+        return ps
+
+    @pytest.fixture(scope="class")
+    def dataframe(self, dataset):
+        return dataset_to_table(dataset)
+
+    def test_zarr_created(self, model, dataset, zarr_file):
+        group = "/".join((*model, "ps", "2022-05-05T14:00", "anl"))
+        result = xr.open_zarr(zarr_file, group=group, consolidated=False)
+
+        xr.testing.assert_equal(result, dataset)
+
+    def test_parquet_created(self, dataframe, parquet_file):
+        result = pd.read_parquet(
+            parquet_file / "ps",
+            filters=(("loop", "=", "anl"),),
+        )
+
+        pd.testing.assert_frame_equal(result, dataframe)
+
+    def test_analysis_metadata(self, session):
+        analysis_count = session.scalar(select(func.count()).select_from(Analysis))
+        assert analysis_count == 2
+
+
+def test_save_concurrent_failure(model, test_dataset, session, tmp_path, monkeypatch):
+    (mdl, system, domain, background, frequency) = model
+    ps = test_dataset(
+        variable="ps",
+        initialization_time="2022-05-05T16:00",
+        loop="anl",
+        model=mdl,
+        system=system,
+        domain=domain,
+        frequency=frequency,
+        background=background,
+    )
+
+    def fail(*args):
+        raise OSError("Unable to write Parquet")
+
+    monkeypatch.setattr(diag, "save_parquet", fail)
+
+    with pytest.raises(OSError, match="Unable to write Parquet"):
+        diag.save(session, tmp_path / "diag.zarr", tmp_path, ps, concurrent=True)
+
+    analysis_count = session.scalar(
+        select(func.count())
+        .select_from(Analysis)
+        .where(Analysis.time == datetime.fromisoformat("2022-05-05T16:00"))
+    )
+
+    assert analysis_count == 0
+
+
+def test_get_zarr_encoding(test_dataset):
+    ds = test_dataset(
+        variable="uv",
+        observation=[[0, 1], [1, 0], [1, 1]],
+        forecast_unadjusted=[[0, 0], [1, 1], [0, 1]],
+        longitude=[90, 91, 92],
+        latitude=[22, 23, 24],
+        is_used=[True, True, False],
+        component=["u", "v"],
+    )
+    policy = diag.EncodingPolicy(2, "zstd", 3, 1, chunk_sizes={"is_used": 1})
+
+    result = diag.get_zarr_encoding(ds, policy)
+
+    assert "component" not in result
+    assert result["observation"]["chunks"] == (2, 2)
+    assert result["latitude"]["chunks"] == (2,)
+    assert result["is_used"]["chunks"] == (1,)
+    assert result["observation"]["compressor"] == diag.Blosc(
+        cname="zstd", clevel=3, shuffle=1
+    )
+
+
+def test_get_zarr_encoding_default(test_dataset):
+    result = diag.get_zarr_encoding(test_dataset(), diag.ENCODING_POLICIES["default"])
+
+    assert result == {}
+
+
+def test_save_zarr_encoding(test_dataset, tmp_path):
+    ds = test_dataset()
+    zarr_file = tmp_path / "diag.zarr"
+    policy = diag.EncodingPolicy(1, "zstd", 5, diag.Blosc.BITSHUFFLE)
+
+    diag.save_zarr(zarr_file, ds, policy)
+    # Saving the same group again replaces it rather than failing on the encoding
+    diag.save_zarr(zarr_file, ds, policy)
+
+    result = zarr.open_group(str(zarr_file), mode="r")[diag.get_group(ds)]
+    assert result["observation"].chunks == (1,)
+    assert result["observation"].compressor == diag.Blosc(
+        cname="zstd", clevel=5, shuffle=diag.Blosc.BITSHUFFLE
+    )
+    xr.testing.assert_equal(
+        xr.open_zarr(zarr_file, group=diag.get_group(ds), consolidated=False), ds
+    )
+
+
+def test_get_zarr_encoding_compact(test_dataset):
+    ds = test_dataset(longitude=[-179.5, 179.5], latitude=[-89.5, 89.5])
+    policy = diag.ENCODING_POLICIES["zstd-compact"]
+
+    result = diag.get_zarr_encoding(ds, policy)
+
+    assert result["observation"]["dtype"] == "float32"
+    assert result["obs_minus_forecast_adjusted"]["dtype"] == "float32"
+    assert "dtype" not in result["is_used"]
+    assert result["longitude"]["dtype"] == np.dtype("int32")
+    assert result["longitude"]["scale_factor"] == 2e-4
+    assert result["longitude"]["add_offset"] == 0.0
+
+
+@pytest.mark.parametrize("tolerance,dtype", ((0.01, "int16"), (1e-5, "int32")))
+def test_get_quantized_encoding(tolerance, dtype):
+    result = diag.get_quantized_encoding(180.0, tolerance)
+
+    assert result["dtype"] == np.dtype(dtype)
+    assert result["_FillValue"] == np.iinfo(dtype).min
+
+
+@pytest.mark.parametrize(
+    "variable,extra",
+    (
+        ("ps", {}),
+        (
+            "uv",
+            {
+                "observation": [[0, 1], [1, 0], [1, 1]],
+                "forecast_unadjusted": [[0, 0], [1, 1], [0, 1]],
+                "component": ["u", "v"],
+            },
+        ),
+    ),
+    scope="class",
+)
+class TestSaveSlices:
+    @pytest.fixture(scope="class", autouse=True)
+    def dataset(
+        self, model, test_dataset, session, data_path, zarr_file, variable, extra
+    ):
+        (mdl, system, domain, background, frequency) = model
+        ds = test_dataset(
+            variable=variable,
+            initialization_time="2022-05-05T14:00",
+            loop="anl",
+            model=mdl,
+            system=system,
+            domain=domain,
+            frequency=frequency,
+            background=background,
+            longitude=[90, 91, 92],
+            latitude=[22, 23, 24],
+            is_used=[True, False, True],
+            **{"observation": [1, 0, 2], "forecast_unadjusted": [0, 1, 1], **extra},
+        ).assign_coords(station_id=("nobs", ["KDEN", "KBOU", "KDEN"]))
+
+        slices = [ds.isel(nobs=slice(0, 2)), ds.isel(nobs=slice(2, 3))]
+        diag.save_slices(session, zarr_file, data_path, slices)
+
+        return ds
+
+    def test_zarr(self, model, dataset, zarr_file, variable):
+        group = "/".join((*model, variable, "2022-05-05T14:00", "anl"))
+        result = xr.open_zarr(zarr_file, group=group, consolidated=False)
+
+        xr.testing.assert_equal(result, dataset)
+
+    def test_parquet(self, dataset, parquet_file, variable):
+        result = pd.read_parquet(
+            parquet_file / variable,
+            filters=(("loop", "=", "anl"),),
+        )
+
+        pd.testing.assert_frame_equal(result, dataset_to_table(dataset))
+
+    def test_stations(self, dataset, parquet_file, variable):
+        result = pd.read_parquet(parquet_file / "stations" / variable)
+
+        assert not list((parquet_file / "stations").rglob(".*"))
+        assert sorted(result["station_id"].astype(str)) == sorted(
+            dataset_to_table(dataset)["station_id"]
+        )
+        assert set(result["loop"]) == {"anl"}
+
+    def test_station_files(self, parquet_file, variable):
+        # KDEN is in both slices, but its bucket only gets one file
+        for bucket in (parquet_file / "stations" / variable).iterdir():
+            assert len(list(bucket.glob("*.parquet"))) == 1
+
+    def test_analysis_metadata(self, session):
+        analysis_count = session.scalar(select(func.count()).select_from(Analysis))
+        assert analysis_count == 2
+
+    def test_index(self, model, zarr_file, variable):
+        group = "/".join((*model, variable, "2022-05-05T14:00", "anl"))
+
+        result = xr.open_zarr(zarr_file, group=f"{group}/index", consolidated=False)
+
+        np.testing.assert_array_equal(result["used"].values, [0, 2])
+
+    def test_pyramid(self, model, dataset, zarr_file, variable):
+        group = "/".join((*model, variable, "2022-05-05T14:00", "anl"))
+
+        for i, expected in enumerate(pyramid.build(dataset)):
+            result = xr.open_zarr(
+                zarr_file, group=f"{group}/pyramid/{i}", consolidated=False
+            )
+
+            assert result.attrs["resolution"] == pyramid.PYRAMID_RESOLUTIONS[i]
+            pd.testing.assert_frame_equal(pyramid.from_dataset(result), expected)
+
+    def test_histograms(self, model, dataset, zarr_file, variable):
+        group = "/".join((*model, variable, "2022-05-05T14:00", "anl"))
+
+        for name, expected in histogram.build(dataset).items():
+            result = xr.open_zarr(
+                zarr_file, group=f"{group}/histogram/{name}", consolidated=False
+            )
+
+            xr.testing.assert_equal(result, expected)
+
+    def test_summary(self, model, dataset, zarr_file, variable):
+        group = "/".join((*model, variable, "2022-05-05T14:00", "anl"))
+
+        result = zarr.open_group(str(zarr_file), mode="r", path=group).attrs
+
+        assert result["summary"] == diag.get_summary(diag.get_summary_totals(dataset))
+
+    def test_statistics(self, dataset, session, variable):
+        result = session.scalar(
+            select(AnalysisStatistics)
+            .join(AnalysisStatistics.analysis)
+            .where(
+                Analysis.time == datetime.fromisoformat("2022-05-05T14:00"),
+                AnalysisStatistics.variable == variable,
+                AnalysisStatistics.loop == "anl",
+            )
+        )
+
+        assert diag.Statistics(
+            result.count,
+            result.sum,
+            result.sum_squares,
+            result.minimum,
+            result.maximum,
+            sketch.from_dict(result.sketch),
+        ) == diag.get_statistics(dataset)
+
+
+def test_save_slices_string_coordinates(model, session, tmp_path):
+    (mdl, system, domain, background, frequency) = model
+    prefix = "_".join((mdl, system, domain, frequency))
+    path = tmp_path / f"{prefix}_ncdiag_conv_t_ges.2022050514.{background}.nc4"
+    # Later slices have longer station IDs than the first
+    xr.Dataset(
+        {
+            "Forecast_adjusted": (["nobs"], [0.0, 1.0, 2.0]),
+            "Forecast_unadjusted": (["nobs"], [0.0, 1.0, 2.0]),
+            "Obs_Minus_Forecast_adjusted": (["nobs"], [1.0, -1.0, 2.0]),
+            "Obs_Minus_Forecast_unadjusted": (["nobs"], [1.0, -1.0, 2.0]),
+            "Observation": (["nobs"], [1.0, 0.0, 4.0]),
+            "Analysis_Use_Flag": (["nobs"], [1, -1, 1]),
+            "Latitude": (["nobs"], [22.0, 23.0, 24.0]),
+            "Longitude": (["nobs"], [90.0, 91.0, 92.0]),
+            "Station_ID": (["nobs"], [b"KDEN    ", b"KBOU    ", b"CO123456"]),
+        }
+    ).to_netcdf(
+        path, encoding={"Station_ID": {"char_dim_name": "Station_ID_maxstrlen"}}
+    )
+
+    diag.save_slices(
+        session, tmp_path / "diag.zarr", tmp_path, diag.load_slices(path, 1)
+    )
+
+    result = xr.open_zarr(
+        tmp_path / "diag.zarr",
+        group="/".join((*model, "t", "2022-05-05T14:00", "ges")),
+        consolidated=False,
+    )
+    np.testing.assert_array_equal(result["station_id"], ["KDEN", "KBOU", "CO123456"])
+
+
+def test_save_slices_failure(model, test_dataset, session, tmp_path, monkeypatch):
+    (mdl, system, domain, background, frequency) = model
+    ds = test_dataset(
+        variable="ps",
+        initialization_time="2022-05-05T17:00",
+        loop="anl",
+        model=mdl,
+        system=system,
+        domain=domain,
+        frequency=frequency,
+        background=background,
+    )
+
+    def slices():
+        yield ds.isel(nobs=slice(0, 1))
+        raise OSError("Unable to read diag file")
+
+    with pytest.raises(OSError, match="Unable to read diag file"):
+        diag.save_slices(session, tmp_path / "diag.zarr", tmp_path, slices())
+
+    analysis_count = session.scalar(
+        select(func.count())
+        .select_from(Analysis)
+        .where(Analysis.time == datetime.fromisoformat("2022-05-05T17:00"))
+    )
+
+    assert analysis_count == 0
+    parquet_files = (tmp_path / "RTMA_HRRR_WCOSS_CONUS_REALTIME" / "ps").rglob("*")
+    assert not [path for path in parquet_files if path.is_file()]
+
+
+@pytest.mark.parametrize("offset", [0, 10])
+def test_prep_table(offset, test_dataset):
+    ds = test_dataset(
+        variable="uv",
+        observation=[[0, 1], [1, 0]],
+        forecast_unadjusted=[[0, 0], [1, 1]],
+        component=["u", "v"],
+    )
+    expected = dataset_to_table(ds).drop(columns=["loop", "initialization_date"])
+    expected.index = expected.index.set_levels(
+        expected.index.levels[0] + offset, level="nobs"
+    )
+
+    result = diag.prep_table(ds, offset).to_pandas()
+
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_prep_table_magnitude(test_dataset):
+    ds = test_dataset(
+        variable="uv",
+        observation=[[0, 1], [1, 0]],
+        forecast_unadjusted=[[0, 0], [1, 1]],
+        component=["u", "v"],
+    )
+    expected = dataset_to_table(ds).drop(columns=["loop", "initialization_date"])
+
+    result = diag.prep_table(
+        ds.assign(observation_magnitude=("nobs", [1.0, 1.0]))
+    ).to_pandas()
+
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_prep_table_strings(test_dataset):
+    ds = test_dataset(variable="t").assign_coords(
+        station_id=("nobs", ["KDEN", "KBOU"]),
+        provider_name=("nobs", ["NWS", "NWS"]),
+    )
+    expected = dataset_to_table(ds).drop(columns=["loop", "initialization_date"])
+
+    result = diag.prep_table(ds)
+
+    # Strings are plain columns, which Parquet dictionary encodes on disk
+    assert result.schema.field("station_id").type == pa.string()
+    assert result.schema.field("provider_name").type == pa.string()
+    pd.testing.assert_frame_equal(result.to_pandas(), expected)
+
+
+def test_prep_station_tables(test_dataset):
+    ds = test_dataset(
+        observation=[1, 2, 3, 4],
+        forecast_unadjusted=[0, 0, 0, 0],
+        longitude=[90, 91, 92, 93],
+        latitude=[22, 23, 24, 25],
+        is_used=[True, True, False, True],
+    ).assign_coords(station_id=("nobs", ["KDEN", "KBOU", "KDEN", "72469"]))
+
+    result = diag.prep_station_tables(diag.prep_table(ds), "ges")
+
+    rows = pd.concat(table.to_pandas() for table in result.values())
+    assert sorted(rows["observation"]) == [1, 2, 3, 4]
+    for bucket, table in result.items():
+        stations = table["station_id"].to_pylist()
+        assert stations == sorted(stations)
+        assert set(station.buckets(stations)) == {bucket}
+        assert set(table["loop"].to_pylist()) == {"ges"}
+
+    # Observations of the same station keep their order
+    kden = rows[rows["station_id"] == "KDEN"]
+    assert kden["observation"].tolist() == [1, 3]
+
+
+def test_prep_station_tables_without_stations(test_dataset):
+    assert diag.prep_station_tables(diag.prep_table(test_dataset()), "ges") == {}
+
+
+def test_save_parquet_stations(test_dataset, tmp_path):
+    ds = test_dataset(variable="t", loop="anl").assign_coords(
+        station_id=("nobs", ["KDEN", "KBOU"])
+    )
+
+    diag.save_parquet(tmp_path, ds)
+
+    stations = tmp_path / "RTMA_HRRR_WCOSS_CONUS_REALTIME" / "stations" / "t"
+    for station_id in ["KDEN", "KBOU"]:
+        (bucket,) = station.buckets([station_id])
+        (parquet_file,) = (stations / f"station_bucket={bucket}").glob("*.parquet")
+        result = pd.read_parquet(parquet_file)
+
+        assert station_id in result["station_id"].tolist()
+
+
+def test_save_parquet_stations_row_groups(test_dataset, tmp_path, monkeypatch):
+    monkeypatch.setattr(diag, "STATION_ROW_GROUP_SIZE", 1)
+    # Stations that share a bucket, so they're written to the same file
+    station_ids = [
+        station_id
+        for station_id in (f"S{i:04d}" for i in range(1000))
+        if station.buckets([station_id])[0] == 0
+    ][:4]
+    ds = test_dataset(
+        variable="t",
+        longitude=[90, 91, 92, 93],
+        latitude=[22, 23, 24, 25],
+        is_used=[True, True, True, True],
+        observation=[1, 2, 3, 4],
+        forecast_unadjusted=[0, 0, 0, 0],
+    ).assign_coords(station_id=("nobs", station_ids))
+
+    diag.save_parquet(tmp_path, ds)
+
+    bucket = (
+        tmp_path
+        / "RTMA_HRRR_WCOSS_CONUS_REALTIME"
+        / "stations"
+        / "t"
+        / "station_bucket=0"
+    )
+    (fragment,) = pyarrow_dataset.dataset(bucket, format="parquet").get_fragments()
+    row_groups = fragment.split_by_row_group(
+        pyarrow_dataset.field("station_id") == station_ids[2]
+    )
+
+    # The station IDs are plain strings, so their statistics are used to skip the
+    # row groups of the other stations
+    assert fragment.physical_schema.field("station_id").type == pa.string()
+    assert len(row_groups) == 1
+
+
+def test_save_parquet_layout(test_dataset, tmp_path):
+    ds = test_dataset(
+        variable="ps",
+        initialization_time="2022-05-05T14:00",
+        loop="anl",
+        longitude=[90, 91, 92],
+        latitude=[22, 23, 24],
+        is_used=[False, True, True],
+        observation=[1, 0, 2],
+        forecast_unadjusted=[0, 1, 1],
+    )
+
+    diag.save_parquet(tmp_path, ds)
+
+    partition = (
+        tmp_path
+        / "RTMA_HRRR_WCOSS_CONUS_REALTIME"
+        / "ps"
+        / "loop=anl"
+        / "initialization_date=2022-05-05"
+    )
+    (parquet_file,) = partition.glob("*.parquet")
+    metadata = pq.ParquetFile(parquet_file).metadata
+    result = pq.read_table(parquet_file).to_pandas()
+
+    assert metadata.row_group(0).column(0).compression == "ZSTD"
+    assert result["is_used"].tolist() == [True, True, False]
+    assert result.index.tolist() == [1, 2, 0]
+
+
+@pytest.mark.parametrize(
+    "extra,expected",
+    (
+        (
+            {"is_used": [True, False, True]},
+            diag.Statistics(2, 3.0, 5.0, 1.0, 2.0, sketch.build([1, 2])),
+        ),
+        (
+            {"is_used": [False, False, False]},
+            diag.Statistics(0, 0.0, 0.0, None, None, sketch.build([])),
+        ),
+        (
+            {
+                "is_used": [True, True, False],
+                "observation": [[1, 2], [3, 4], [5, 6]],
+                "forecast_unadjusted": [[0, 0], [0, 0], [0, 0]],
+                "component": ["u", "v"],
+            },
+            diag.Statistics(4, 10.0, 30.0, 1.0, 4.0, sketch.build([1, 2, 3, 4])),
+        ),
+    ),
+)
+def test_get_statistics(extra, expected, test_dataset):
+    ds = test_dataset(
+        **{
+            "longitude": [90, 91, 92],
+            "latitude": [22, 23, 24],
+            "observation": [1, np.nan, 2],
+            "forecast_unadjusted": [0, 0, 0],
+            **extra,
+        }
+    )
+
+    assert diag.get_statistics(ds) == expected
+
+
+def test_merge_statistics():
+    result = diag.merge_statistics(
+        diag.Statistics(2, 3.0, 5.0, 1.0, 2.0, sketch.build([1, 2])),
+        diag.Statistics(1, -1.0, 1.0, -1.0, -1.0, sketch.build([-1])),
+    )
+    empty = diag.Statistics(0, 0.0, 0.0, None, None, sketch.build([]))
+
+    assert result == diag.Statistics(3, 2.0, 6.0, -1.0, 2.0, sketch.build([1, 2, -1]))
+    assert diag.merge_statistics(empty, result) == result
+
+
+def test_get_summary(test_dataset):
+    ds = test_dataset(
+        longitude=[90, 91, 92, 93],
+        latitude=[22, 23, 24, 25],
+        is_used=[True, True, False, True],
+        observation=[1, 3, 10, np.nan],
+        forecast_unadjusted=[0, 0, 0, 0],
+    )
+
+    result = diag.get_summary(diag.get_summary_totals(ds))
+
+    assert result["observation"] == {
+        "count": 3,
+        "used_count": 2,
+        "min": 1.0,
+        "max": 3.0,
+        "mean": 2.0,
+        "std": np.sqrt(2),
+    }
+    assert result["forecast_unadjusted"]["count"] == 4
+
+
+def test_get_summary_vector(test_dataset):
+    ds = test_dataset(
+        is_used=[True, False],
+        observation=[[1, 2], [3, 4]],
+        forecast_unadjusted=[[0, 0], [0, 0]],
+        component=["u", "v"],
+    )
+
+    result = diag.get_summary(diag.get_summary_totals(ds))
+
+    assert result["obs_minus_forecast_adjusted_v"] == {
+        "count": 2,
+        "used_count": 1,
+        "min": 2.0,
+        "max": 2.0,
+        "mean": 2.0,
+        "std": None,
+    }
+
+
+def test_merge_summary_totals(test_dataset):
+    ds = test_dataset(
+        longitude=[90, 91, 92],
+        latitude=[22, 23, 24],
+        is_used=[True, False, True],
+        observation=[1, 0, 2],
+        forecast_unadjusted=[0, 1, 1],
+    )
+
+    result = diag.merge_summary_totals(
+        diag.get_summary_totals(ds.isel(nobs=slice(0, 2))),
+        diag.get_summary_totals(ds.isel(nobs=slice(2, 3))),
+    )
+
+    assert result == diag.get_summary_totals(ds)
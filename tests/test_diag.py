@@ -4,6 +4,7 @@ from functools import partial
 
 import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 import pytest
 import xarray as xr
 from botocore.session import Session
@@ -11,7 +12,8 @@ from moto.server import ThreadedMotoServer
 from s3fs import S3FileSystem, S3Map
 from werkzeug.datastructures import MultiDict
 
-from unified_graphics import diag
+from unified_graphics import diag, sketch
+from unified_graphics.etl import diag as etl_diag
 from unified_graphics.models import Analysis, WeatherModel
 
 # Global resources for s3
@@ -155,6 +157,155 @@ def test_open_diagnostic(tmp_path, test_dataset):
     xr.testing.assert_equal(result, expected)
 
 
+class TestOpenFiltered:
+    @pytest.fixture
+    def dataset(self, test_dataset):
+        return test_dataset(
+            variable="t",
+            observation=[1, 2, 3],
+            forecast_unadjusted=[0, 0, 0],
+            longitude=[90, 91, 92],
+            latitude=[22, 23, 24],
+            is_used=[True, False, True],
+        )
+
+    @pytest.fixture
+    def diag_zarr_file(self, tmp_path, dataset):
+        path = str(tmp_path / "test_diag.zarr")
+        dataset.to_zarr(path, group=self.group(dataset), consolidated=False)
+
+        return path
+
+    def group(self, ds):
+        return "/".join(
+            (
+                ds.model,
+                ds.system,
+                ds.domain,
+                ds.background,
+                ds.frequency,
+                ds.name,
+                ds.initialization_time,
+                ds.loop,
+            )
+        )
+
+    def open_filtered(self, diag_zarr_file, dataset, filters, variables=None):
+        return diag.open_filtered(
+            diag_zarr_file,
+            dataset.model,
+            dataset.system,
+            dataset.domain,
+            dataset.background,
+            dataset.frequency,
+            diag.Variable(dataset.name),
+            dataset.initialization_time,
+            diag.MinimLoop(dataset.loop),
+            MultiDict(filters),
+            variables,
+        )
+
+    def test_without_index(self, diag_zarr_file, dataset):
+        result = self.open_filtered(diag_zarr_file, dataset, {})
+
+        np.testing.assert_array_equal(result["observation"], [1, 3])
+
+    def test_index(self, diag_zarr_file, dataset):
+        # An index that disagrees with is_used shows that the index was read
+        xr.Dataset({"used": (["nused"], [1])}).to_zarr(
+            diag_zarr_file,
+            group=f"{self.group(dataset)}/index",
+            consolidated=False,
+        )
+
+        result = self.open_filtered(diag_zarr_file, dataset, {})
+
+        np.testing.assert_array_equal(result["observation"], [2])
+
+    def test_is_used_filter(self, diag_zarr_file, dataset):
+        xr.Dataset({"used": (["nused"], [1])}).to_zarr(
+            diag_zarr_file,
+            group=f"{self.group(dataset)}/index",
+            consolidated=False,
+        )
+
+        result = self.open_filtered(diag_zarr_file, dataset, {"is_used": "false::true"})
+
+        np.testing.assert_array_equal(result["observation"], [1, 2, 3])
+
+    def test_category_filter(self, diag_zarr_file, dataset):
+        ds = dataset.assign_coords(
+            observation_type=("nobs", np.array([120, 181, 187], "int16")),
+            station_id=("nobs", ["72469", "KDEN", "KBOU"]),
+        )
+        ds.to_zarr(diag_zarr_file, group=self.group(ds), mode="w", consolidated=False)
+
+        result = self.open_filtered(
+            diag_zarr_file,
+            ds,
+            [
+                ("observation_type", "120"),
+                ("observation_type", "187"),
+                ("station_id", "72469"),
+            ],
+        )
+
+        np.testing.assert_array_equal(result["observation"], [1])
+
+    def test_numeric_filter(self, diag_zarr_file, dataset):
+        ds = dataset.assign_coords(
+            pressure=("nobs", np.array([1000, 850, 850], "float32"))
+        )
+        ds.to_zarr(diag_zarr_file, group=self.group(ds), mode="w", consolidated=False)
+
+        result = self.open_filtered(diag_zarr_file, ds, {"pressure": "800::900"})
+
+        np.testing.assert_array_equal(result["observation"], [3])
+
+    def test_variables(self, diag_zarr_file, dataset):
+        result = self.open_filtered(
+            diag_zarr_file,
+            dataset,
+            {"obs_minus_forecast_unadjusted": "2::4"},
+            ["observation"],
+        )
+
+        assert list(result.data_vars) == ["observation"]
+        np.testing.assert_array_equal(result["observation"], [3])
+
+
+def test_open_diagnostic_compact(tmp_path, test_dataset):
+    diag_zarr_file = str(tmp_path / "test_diag.zarr")
+    expected = test_dataset(
+        longitude=[-105.12345, 91.98765],
+        latitude=[39.87654, -23.45678],
+        observation=[1.1, 0.3],
+        forecast_unadjusted=[0.2, 1.7],
+    )
+    policy = etl_diag.ENCODING_POLICIES["zstd-compact"]._replace(
+        coordinate_tolerance=0.001
+    )
+
+    etl_diag.save_zarr(diag_zarr_file, expected, policy)
+
+    result = diag.open_diagnostic(
+        diag_zarr_file,
+        expected.model,
+        expected.system,
+        expected.domain,
+        expected.background,
+        expected.frequency,
+        diag.Variable(expected.name),
+        expected.initialization_time,
+        diag.MinimLoop(expected.loop),
+    )
+
+    assert result["observation"].dtype == np.float32
+    np.testing.assert_allclose(result["observation"], expected["observation"])
+    assert abs(result["longitude"] - expected["longitude"]).max() <= 0.001
+    assert abs(result["latitude"] - expected["latitude"]).max() <= 0.001
+
+
 @pytest.mark.parametrize(
     "uri,expected",
     [
@@ -327,6 +478,145 @@ def test_history(tmp_path, test_dataset, diag_parquet):
     )
 
 
+def test_history_partitions(tmp_path, test_dataset, diag_parquet):
+    data = test_dataset(
+        model="RTMA",
+        system="WCOSS",
+        domain="CONUS",
+        background="RRFS",
+        frequency="REALTIME",
+        variable="ps",
+        loop="ges",
+        initialization_time=datetime.fromisoformat("2022-05-16T04:00"),
+        observation=[10, 14],
+        forecast_unadjusted=[5, 7],
+        is_used=[True, True],
+    )
+    parquet_file = diag_parquet(data)
+
+    # Files outside of the window shouldn't be opened at all, so an unreadable file
+    # in a later partition can't cause an error.
+    later = parquet_file / "loop=ges" / "initialization_date=2022-05-20"
+    later.mkdir()
+    (later / "corrupt.parquet").write_bytes(b"not a parquet file")
+
+    result = diag.history(
+        f"file://{tmp_path}/",
+        "RTMA",
+        "WCOSS",
+        "CONUS",
+        "RRFS",
+        "REALTIME",
+        diag.Variable.PRESSURE,
+        diag.MinimLoop.GUESS,
+        datetime.fromisoformat("2022-05-16T04:00"),
+        MultiDict(),
+    )
+
+    assert result["count"].tolist() == [2.0]
+
+
+def test_history_missing(tmp_path):
+    result = diag.history(
+        f"file://{tmp_path}/",
+        "RTMA",
+        "WCOSS",
+        "CONUS",
+        "RRFS",
+        "REALTIME",
+        diag.Variable.PRESSURE,
+        diag.MinimLoop.GUESS,
+        datetime.fromisoformat("2022-05-16T04:00"),
+        MultiDict(),
+    )
+
+    assert result.empty
+
+
+class TestGetParquetDataset:
+    @pytest.fixture
+    def parquet_file(self, tmp_path, test_dataset):
+        etl_diag.save_parquet(
+            tmp_path, test_dataset(initialization_time="2022-05-16T04:00")
+        )
+
+        return tmp_path / "RTMA_HRRR_WCOSS_CONUS_REALTIME" / "ps"
+
+    def add_file(self, tmp_path, test_dataset):
+        etl_diag.save_parquet(
+            tmp_path, test_dataset(initialization_time="2022-05-16T05:00")
+        )
+
+    def test_cached(self, parquet_file, tmp_path, test_dataset):
+        dataset = diag.get_parquet_dataset(f"file://{parquet_file}")
+        self.add_file(tmp_path, test_dataset)
+
+        result = diag.get_parquet_dataset(f"file://{parquet_file}")
+
+        assert result is dataset
+        assert result.count_rows() == 2
+
+    def test_unchanged(self, parquet_file, monkeypatch):
+        monkeypatch.setattr(diag, "PARQUET_DATASET_TTL", 0)
+        dataset = diag.get_parquet_dataset(f"file://{parquet_file}")
+
+        result = diag.get_parquet_dataset(f"file://{parquet_file}")
+
+        assert result is dataset
+
+    def test_refreshed(self, parquet_file, tmp_path, test_dataset, monkeypatch):
+        monkeypatch.setattr(diag, "PARQUET_DATASET_TTL", 0)
+        dataset = diag.get_parquet_dataset(f"file://{parquet_file}")
+        self.add_file(tmp_path, test_dataset)
+
+        result = diag.get_parquet_dataset(f"file://{parquet_file}")
+
+        assert result is not dataset
+        assert result.count_rows() == 4
+        assert set(result.schema.names) >= {"loop", "initialization_date"}
+
+    def test_stale_metadata(self, parquet_file, tmp_path, test_dataset):
+        # A _metadata summary written before the second file was added
+        (path,) = parquet_file.rglob("*.parquet")
+        metadata = pq.read_metadata(path)
+        metadata.set_file_path(str(path.relative_to(parquet_file)))
+        pq.write_metadata(
+            pq.read_schema(path),
+            parquet_file / "_metadata",
+            metadata_collector=[metadata],
+        )
+        self.add_file(tmp_path, test_dataset)
+
+        result = diag.get_parquet_dataset(f"file://{parquet_file}")
+
+        assert result.count_rows() == 4
+
+    def test_missing(self, tmp_path):
+        assert diag.get_parquet_dataset(f"file://{tmp_path}/missing") is None
+
+    def test_scan_compacted(self, parquet_file):
+        url = f"file://{parquet_file}"
+        dataset = diag.get_parquet_dataset(url)
+
+        # Replace the file, like compaction does, while the Dataset is cached
+        (path,) = parquet_file.rglob("*.parquet")
+        table = pq.read_table(path)
+        path.unlink()
+        pq.write_table(table, path.with_name("compacted-0.parquet"))
+
+        result = diag.scan_parquet_dataset(url, lambda d: d.count_rows())
+
+        assert result == 2
+        assert diag.get_parquet_dataset(url) is not dataset
+
+    def test_scan_missing(self, tmp_path):
+        result = diag.scan_parquet_dataset(
+            f"file://{tmp_path}/missing", lambda d: d.count_rows()
+        )
+
+        assert result is None
+
+
 def test_history_s3(aws_credentials, moto_server, s3_client, test_dataset, monkeypatch):
     bucket = "test_history_s3"
     store = f"s3://{bucket}/"
@@ -334,9 +624,9 @@ def test_history_s3(aws_credentials, moto_server, s3_client, test_dataset, monke
 
     storage_options = {"client_kwargs": {"endpoint_url": moto_server}}
     monkeypatch.setattr(
-        diag.pd,
-        "read_parquet",
-        partial(pd.read_parquet, storage_options=storage_options),
+        diag,
+        "S3FileSystem",
+        partial(diag.S3FileSystem, endpoint_url=moto_server),
     )
 
     run_list = [
@@ -372,11 +662,12 @@ def test_history_s3(aws_credentials, moto_server, s3_client, test_dataset, monke
             **run,
         ).to_dataframe()
         data["loop"] = "ges"
+        data["initialization_date"] = run["initialization_time"].date().isoformat()
         data["initialization_time"] = run["initialization_time"]
 
         data.to_parquet(
             f"s3://{bucket}/RTMA_RRFS_WCOSS_CONUS_REALTIME/ps",
-            partition_cols=["loop"],
+            partition_cols=["loop", "initialization_date"],
             index=True,
             engine="pyarrow",
             storage_options=storage_options,
@@ -412,3 +703,385 @@ def test_history_s3(aws_credentials, moto_server, s3_client, test_dataset, monke
             }
         ),
     )
+
+
+class TestAggregate:
+    @pytest.fixture
+    def parquet_dir(self, tmp_path, test_dataset):
+        for initialization_time, observation in [
+            ("2022-05-16T04:00", [1, 3, 5]),
+            ("2022-05-17T04:00", [2, 4, 6]),
+            ("2022-05-24T04:00", [10, 20, 30]),
+        ]:
+            data = test_dataset(
+                initialization_time=initialization_time,
+                longitude=[90, 91, 92],
+                latitude=[22, 23, 24],
+                is_used=[True, True, False],
+                observation=observation,
+                forecast_unadjusted=[0, 0, 0],
+            ).assign_coords(
+                provider_name=(["nobs"], np.array(["MESONET", "METAR", "METAR"])),
+                observation_type=(["nobs"], np.array([188, 181, 120], "int16")),
+                pressure=(["nobs"], np.array([1000, 850, 850], "float32")),
+            )
+            etl_diag.save_parquet(tmp_path, data)
+
+        return f"file://{tmp_path}/"
+
+    def aggregate(self, parquet_dir, **kwargs):
+        args = {
+            "group_by": ["provider_name"],
+            "metrics": ["observation:mean"],
+            "filters": MultiDict(),
+            **kwargs,
+        }
+
+        return diag.aggregate(
+            parquet_dir,
+            "RTMA",
+            "WCOSS",
+            "CONUS",
+            "HRRR",
+            "REALTIME",
+            diag.Variable.PRESSURE,
+            diag.MinimLoop.GUESS,
+            datetime.fromisoformat("2022-05-16T00:00"),
+            datetime.fromisoformat("2022-05-31T00:00"),
+            **args,
+        )
+
+    def test_group_by(self, parquet_dir):
+        result = self.aggregate(
+            parquet_dir,
+            group_by=["provider_name"],
+            metrics=["observation:mean", "observation:count"],
+            sort="provider_name",
+        )
+
+        pd.testing.assert_frame_equal(
+            result,
+            pd.DataFrame(
+                {
+                    "provider_name": ["MESONET", "METAR"],
+                    "observation_mean": [13 / 3, 9.0],
+                    "observation_count": [3, 3],
+                }
+            ),
+        )
+
+    def test_period(self, parquet_dir):
+        result = self.aggregate(
+            parquet_dir,
+            group_by=["week"],
+            metrics=["observation:max"],
+            sort="-week",
+            limit=1,
+        )
+
+        assert result["week"].tolist() == [pd.Timestamp("2022-05-23")]
+        assert result["observation_max"].tolist() == [20.0]
+
+    def test_filters(self, parquet_dir):
+        result = self.aggregate(
+            parquet_dir,
+            group_by=[],
+            metrics=["observation:sum"],
+            filters=MultiDict([("provider_name", "METAR"), ("is_used", "false")]),
+        )
+
+        assert result["observation_sum"].tolist() == [41.0]
+
+    def test_metadata_filters(self, parquet_dir):
+        result = self.aggregate(
+            parquet_dir,
+            group_by=["observation_type"],
+            metrics=["observation:sum"],
+            filters=MultiDict(
+                [
+                    ("observation_type", "181"),
+                    ("observation_type", "120"),
+                    ("pressure", "800::900"),
+                ]
+            ),
+        )
+
+        # The radiosonde (120) isn't used
+        assert result["observation_type"].tolist() == [181]
+        assert result["observation_sum"].tolist() == [27.0]
+
+    def test_group_by_station(self, tmp_path, test_dataset):
+        # Each file has its own set of station IDs
+        for initialization_time, stations in [
+            ("2022-05-16T04:00", ["KDEN", "KBOU", "KDEN"]),
+            ("2022-05-17T04:00", ["KAPA", "KDEN", "CO123456"]),
+        ]:
+            data = test_dataset(
+                initialization_time=initialization_time,
+                longitude=[90, 91, 92],
+                latitude=[22, 23, 24],
+                is_used=[True, True, True],
+                observation=[1, 2, 3],
+                forecast_unadjusted=[0, 0, 0],
+            ).assign_coords(station_id=(["nobs"], np.array(stations)))
+            etl_diag.save_parquet(tmp_path, data)
+
+        result = self.aggregate(
+            f"file://{tmp_path}/",
+            group_by=["station_id"],
+            metrics=["observation:count"],
+            sort="station_id",
+        )
+
+        assert result["station_id"].tolist() == ["CO123456", "KAPA", "KBOU", "KDEN"]
+        assert result["observation_count"].tolist() == [1, 1, 1, 3]
+
+    def test_mixed_schemas(self, tmp_path, test_dataset):
+        # The older file sorts first, and was written before the station IDs and
+        # observation types were saved, with its provider names as a dictionary
+        for initialization_time, coords in [
+            ("2022-05-16T04:00", {}),
+            (
+                "2022-05-17T04:00",
+                {
+                    "station_id": ["KDEN", "KBOU", "KDEN"],
+                    "observation_type": np.array([188, 181, 188], "int16"),
+                },
+            ),
+        ]:
+            data = test_dataset(
+                initialization_time=initialization_time,
+                longitude=[90, 91, 92],
+                latitude=[22, 23, 24],
+                is_used=[True, True, True],
+                observation=[1, 2, 3],
+                forecast_unadjusted=[0, 0, 0],
+            ).assign_coords(
+                provider_name=(["nobs"], np.array(["METAR", "METAR", "MESONET"])),
+                **{
+                    name: (["nobs"], np.array(values))
+                    for name, values in coords.items()
+                },
+            )
+            etl_diag.save_parquet(tmp_path, data)
+
+        (old,) = tmp_path.rglob("initialization_date=2022-05-16/*.parquet")
+        table = pq.read_table(old)
+        column = table.schema.get_field_index("provider_name")
+        pq.write_table(
+            table.set_column(
+                column, "provider_name", table["provider_name"].dictionary_encode()
+            ),
+            old,
+        )
+
+        result = self.aggregate(
+            f"file://{tmp_path}/",
+            group_by=["station_id", "observation_type"],
+            metrics=["observation:count"],
+            filters=MultiDict([("provider_name", "METAR")]),
+            sort="station_id",
+        )
+
+        assert result["station_id"].tolist() == ["KBOU", "KDEN", None]
+        assert result["observation_type"][:2].tolist() == [181, 188]
+        assert pd.isna(result["observation_type"][2])
+        assert result["observation_count"].tolist() == [1, 1, 2]
+
+    @pytest.mark.parametrize(
+        "kwargs",
+        [
+            {"metrics": []},
+            {"metrics": ["latitude:mean"]},
+            {"metrics": ["observation:mode"]},
+            {"group_by": ["latitude"]},
+            {"sort": "observation_max"},
+            {"limit": 0},
+            {"filters": MultiDict([("observation_type", "raob")])},
+        ],
+    )
+    def test_invalid(self, parquet_dir, kwargs):
+        with pytest.raises(diag.AggregationError):
+            self.aggregate(parquet_dir, **kwargs)
+
+    @pytest.mark.parametrize(
+        "kwargs",
+        [{"max_rows": 3}, {"max_bytes": 8}, {"max_groups": 1}],
+    )
+    def test_limits(self, parquet_dir, kwargs):
+        with pytest.raises(diag.AggregationError, match="exceeds the limit"):
+            self.aggregate(parquet_dir, **kwargs)
+
+    def test_missing(self, tmp_path):
+        result = self.aggregate(f"file://{tmp_path}/")
+
+        assert result.empty
+        assert result.columns.tolist() == ["provider_name", "observation_mean"]
+
+
+def test_profile_layers(test_dataset):
+    data = test_dataset(
+        variable="uv",
+        observation=[[3, 4], [0, 1], [1, 1], [2, 2]],
+        forecast_unadjusted=[[0, 0], [0, 0], [0, 0], [0, 0]],
+        longitude=[90, 91, 92, 93],
+        latitude=[22, 23, 24, 25],
+        is_used=[True, True, True, True],
+        component=["u", "v"],
+    ).assign_coords(pressure=("nobs", [850.0, 860.0, np.nan, 1200.0]))
+
+    result = diag.profile_layers(data, [1000, 700, 300])
+
+    # Vectors have the bias of each component and the RMS of their magnitude, and
+    # observations without a pressure or outside of the layers are left out
+    assert result["min_pressure"].tolist() == [700.0]
+    assert result["count"].tolist() == [2]
+    assert result["obs_minus_forecast_unadjusted_u_bias"].tolist() == [1.5]
+    assert result["obs_minus_forecast_unadjusted_v_bias"].tolist() == [2.5]
+    assert "obs_minus_forecast_unadjusted_bias" not in result
+    assert result["obs_minus_forecast_unadjusted_rms"].tolist() == [np.sqrt(13)]
+
+
+@pytest.mark.parametrize(
+    "values,expected",
+    [
+        ([], {"bias": None, "rms": None, "std": None}),
+        ([2.0], {"bias": 2.0, "rms": 2.0, "std": None}),
+        (
+            [1.0, 2.0, 3.0, 6.0],
+            {"bias": 3.0, "rms": np.sqrt(12.5), "std": np.sqrt(14 / 3)},
+        ),
+    ],
+)
+def test_get_stats(values, expected):
+    result = diag.get_stats(np.array(values))
+
+    assert result == pytest.approx(expected)
+
+
+def test_get_vector_stats():
+    values = np.array([[3.0, 4.0], [-3.0, -4.0], [0.0, 0.0], [0.0, 0.0]])
+
+    result = diag.get_vector_stats(values, ["u", "v"])
+
+    assert result["bias"] == {"u": 0.0, "v": 0.0}
+    assert result["rms"] == pytest.approx(np.sqrt(12.5))
+    assert result["std"] == pytest.approx({"u": np.sqrt(6), "v": np.sqrt(32 / 3)})
+
+
+def test_daily_statistics(session, test_dataset):
+    run_list = [
+        ("2023-01-01T00:00", [1, 2, 3], [0, 0, 0]),
+        ("2023-01-01T12:00", [4, 5], [0, 0]),
+        ("2023-01-02T00:00", [7, 8], [1, 1]),
+        ("2023-01-03T00:00", [9, 9], [0, 0]),
+    ]
+    for initialization_time, observation, forecast in run_list:
+        data = test_dataset(
+            model="RTMA",
+            system="WCOSS",
+            domain="CONUS",
+            background="RRFS",
+            frequency="REALTIME",
+            variable="ps",
+            loop="ges",
+            initialization_time=initialization_time,
+            longitude=[0] * len(observation),
+            latitude=[0] * len(observation),
+            is_used=[True] * len(observation),
+            observation=observation,
+            forecast_unadjusted=forecast,
+        )
+        analysis = etl_diag.upsert_analysis(session, data)
+        etl_diag.upsert_statistics(
+            session, analysis, data, etl_diag.get_statistics(data)
+        )
+
+    result = diag.daily_statistics(
+        session,
+        "RTMA",
+        "WCOSS",
+        "CONUS",
+        "RRFS",
+        "REALTIME",
+        diag.Variable.PRESSURE,
+        diag.MinimLoop.GUESS,
+        datetime.fromisoformat("2023-01-01T00:00"),
+        datetime.fromisoformat("2023-01-02T23:59"),
+    )
+    session.rollback()
+
+    # O - F for each day is [1, 2, 3, 4, 5] and [6, 7]. The quartiles are estimated
+    # from the sketches, which pick the nearest observation rather than
+    # interpolating between them.
+    pd.testing.assert_frame_equal(
+        result,
+        pd.DataFrame(
+            {
+                "initialization_date": pd.to_datetime(["2023-01-01", "2023-01-02"]),
+                "min": [1.0, 6.0],
+                "25%": [2.0, 6.0],
+                "50%": [3.0, 6.0],
+                "75%": [4.0, 6.0],
+                "max": [5.0, 7.0],
+                "mean": [3.0, 6.5],
+                "std": [np.std([1, 2, 3, 4, 5], ddof=1), np.std([6, 7], ddof=1)],
+                "count": [5, 2],
+            }
+        ),
+        rtol=sketch.SKETCH_RELATIVE_ACCURACY,
+    )
+
+
+def test_daily_history(tmp_path, test_dataset, diag_parquet):
+    run_list = [
+        ("2022-05-16T04:00", [10, 14, 18, 20], [5, 7, 10, 10]),
+        ("2022-05-16T07:00", [1, 2], [3, 5]),
+        ("2022-05-17T04:00", [1, 2, 3], [0, 0, 0]),
+    ]
+    for initialization_time, observation, forecast in run_list:
+        data = test_dataset(
+            model="RTMA",
+            system="WCOSS",
+            domain="CONUS",
+            background="RRFS",
+            frequency="REALTIME",
+            variable="ps",
+            loop="ges",
+            initialization_time=datetime.fromisoformat(initialization_time),
+            longitude=[0] * len(observation),
+            latitude=[0] * len(observation),
+            is_used=[True] * len(observation),
+            observation=observation,
+            forecast_unadjusted=forecast,
+        )
+        diag_parquet(data)
+
+    result = diag.daily_history(
+        f"file://{tmp_path}/",
+        "RTMA",
+        "WCOSS",
+        "CONUS",
+        "RRFS",
+        "REALTIME",
+        diag.Variable.PRESSURE,
+        diag.MinimLoop.GUESS,
+        datetime.fromisoformat("2022-05-16T00:00"),
+        datetime.fromisoformat("2022-05-17T00:00"),
+    )
+
+    # O - F on 2022-05-16 is [5, 7, 8, 10, -2, -3], and 2022-05-17 is outside of
+    # the window
+    expected = pd.Series([5, 7, 8, 10, -2, -3], dtype=float).describe()
+    pd.testing.assert_frame_equal(
+        result,
+        pd.DataFrame(
+            {
+                "initialization_date": pd.to_datetime(["2022-05-16"]).astype(
+                    "datetime64[us]"
+                ),
+                **{key: [expected[key]] for key in diag.HISTORY_COLUMNS[1:-1]},
+                "count": [6],
+            }
+        ),
+    )
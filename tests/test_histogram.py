@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+import xarray as xr
+
+from unified_graphics import histogram
+
+
+@pytest.mark.parametrize(
+    "lower,upper,count,expected",
+    [
+        (0, 10, 10, np.arange(11)),
+        (-3.21, 4.7, 4, [-4, -2, 0, 2, 4, 6]),
+        (0.011, 0.052, 4, [0.01, 0.02, 0.03, 0.04, 0.05, 0.06]),
+        (1, 1, 10, [0.5, 1.5]),
+        (np.inf, -np.inf, 10, [0, 1]),
+    ],
+)
+def test_nice_edges(lower, upper, count, expected):
+    np.testing.assert_array_equal(
+        histogram.nice_edges(lower, upper, count), np.array(expected, dtype=float)
+    )
+
+
+def test_histogram():
+    result = histogram.histogram(np.array([0.5, 1.5, np.nan, 1.25, 80]))
+
+    assert result["count"].sum() == 4
+    assert result["edge"].values[0] == 0.5
+    assert result["edge"].values[1] == 1
+    assert result["edge"].values[-1] == 80
+
+
+def test_build_scalar(test_dataset):
+    ds = test_dataset(
+        longitude=[90, 91, 92],
+        latitude=[22, 23, 24],
+        is_used=[True, True, False],
+        observation=[1, 2, 3],
+        forecast_unadjusted=[0, 0, 0],
+    )
+
+    result = histogram.build(ds)
+
+    assert sorted(result) == sorted(histogram.HISTOGRAM_VARIABLES)
+    assert histogram.to_records(result["obs_minus_forecast_unadjusted"]) == [
+        {"x0": 1.0, "x1": 1.005, "count": 1},
+        {"x0": 1.995, "x1": 2.0, "count": 1},
+    ]
+
+
+def test_build_vector(test_dataset):
+    ds = test_dataset(
+        is_used=[True, True],
+        observation=[[0, 1], [1, 0]],
+        forecast_unadjusted=[[0, 0], [0, 0]],
+        component=["u", "v"],
+    )
+
+    result = histogram.to_records(histogram.build(ds)["obs_minus_forecast_adjusted"])
+
+    assert result == [
+        {"x0": 0.98, "x1": 1.0, "y0": 0.0, "y1": 0.02, "count": 1},
+        {"x0": 0.0, "x1": 0.02, "y0": 0.98, "y1": 1.0, "count": 1},
+    ]
+
+
+def test_build_blocks(test_dataset):
+    ds = test_dataset(
+        longitude=[90, 91, 92],
+        latitude=[22, 23, 24],
+        is_used=[True, True, False],
+        observation=[1, 2, 3],
+        forecast_unadjusted=[0, 0, 0],
+    )
+    extents = {name: (1.0, 2.0) for name in histogram.HISTOGRAM_VARIABLES}
+
+    result = histogram.build_blocks(ds, extents, size=1)
+
+    for name, expected in histogram.build(ds).items():
+        xr.testing.assert_equal(result[name], expected)
+
+
+def test_build_blocks_vector(test_dataset):
+    ds = test_dataset(
+        is_used=[True, True],
+        observation=[[0, 1], [1, 0]],
+        forecast_unadjusted=[[0, 0], [0, 0]],
+        component=["u", "v"],
+    )
+    extents = {
+        f"{name}_{component}": (0.0, 1.0)
+        for name in histogram.HISTOGRAM_VARIABLES
+        for component in "uv"
+    }
+
+    result = histogram.build_blocks(ds, extents, size=1)
+
+    for name, expected in histogram.build(ds).items():
+        xr.testing.assert_equal(result[name], expected)
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from unified_graphics import pyramid
+
+
+@pytest.fixture
+def dataset(test_dataset):
+    return test_dataset(
+        longitude=[90.1, 90.2, 91.5, 92.5],
+        latitude=[22.1, 22.2, 22.3, 23.5],
+        is_used=[True, True, True, False],
+        observation=[1, 3, 2, 10],
+        forecast_unadjusted=[0, 0, 0, 0],
+    )
+
+
+def test_grid(dataset):
+    result = pyramid.grid(dataset, 1.0)
+
+    assert result.index.tolist() == [(22.5, 90.5), (22.5, 91.5), (23.5, 92.5)]
+    assert result["count"].tolist() == [2, 1, 1]
+    assert result["obs_minus_forecast_unadjusted_sum"].tolist() == [4.0, 2.0, 10.0]
+    assert result["obs_minus_forecast_unadjusted_sum_squares"].tolist() == [
+        10.0,
+        4.0,
+        100.0,
+    ]
+
+
+def test_grid_negative(test_dataset):
+    dataset = test_dataset(longitude=[-0.5, 0.5], latitude=[-45.5, 45.5])
+
+    result = pyramid.grid(dataset, 1.0)
+
+    assert result.index.tolist() == [(-45.5, -0.5), (45.5, 0.5)]
+
+
+def test_grid_vector(test_dataset):
+    dataset = test_dataset(
+        observation=[[3, 4], [0, 1]],
+        forecast_unadjusted=[[0, 0], [0, 0]],
+        component=["u", "v"],
+    )
+
+    result = pyramid.grid(dataset, 4.0)
+
+    assert result["obs_minus_forecast_adjusted_sum"].tolist() == [6.0]
+
+
+def test_build(dataset):
+    result = pyramid.build(dataset)
+
+    assert len(result) == len(pyramid.PYRAMID_RESOLUTIONS)
+    assert [level["count"].sum() for level in result] == [3, 3, 3]
+
+
+def test_merge(dataset):
+    result = pyramid.merge(
+        pyramid.build(dataset.isel(nobs=slice(0, 1))),
+        pyramid.build(dataset.isel(nobs=slice(1, 4))),
+    )
+
+    for level, expected in zip(result, pyramid.build(dataset)):
+        pd.testing.assert_frame_equal(level, expected)
+
+
+def test_dataset_round_trip(dataset):
+    level = pyramid.grid(dataset, 1.0)
+
+    result = pyramid.from_dataset(pyramid.to_dataset(level, 1.0))
+
+    pd.testing.assert_frame_equal(result, level)
+
+
+@pytest.mark.parametrize(
+    "longitude,latitude,expected",
+    [
+        # The whole globe only fits the coarsest level
+        ((0, 360), (-90, 90), 0),
+        ((230, 300), (20, 55), 1),
+        ((260, 270), (30, 40), 2),
+    ],
+)
+def test_choose_level(longitude, latitude, expected):
+    assert pyramid.choose_level(longitude, latitude) == expected
+
+
+def test_summarize(dataset):
+    result = pyramid.summarize(pyramid.grid(dataset, 1.0))
+
+    assert result["count"].tolist() == [2, 1, 1]
+    assert result["obs_minus_forecast_unadjusted"].tolist() == [2.0, 2.0, 10.0]
+    np.testing.assert_allclose(
+        result["obs_minus_forecast_unadjusted_rms"], [np.sqrt(5), 2.0, 10.0]
+    )
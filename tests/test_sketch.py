@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from unified_graphics import sketch
+
+
+@pytest.fixture(scope="module")
+def values():
+    return np.random.default_rng(0).normal(0.5, 3, 100_000)
+
+
+def test_quantiles(values):
+    q = [0, 0.01, 0.25, 0.5, 0.75, 0.99, 1]
+
+    result = sketch.quantiles(sketch.build(values), q)
+
+    np.testing.assert_allclose(
+        result,
+        np.quantile(values, q, method="lower"),
+        rtol=sketch.SKETCH_RELATIVE_ACCURACY,
+    )
+
+
+def test_quantiles_zero():
+    result = sketch.quantiles(sketch.build([-1, 0, 0, 0, 1]), [0, 0.5, 1])
+
+    np.testing.assert_allclose(result, [-1, 0, 1], rtol=sketch.SKETCH_RELATIVE_ACCURACY)
+
+
+def test_quantiles_empty():
+    assert np.isnan(sketch.quantiles(sketch.build([]), [0.5])).all()
+
+
+def test_merge(values):
+    result = sketch.merge(sketch.build(part) for part in np.array_split(values, 7))
+
+    assert result == sketch.build(values)
+
+
+def test_to_dict(values):
+    data = sketch.build(values)
+
+    assert sketch.from_dict(sketch.to_dict(data)) == data
+
+
+def test_from_dict_accuracy():
+    data = {**sketch.to_dict(sketch.build([1])), "relative_accuracy": 0.05}
+
+    with pytest.raises(ValueError):
+        sketch.from_dict(data)
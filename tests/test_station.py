@@ -0,0 +1,15 @@
+import numpy as np
+
+from unified_graphics import station
+
+
+def test_buckets():
+    result = station.buckets(["KDEN", "KBOU", "72469", "KDEN"])
+
+    # The CRC-32s of the station IDs, which don't change between processes
+    expected = np.array([111735531, 1924116287, 2054879120, 111735531])
+    np.testing.assert_array_equal(result, expected % station.STATION_BUCKETS)
+
+
+def test_buckets_empty():
+    assert station.buckets([]).size == 0
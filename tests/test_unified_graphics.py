@@ -1,10 +1,13 @@
 from datetime import datetime
 from pathlib import Path
 
+import numpy as np
 import pytest  # noqa: F401
 import xarray as xr
+import zarr  # type: ignore
 
-from unified_graphics import create_app
+from unified_graphics import create_app, histogram, pyramid
+from unified_graphics.etl import diag as etl_diag
 
 
 def get_group(ds: xr.Dataset) -> str:
@@ -342,6 +345,134 @@ def test_vector_magnitude(uv, client):
     ]
 
 
+def test_vector_magnitude_stored(uv, client, app):
+    # Arrange
+    # The stored magnitudes differ from the magnitude of the components, so we know
+    # they were read instead of computed.
+    ds = uv.assign(
+        observation_magnitude=("nobs", [2.0, 3.0]),
+        obs_minus_forecast_adjusted_magnitude=("nobs", [4.0, 5.0]),
+        obs_minus_forecast_unadjusted_magnitude=("nobs", [6.0, 7.0]),
+    ).assign_attrs(loop="anl")
+    save(app.config["DIAG_ZARR"], ds)
+    group = get_group(ds)
+
+    # Act
+    response = client.get(f"/diag/{group}/magnitude/?latitude=22.5::23.5")
+
+    # Assert
+    assert response.json == [
+        {
+            "obs_minus_forecast_adjusted": 5.0,
+            "obs_minus_forecast_unadjusted": 7.0,
+            "observation": 3.0,
+            "longitude": 91.0,
+            "latitude": 23.0,
+        },
+    ]
+
+
+def test_vector_magnitude_opens_group_once(uv, client, app, monkeypatch):
+    # Arrange
+    ds = uv.assign(
+        observation_magnitude=("nobs", [2.0, 3.0]),
+        obs_minus_forecast_adjusted_magnitude=("nobs", [4.0, 5.0]),
+        obs_minus_forecast_unadjusted_magnitude=("nobs", [6.0, 7.0]),
+    ).assign_attrs(loop="anl")
+    save(app.config["DIAG_ZARR"], ds)
+    group = get_group(ds)
+
+    groups = []
+    open_zarr = xr.open_zarr
+
+    def record(store, group=None, **kwargs):
+        groups.append(group)
+        return open_zarr(store, group=group, **kwargs)
+
+    monkeypatch.setattr(xr, "open_zarr", record)
+
+    # Act
+    response = client.get(f"/diag/{group}/magnitude/")
+
+    # Assert
+    assert len(response.json) == 2
+    assert groups.count(f"/{group}") == 1
+
+
+def test_vector_magnitude_stored_vector_filter(uv, client, app):
+    # Arrange
+    ds = uv.assign(
+        observation_magnitude=("nobs", [2.0, 3.0]),
+        obs_minus_forecast_adjusted_magnitude=("nobs", [4.0, 5.0]),
+        obs_minus_forecast_unadjusted_magnitude=("nobs", [6.0, 7.0]),
+    ).assign_attrs(loop="anl")
+    save(app.config["DIAG_ZARR"], ds)
+    group = get_group(ds)
+
+    # Act
+    response = client.get(
+        f"/diag/{group}/magnitude/?obs_minus_forecast_adjusted=-0.5,0.5::0.5,1.5"
+    )
+
+    # Assert
+    # A filter on the components keeps one row for each observation
+    assert response.json == [
+        {
+            "obs_minus_forecast_adjusted": 4.0,
+            "obs_minus_forecast_unadjusted": 6.0,
+            "observation": 2.0,
+            "longitude": 90.0,
+            "latitude": 22.0,
+        },
+    ]
+
+
+@pytest.mark.parametrize(
+    "variable,route,count",
+    [("uv", "ges/magnitude", 1), ("t", "stats", 1), ("t", "ges/grid", 1)],
+)
+def test_station_filter(
+    model, diag_zarr_path, test_dataset, client, variable, route, count
+):
+    # Arrange
+    ds = test_dataset(
+        **model,
+        initialization_time="2022-05-16T04:00",
+        loop="ges",
+        variable=variable,
+        is_used=[True, True],
+        **(
+            {
+                "observation": [[0, 1], [1, 0]],
+                "forecast_unadjusted": [[0, 0], [1, 1]],
+                "component": ["u", "v"],
+            }
+            if variable == "uv"
+            else {}
+        ),
+    ).assign_coords(station_id=("nobs", ["KDEN", "KBOU"]))
+    if variable == "uv":
+        # The magnitudes stored at ingest
+        ds = ds.assign(
+            {
+                f"{name}_magnitude": etl_diag.get_magnitude(ds[name])
+                for name in etl_diag.MAGNITUDE_VARIABLES
+            }
+        )
+    save(diag_zarr_path, ds)
+    run = "/".join(get_group(ds).split("/")[:-1])
+
+    # Act
+    response = client.get(f"/diag/{run}/{route}/?station_id=KDEN")
+
+    # Assert
+    assert response.status_code == 200
+    if route == "stats":
+        assert response.json["ges"]["count"] == count
+    else:
+        assert sum(row.get("count", 1) for row in response.json) == count
+
+
 def test_region_filter_scalar(t, client):
     group = get_group(t)
 
@@ -542,3 +673,675 @@ def test_unknown_variable(url, client):
 
     assert response.status_code == 404
     assert response.json == {"msg": "Variable not found: 'not_a_variable'"}
+
+
+def test_aggregate(model, diag_parquet, client, test_dataset):
+    # Arrange
+    for initialization_time in ["2022-05-16T04:00", "2022-05-16T07:00"]:
+        data = test_dataset(
+            **model,
+            variable="ps",
+            loop="ges",
+            initialization_time=datetime.fromisoformat(initialization_time),
+            observation=[10, 20],
+            forecast_unadjusted=[5, 10],
+            is_used=[True, True],
+        )
+        diag_parquet(data)
+
+    # Act
+    response = client.get(
+        "/aggregate/3DRTMA/WCOSS/CONUS/HRRR/REALTIME/ps/ges/"
+        "?start=2022-05-16T00:00&end=2022-05-17T00:00&group_by=day"
+        "&metric=obs_minus_forecast_unadjusted:mean"
+        "&metric=obs_minus_forecast_unadjusted:count"
+    )
+
+    # Assert
+    assert response.json == [
+        {
+            "day": "2022-05-16T00:00:00.000",
+            "obs_minus_forecast_unadjusted_mean": 7.5,
+            "obs_minus_forecast_unadjusted_count": 4,
+        },
+    ]
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "start=2022-05-16T00:00&end=2022-05-17T00:00&metric=latitude:mean",
+        "start=2022-05-16T00:00&end=2022-05-17T00:00&metric=observation:mean&limit=a",
+        "start=yesterday&end=2022-05-17T00:00&metric=observation:mean",
+    ],
+)
+def test_aggregate_invalid(query, client):
+    response = client.get(
+        f"/aggregate/3DRTMA/WCOSS/CONUS/HRRR/REALTIME/ps/ges/?{query}"
+    )
+
+    assert response.status_code == 400
+    assert "msg" in response.json
+
+
+@pytest.mark.parametrize(
+    "start",
+    [
+        # Short windows are read from the Parquet history
+        "2022-05-16T00:00",
+        # Long windows are read from the statistics in the database
+        "2022-05-01T00:00",
+    ],
+)
+def test_daily_history_empty(start, client):
+    response = client.get(
+        "/history/3DRTMA/WCOSS/CONUS/HRRR/REALTIME/ps/ges/"
+        f"?start={start}&end=2022-05-17T00:00"
+    )
+
+    assert response.json == []
+
+
+def test_daily_history_invalid(client):
+    response = client.get(
+        "/history/3DRTMA/WCOSS/CONUS/HRRR/REALTIME/ps/ges/?start=2022-05-16T00:00"
+    )
+
+    assert response.status_code == 400
+    assert response.json == {"msg": "A start and end time are required"}
+
+
+def test_grid(t, client):
+    # Arrange
+    group = get_group(t)
+
+    # Act
+    response = client.get(f"/diag/{group}/grid/?longitude=88::92&latitude=20::25")
+
+    # Assert
+    assert response.headers["X-Grid-Resolution"] == "0.25"
+    assert response.json == [
+        {
+            "latitude": 22.125,
+            "longitude": 90.125,
+            "count": 1,
+            "obs_minus_forecast_adjusted": 1.0,
+            "obs_minus_forecast_adjusted_rms": 1.0,
+            "obs_minus_forecast_unadjusted": 1.0,
+            "obs_minus_forecast_unadjusted_rms": 1.0,
+        },
+        {
+            "latitude": 23.125,
+            "longitude": 91.125,
+            "count": 1,
+            "obs_minus_forecast_adjusted": -1.0,
+            "obs_minus_forecast_adjusted_rms": 1.0,
+            "obs_minus_forecast_unadjusted": -1.0,
+            "obs_minus_forecast_unadjusted_rms": 1.0,
+        },
+    ]
+
+
+def test_grid_western_hemisphere(model, diag_zarr_path, test_dataset, client):
+    # Arrange
+    ds = test_dataset(
+        **model,
+        initialization_time="2022-05-16T04:00",
+        loop="ges",
+        variable="t",
+        observation=[1, 0, 2],
+        forecast_unadjusted=[0, 1, -1],
+        longitude=[-100, -90, 10],
+        latitude=[22, 23, 24],
+        is_used=[1, 1, 1],
+    )
+    save(diag_zarr_path, ds)
+
+    # Act
+    response = client.get(f"/diag/{get_group(ds)}/grid/")
+
+    # Assert
+    assert response.headers["X-Grid-Resolution"] == "4.0"
+    assert sorted(cell["longitude"] for cell in response.json) == [-98.0, -90.0, 10.0]
+
+
+def test_grid_pyramid(t, diag_zarr_path, client):
+    # Arrange
+    group = get_group(t)
+
+    # A pyramid built from every observation, so that it can be told apart from
+    # one gridded on the fly from the used observations
+    for i, resolution in enumerate(pyramid.PYRAMID_RESOLUTIONS):
+        pyramid.to_dataset(pyramid.grid(t, resolution), resolution).to_zarr(
+            diag_zarr_path, group=f"{group}/pyramid/{i}", consolidated=False
+        )
+
+    # Act
+    response = client.get(f"/diag/{group}/grid/")
+    filtered = client.get(f"/diag/{group}/grid/?is_used=true::true")
+
+    # Assert
+    assert response.headers["X-Grid-Resolution"] == "4.0"
+    assert sum(cell["count"] for cell in response.json) == 3
+    assert sum(cell["count"] for cell in filtered.json) == 2
+
+
+@pytest.mark.parametrize("max_cells", ["many", "0", "-4"])
+def test_grid_invalid_max_cells(t, client, max_cells):
+    # Arrange
+    group = get_group(t)
+
+    # Act
+    response = client.get(f"/diag/{group}/grid/?max_cells={max_cells}")
+
+    # Assert
+    assert response.status_code == 400
+
+
+def test_histogram(t, client):
+    # Arrange
+    group = get_group(t)
+
+    # Act
+    response = client.get(f"/diag/{group}/histogram/")
+
+    # Assert
+    assert response.json == {
+        "obs_minus_forecast_adjusted": [
+            {"x0": -1.0, "x1": -0.99, "count": 1},
+            {"x0": 0.99, "x1": 1.0, "count": 1},
+        ],
+        "obs_minus_forecast_unadjusted": [
+            {"x0": -1.0, "x1": -0.99, "count": 1},
+            {"x0": 0.99, "x1": 1.0, "count": 1},
+        ],
+    }
+
+
+def test_histogram_saved(t, diag_zarr_path, client):
+    # Arrange
+    group = get_group(t)
+
+    # Histograms of every observation, so that they can be told apart from ones
+    # binned on the fly from the used observations
+    for name, hist in histogram.build(t.assign_coords(is_used=[1, 1, 1])).items():
+        hist.to_zarr(
+            diag_zarr_path, group=f"{group}/histogram/{name}", consolidated=False
+        )
+
+    # Act
+    response = client.get(f"/diag/{group}/histogram/")
+    filtered = client.get(f"/diag/{group}/histogram/?is_used=true::true")
+
+    # Assert
+    assert sum(b["count"] for b in response.json["obs_minus_forecast_adjusted"]) == 3
+    assert sum(b["count"] for b in filtered.json["obs_minus_forecast_adjusted"]) == 2
+
+
+def test_station_history(model, tmp_path, test_dataset, client):
+    # Arrange
+    for initialization_time, loop in [
+        ("2022-05-17T04:00", "ges"),
+        ("2022-05-16T04:00", "anl"),
+        ("2022-05-16T04:00", "ges"),
+    ]:
+        etl_diag.save_parquet(
+            tmp_path,
+            test_dataset(
+                **model,
+                initialization_time=initialization_time,
+                loop=loop,
+                variable="t",
+                observation=[1, 2],
+                forecast_unadjusted=[0, 0],
+            ).assign_coords(station_id=("nobs", ["KDEN", "KBOU"])),
+        )
+    url = "/station/" + "/".join([*model.values(), "t"])
+
+    # Act
+    response = client.get(f"{url}/KDEN/")
+    window = client.get(f"{url}/KBOU/?loop=ges&start=2022-05-17T00:00")
+    invalid = client.get(f"{url}/KBOU/?loop=other")
+
+    # Assert
+    assert [
+        (obs["initialization_time"], obs["loop"], obs["observation"])
+        for obs in response.json
+    ] == [
+        ("2022-05-16T04:00:00.000", "anl", 1.0),
+        ("2022-05-16T04:00:00.000", "ges", 1.0),
+        ("2022-05-17T04:00:00.000", "ges", 1.0),
+    ]
+    assert [(obs["loop"], obs["observation"]) for obs in window.json] == [("ges", 2.0)]
+    assert invalid.status_code == 400
+
+
+def test_station_history_missing(model, client):
+    url = "/station/" + "/".join([*model.values(), "t"])
+
+    response = client.get(f"{url}/KDEN/")
+
+    assert response.json == []
+
+
+def test_profile(model, diag_zarr_path, test_dataset, client):
+    # Arrange
+    for loop, forecast in [("ges", [0, 2, 1, 4]), ("anl", [1, 1, 1, 1])]:
+        save(
+            diag_zarr_path,
+            test_dataset(
+                **model,
+                initialization_time="2022-05-16T04:00",
+                loop=loop,
+                variable="t",
+                observation=[1, 1, 1, 1],
+                forecast_unadjusted=forecast,
+                longitude=[90, 91, 92, 93],
+                latitude=[22, 23, 24, 25],
+                is_used=[1, 1, 1, 0],
+            ).assign_coords(pressure=("nobs", [850, 855, 500, 850])),
+        )
+    run = "/".join([*model.values(), "t", "2022-05-16T04:00"])
+
+    # Act
+    response = client.get(f"/diag/{run}/profile/?edges=1000,700,300")
+
+    # Assert
+    ges = {
+        "min_pressure": 700.0,
+        "max_pressure": 1000.0,
+        "count": 2,
+        "obs_minus_forecast_adjusted_bias": 0.0,
+        "obs_minus_forecast_adjusted_rms": 1.0,
+        "obs_minus_forecast_unadjusted_bias": 0.0,
+        "obs_minus_forecast_unadjusted_rms": 1.0,
+    }
+    anl = {
+        **ges,
+        "obs_minus_forecast_adjusted_rms": 0.0,
+        "obs_minus_forecast_unadjusted_rms": 0.0,
+    }
+    upper = {
+        "min_pressure": 300.0,
+        "max_pressure": 700.0,
+        "count": 1,
+        "obs_minus_forecast_adjusted_bias": 0.0,
+        "obs_minus_forecast_adjusted_rms": 0.0,
+        "obs_minus_forecast_unadjusted_bias": 0.0,
+        "obs_minus_forecast_unadjusted_rms": 0.0,
+    }
+    assert response.json == {"ges": [upper, ges], "anl": [upper, anl]}
+
+
+@pytest.mark.parametrize(
+    "query,status", [("", 404), ("?edges=850", 400), ("?edges=low,high", 400)]
+)
+def test_profile_invalid(t, client, query, status):
+    # Arrange
+    run = "/".join(get_group(t).split("/")[:-1])
+
+    # Act
+    response = client.get(f"/diag/{run}/profile/{query}")
+
+    # Assert
+    assert response.status_code == status
+
+
+def test_stats(t, diag_zarr_path, client):
+    # Arrange
+    save(
+        diag_zarr_path,
+        t.assign_attrs(loop="anl").assign(
+            obs_minus_forecast_adjusted=t["obs_minus_forecast_adjusted"] * 0
+        ),
+    )
+    run = "/".join(get_group(t).split("/")[:-1])
+
+    # Act
+    response = client.get(f"/diag/{run}/stats/")
+    filtered = client.get(f"/diag/{run}/stats/?longitude=89.5::90.5")
+
+    # Assert
+    # Only the first two observations are used, with O - F values of 1 and -1
+    ges = {
+        "count": 3,
+        "used_count": 2,
+        "obs_minus_forecast_adjusted": {"bias": 0.0, "rms": 1.0, "std": np.sqrt(2)},
+        "obs_minus_forecast_unadjusted": {"bias": 0.0, "rms": 1.0, "std": np.sqrt(2)},
+    }
+    anl = {
+        **ges,
+        "obs_minus_forecast_adjusted": {"bias": 0.0, "rms": 0.0, "std": 0.0},
+    }
+    assert response.json == {"ges": ges, "anl": anl}
+    assert filtered.json["ges"] == {
+        "count": 1,
+        "used_count": 1,
+        "obs_minus_forecast_adjusted": {"bias": 1.0, "rms": 1.0, "std": None},
+        "obs_minus_forecast_unadjusted": {"bias": 1.0, "rms": 1.0, "std": None},
+    }
+
+
+def test_stats_vector(uv, client):
+    # Arrange
+    run = "/".join(get_group(uv).split("/")[:-1])
+
+    # Act
+    response = client.get(f"/diag/{run}/stats/")
+
+    # Assert
+    # The O - F vectors are (0, 1) and (0, -1), so there's no bias in either
+    # component even though both have a magnitude of 1
+    expected = {
+        "bias": {"u": 0.0, "v": 0.0},
+        "rms": 1.0,
+        "std": {"u": 0.0, "v": np.sqrt(2)},
+    }
+    assert response.json == {
+        "ges": {
+            "count": 2,
+            "used_count": 2,
+            "obs_minus_forecast_adjusted": expected,
+            "obs_minus_forecast_unadjusted": expected,
+        }
+    }
+
+
+def test_stats_missing(model, client):
+    run = "/".join([*model.values(), "t", "2022-05-16T04:00"])
+
+    response = client.get(f"/diag/{run}/stats/")
+
+    assert response.status_code == 404
+
+
+def test_improvement(t, diag_zarr_path, client):
+    # Arrange
+    # The analysis fits the first observation better and the second worse, and the
+    # third isn't used in the guess
+    save(
+        diag_zarr_path,
+        t.assign_attrs(loop="anl").assign(
+            obs_minus_forecast_adjusted=("nobs", [0.5, -2.0, 0.0])
+        ),
+    )
+    run = "/".join(get_group(t).split("/")[:-1])
+
+    # Act
+    response = client.get(f"/diag/{run}/improvement/")
+
+    # Assert
+    assert response.json["observations"] == [
+        {
+            "longitude": 90.0,
+            "latitude": 22.0,
+            "obs_minus_guess": 1.0,
+            "obs_minus_analysis": 0.5,
+            "improvement": -0.5,
+        },
+        {
+            "longitude": 91.0,
+            "latitude": 23.0,
+            "obs_minus_guess": -1.0,
+            "obs_minus_analysis": -2.0,
+            "improvement": 1.0,
+        },
+    ]
+    assert response.json["summary"] == {
+        "count": 2,
+        "obs_minus_guess_rms": 1.0,
+        "obs_minus_analysis_rms": np.sqrt(2.125),
+        "rms_reduction": 1.0 - np.sqrt(2.125),
+        "mean_improvement": 0.25,
+        "improved_count": 1,
+    }
+
+
+def test_improvement_omf_filter(t, diag_zarr_path, client):
+    # Arrange
+    # The analysis O - F of the first observation is outside of the filter, but the
+    # filter applies to the guess
+    save(
+        diag_zarr_path,
+        t.assign_attrs(loop="anl").assign(
+            obs_minus_forecast_adjusted=("nobs", [5.0, -2.0, 0.0])
+        ),
+    )
+    run = "/".join(get_group(t).split("/")[:-1])
+
+    # Act
+    response = client.get(f"/diag/{run}/improvement/?obs_minus_forecast_adjusted=0::2")
+
+    # Assert
+    assert response.status_code == 200
+    assert response.json["observations"] == [
+        {
+            "longitude": 90.0,
+            "latitude": 22.0,
+            "obs_minus_guess": 1.0,
+            "obs_minus_analysis": 5.0,
+            "improvement": 4.0,
+        },
+    ]
+
+
+def test_improvement_vector(uv, diag_zarr_path, client):
+    # Arrange
+    save(
+        diag_zarr_path,
+        uv.assign_attrs(loop="anl").assign(
+            obs_minus_forecast_adjusted=uv["obs_minus_forecast_adjusted"] * 0
+        ),
+    )
+    run = "/".join(get_group(uv).split("/")[:-1])
+
+    # Act
+    response = client.get(f"/diag/{run}/improvement/")
+
+    # Assert
+    assert [obs["improvement"] for obs in response.json["observations"]] == [
+        -1.0,
+        -1.0,
+    ]
+
+
+def test_improvement_misaligned(t, diag_zarr_path, client):
+    # Arrange
+    save(diag_zarr_path, t.assign_attrs(loop="anl").isel(nobs=[1, 0, 2]))
+    run = "/".join(get_group(t).split("/")[:-1])
+
+    # Act
+    response = client.get(f"/diag/{run}/improvement/")
+
+    # Assert
+    assert response.status_code == 409
+
+
+def test_compare(model, diag_zarr_path, test_dataset, client):
+    # Arrange
+    # The second model has the observations in a different order, and an extra one
+    # that the first model doesn't have
+    hrrr = test_dataset(
+        **model,
+        variable="t",
+        initialization_time="2022-05-16T04:00",
+        loop="ges",
+        observation=[1, 1, 1],
+        forecast_unadjusted=[0, 2, 1],
+        longitude=[90, 91, 92],
+        latitude=[22, 23, 24],
+        is_used=[True, True, True],
+    ).assign_coords(station_id=("nobs", ["KDEN", "KBOU", "KDEN"]))
+    rrfs = test_dataset(
+        **{**model, "background": "RRFS"},
+        variable="t",
+        initialization_time="2022-05-16T04:00",
+        loop="ges",
+        observation=[1, 1, 1, 1],
+        forecast_unadjusted=[1, 1, 1, 1],
+        longitude=[93, 92, 91, 90],
+        latitude=[25, 24, 23, 22],
+        is_used=[True, True, True, True],
+    ).assign_coords(station_id=("nobs", ["KAPA", "KDEN", "KBOU", "KDEN"]))
+    save(diag_zarr_path, hrrr)
+    save(diag_zarr_path, rrfs)
+    a = "/".join(model.values())
+    b = "/".join({**model, "background": "RRFS"}.values())
+
+    # Act
+    response = client.get(
+        f"/compare/t/2022-05-16T04:00/ges/?a={a}&b={b}&grid=true&max_cells=4"
+    )
+
+    # Assert
+    assert response.json["summary"] == {
+        "a_count": 3,
+        "b_count": 4,
+        "count": 3,
+        "a": {"bias": 0.0, "rms": np.sqrt(2 / 3), "std": 1.0},
+        "b": {"bias": 0.0, "rms": 0.0, "std": 0.0},
+        "difference": {"bias": 0.0, "rms": np.sqrt(2 / 3), "std": 1.0},
+    }
+    assert response.json["resolution"] == 4.0
+    assert response.json["grid"] == [
+        {
+            "latitude": 22.0,
+            "longitude": 90.0,
+            "count": 2,
+            "difference": 0.0,
+            "difference_rms": 1.0,
+        },
+        {
+            "latitude": 26.0,
+            "longitude": 94.0,
+            "count": 1,
+            "difference": 0.0,
+            "difference_rms": 0.0,
+        },
+    ]
+
+
+def test_compare_omf_filter(model, diag_zarr_path, test_dataset, client):
+    # Arrange
+    # Each model is filtered by its own O - F, so only the observation at (92, 24)
+    # is in range for both
+    hrrr = test_dataset(
+        **model,
+        variable="t",
+        initialization_time="2022-05-16T04:00",
+        loop="ges",
+        observation=[1, 1, 1],
+        forecast_unadjusted=[0, 2, 1],
+        longitude=[90, 91, 92],
+        latitude=[22, 23, 24],
+        is_used=[True, True, True],
+    ).assign_coords(station_id=("nobs", ["KDEN", "KBOU", "KDEN"]))
+    rrfs = test_dataset(
+        **{**model, "background": "RRFS"},
+        variable="t",
+        initialization_time="2022-05-16T04:00",
+        loop="ges",
+        observation=[1, 1, 1, 1],
+        forecast_unadjusted=[1, 1, 1, 2],
+        longitude=[93, 92, 91, 90],
+        latitude=[25, 24, 23, 22],
+        is_used=[True, True, True, True],
+    ).assign_coords(station_id=("nobs", ["KAPA", "KDEN", "KBOU", "KDEN"]))
+    save(diag_zarr_path, hrrr)
+    save(diag_zarr_path, rrfs)
+    a = "/".join(model.values())
+    b = "/".join({**model, "background": "RRFS"}.values())
+
+    # Act
+    response = client.get(
+        f"/compare/t/2022-05-16T04:00/ges/?a={a}&b={b}"
+        "&obs_minus_forecast_adjusted=0::2"
+    )
+
+    # Assert
+    assert response.status_code == 200
+    summary = response.json["summary"]
+    assert (summary["a_count"], summary["b_count"], summary["count"]) == (2, 3, 1)
+    assert summary["difference"]["bias"] == 0.0
+
+
+def test_compare_vector(uv, model, diag_zarr_path, client):
+    # Arrange
+    # The second model's forecasts match the observations
+    save(
+        diag_zarr_path,
+        uv.assign_attrs(background="RRFS").assign(
+            obs_minus_forecast_adjusted=uv["obs_minus_forecast_adjusted"] * 0
+        ),
+    )
+    a = "/".join(model.values())
+    b = "/".join({**model, "background": "RRFS"}.values())
+
+    # Act
+    response = client.get(f"/compare/uv/2022-05-16T04:00/ges/?a={a}&b={b}")
+
+    # Assert
+    # The O - F vectors of the first model are (0, 1) and (0, -1), so there's no
+    # bias in either component, but it's 1 further from each observation
+    assert response.json["summary"] == {
+        "a_count": 2,
+        "b_count": 2,
+        "count": 2,
+        "a": {
+            "bias": {"u": 0.0, "v": 0.0},
+            "rms": 1.0,
+            "std": {"u": 0.0, "v": np.sqrt(2)},
+        },
+        "b": {
+            "bias": {"u": 0.0, "v": 0.0},
+            "rms": 0.0,
+            "std": {"u": 0.0, "v": 0.0},
+        },
+        "difference": {"bias": 1.0, "rms": 1.0, "std": 0.0},
+    }
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "",
+        "?a=RTMA&b=RTMA",
+        "?a=RTMA/WCOSS/CONUS/HRRR/REALTIME&b=RTMA/WCOSS/CONUS/RRFS/REALTIME"
+        "&grid=true&max_cells=many",
+    ],
+)
+def test_compare_invalid(client, query):
+    response = client.get(f"/compare/t/2022-05-16T04:00/ges/{query}")
+
+    assert response.status_code == 400
+
+
+def test_summary(t, diag_zarr_path, client):
+    # Arrange
+    group = get_group(t)
+    summary = {
+        "observation": {
+            "count": 3,
+            "used_count": 2,
+            "min": 0.0,
+            "max": 1.0,
+            "mean": 0.5,
+            "std": 0.7071067811865476,
+        },
+    }
+    zarr.open_group(str(diag_zarr_path), mode="r+", path=group).attrs["summary"] = (
+        summary
+    )
+
+    # Act
+    response = client.get(f"/diag/{group}/summary/")
+
+    # Assert
+    assert response.json == summary
+
+
+def test_summary_not_found(t, client):
+    response = client.get(f"/diag/{get_group(t)}/summary/")
+
+    assert response.status_code == 404
+    assert response.json == {"msg": "Diagnostic summary not found"}
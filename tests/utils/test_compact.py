@@ -0,0 +1,159 @@
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pytest
+
+from unified_graphics import station
+from unified_graphics.etl import diag
+from utils.parquet.compact import process_datasets, sort_stations, unify_schema
+
+
+@pytest.fixture
+def parquet_file(tmp_path, test_dataset):
+    for initialization_time in ["2022-05-15T22:00", "2022-05-15T23:00"]:
+        diag.save_parquet(
+            tmp_path, test_dataset(initialization_time=initialization_time)
+        )
+
+    # A file written after the station IDs were added
+    diag.save_parquet(
+        tmp_path,
+        test_dataset(initialization_time="2022-05-16T00:00").assign_coords(
+            station_id=("nobs", ["KDEN", "KBOU"])
+        ),
+    )
+
+    return tmp_path / "RTMA_HRRR_WCOSS_CONUS_REALTIME" / "ps"
+
+
+def read_history(parquet_file):
+    return (
+        pd.read_parquet(parquet_file)
+        .reset_index()
+        .sort_values(["initialization_time", "nobs"], ignore_index=True)
+    )
+
+
+def test_compact(parquet_file, tmp_path):
+    expected = read_history(parquet_file)
+
+    process_datasets(str(tmp_path), dry_run=False)
+
+    assert len(list(parquet_file.glob("loop=ges/initialization_date=*/*"))) == 2
+
+    # Files written before the station IDs were added are merged with nulls for them
+    result = read_history(parquet_file)
+    assert result["station_id"].isna().sum() == 4
+    assert result["station_id"].iloc[4:].tolist() == ["KDEN", "KBOU"]
+    pd.testing.assert_frame_equal(result.drop(columns="station_id"), expected)
+
+
+def test_compact_target_size(parquet_file, tmp_path):
+    process_datasets(str(tmp_path), target_size=1, dry_run=False)
+
+    # Every file passes the target size, so none of them can be merged
+    assert len(list(parquet_file.glob("loop=ges/initialization_date=*/*"))) == 3
+
+
+def test_compact_metadata(parquet_file, tmp_path):
+    process_datasets(str(tmp_path), dry_run=False)
+
+    dataset = ds.parquet_dataset(parquet_file / "_metadata", partitioning="hive")
+
+    assert len(dataset.files) == 2
+    assert dataset.count_rows() == 6
+    assert (
+        dataset.count_rows(filter=ds.field("initialization_date") == "2022-05-16") == 2
+    )
+
+
+def test_compact_dry_run(parquet_file, tmp_path):
+    process_datasets(str(tmp_path), dry_run=True)
+
+    assert len(list(parquet_file.glob("loop=ges/initialization_date=*/*"))) == 3
+    assert not (parquet_file / "_metadata").exists()
+
+
+@pytest.fixture
+def station_path(tmp_path, test_dataset):
+    for initialization_time, station_ids in [
+        ("2022-05-16T00:00", ["KDEN", "KBOU"]),
+        ("2022-05-16T01:00", ["KBOU", "KDEN"]),
+        ("2022-05-16T02:00", ["KDEN", "KAPA"]),
+    ]:
+        diag.save_parquet(
+            tmp_path,
+            test_dataset(initialization_time=initialization_time).assign_coords(
+                station_id=("nobs", station_ids)
+            ),
+        )
+
+    return tmp_path / "RTMA_HRRR_WCOSS_CONUS_REALTIME" / "stations" / "ps"
+
+
+def test_compact_stations(station_path, tmp_path):
+    expected = pd.read_parquet(station_path)
+
+    process_datasets(str(tmp_path), dry_run=False)
+
+    # Each bucket is compacted into a single file, sorted by station and time, with
+    # its own _metadata
+    for bucket in set(station.buckets(["KDEN", "KBOU", "KAPA"])):
+        path = station_path / f"station_bucket={bucket}"
+        assert len(list(path.glob("*.parquet"))) == 1
+
+        dataset = ds.parquet_dataset(path / "_metadata")
+        table = dataset.to_table().to_pandas()
+        assert table["station_id"].astype(str).is_monotonic_increasing
+        assert len(dataset.files) == 1
+
+    result = pd.read_parquet(station_path)
+    pd.testing.assert_frame_equal(
+        result.astype({"station_id": str})
+        .sort_values(["station_id", "initialization_time"])
+        .reset_index(drop=True),
+        expected.astype({"station_id": str})
+        .sort_values(["station_id", "initialization_time"])
+        .reset_index(drop=True),
+    )
+
+
+def test_compact_stations_dry_run(station_path, tmp_path):
+    files = sorted(station_path.rglob("*"))
+
+    process_datasets(str(tmp_path), dry_run=True)
+
+    assert sorted(station_path.rglob("*")) == files
+
+
+def test_sort_stations():
+    # Each file has its own dictionary of station IDs
+    table = pa.concat_tables(
+        pa.table(
+            {
+                "station_id": pa.array(ids).dictionary_encode(),
+                "initialization_time": [datetime(2022, 5, 16, hour)] * 2,
+            }
+        )
+        for ids, hour in [(["KDEN", "KBOU"], 1), (["KBOU", "KAPA"], 0)]
+    )
+
+    result = sort_stations(table)
+
+    assert result["station_id"].to_pylist() == ["KAPA", "KBOU", "KBOU", "KDEN"]
+    assert [t.hour for t in result["initialization_time"].to_pylist()] == [0, 0, 1, 1]
+    assert result["station_id"].num_chunks == 1
+
+
+def test_unify_schema_dictionary():
+    dictionary = pa.dictionary(pa.int32(), pa.string())
+    old = pa.schema([("station_id", dictionary), ("loop", dictionary)])
+    new = pa.schema([("station_id", pa.string()), ("loop", dictionary)])
+
+    result = unify_schema([old, new])
+
+    # Station IDs written as a dictionary by older files are merged as strings
+    assert result.field("station_id").type == pa.string()
+    assert result.field("loop").type == dictionary
@@ -0,0 +1,48 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from utils.parquet.migrate_layout import process_files
+
+
+@pytest.fixture
+def old_layout(tmp_path, test_dataset):
+    parquet_file = tmp_path / "RTMA_HRRR_WCOSS_CONUS_REALTIME" / "ps"
+
+    frames = []
+    for initialization_time in ["2022-05-15T23:00", "2022-05-16T00:00"]:
+        df = test_dataset(
+            initialization_time=initialization_time, is_used=[False, True]
+        ).to_dataframe()
+        df["loop"] = "ges"
+        df["initialization_time"] = datetime.fromisoformat(initialization_time)
+        frames.append(df)
+
+    # One file that spans two days and one that's already within a single day
+    pd.concat(frames).to_parquet(parquet_file, partition_cols=["loop"], index=True)
+    frames[1].to_parquet(parquet_file, partition_cols=["loop"], index=True)
+
+    return parquet_file
+
+
+def test_migrate(old_layout, tmp_path):
+    process_files(str(tmp_path), dry_run=False)
+
+    assert not list((old_layout / "loop=ges").glob("*.parquet"))
+    assert len(list(old_layout.glob("loop=ges/initialization_date=*/*.parquet"))) == 3
+
+    result = pd.read_parquet(old_layout)
+
+    assert result.groupby("initialization_date", observed=True).size().to_dict() == {
+        "2022-05-15": 2,
+        "2022-05-16": 4,
+    }
+    assert result["is_used"].tolist() == [True, False, True, False, True, False]
+
+
+def test_migrate_dry_run(old_layout, tmp_path):
+    process_files(str(tmp_path), dry_run=True)
+
+    assert len(list((old_layout / "loop=ges").glob("*.parquet"))) == 2
+    assert not list(old_layout.glob("loop=ges/initialization_date=*"))